@@ -0,0 +1,118 @@
+# backend/benchmarks/bench_nutrients.py
+# Micro-benchmark: the old per-nutrient linear scan (get_val) vs the single-pass index in food_data_app/nutrients.py.
+#
+# Usage (from backend/): python benchmarks/bench_nutrients.py [payload.json ...] [--repeat N]
+# Payloads are FDC /foods/search responses. To record one:
+#   curl "https://api.nal.usda.gov/fdc/v1/foods/search?api_key=$FDC_API_KEY&query=banana&pageSize=5" > benchmarks/fixtures/fdc_search_banana.json
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from food_data_app.nutrients import NUTRIENTS, parse_food  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def legacy_extract_macros(food):
+    # The per-request parser NutritionLookup used before nutrients.py, kept here as the baseline
+    fn = food.get("foodNutrients") or []
+
+    def get_val(id_code=None, number_code=None):
+        for n in fn:
+            nid = n.get("nutrientId")
+            nnum = n.get("nutrientNumber")
+            if (id_code is not None and str(nid) == str(id_code)) or (
+                number_code is not None and str(nnum) == str(number_code)
+            ):
+                return n.get("value")
+        return None
+
+    calories = get_val(id_code=1008, number_code="208")
+    protein = get_val(id_code=1003, number_code="203")
+    carbs = get_val(id_code=1005, number_code="205")
+    fat = get_val(id_code=1004, number_code="204")
+
+    if any(v in (None, 0) for v in [calories, protein, carbs, fat]):
+        ln = food.get("labelNutrients") or {}
+
+        def lv(key):
+            return (ln.get(key) or {}).get("value")
+
+        calories = calories if calories not in (None, 0) else lv("calories")
+        protein = protein if protein not in (None, 0) else lv("protein")
+        carbs = carbs if carbs not in (None, 0) else lv("totalCarbohydrate")
+        fat = fat if fat not in (None, 0) else lv("totalFat")
+
+    return calories, protein, carbs, fat
+
+
+def legacy_extract_all(food):
+    # The same get_val scan extended to every nutrient parse_food covers (one more scan per nutrient)
+    fn = food.get("foodNutrients") or []
+
+    def get_val(id_code=None, number_code=None):
+        for n in fn:
+            nid = n.get("nutrientId")
+            nnum = n.get("nutrientNumber")
+            if (id_code is not None and str(nid) == str(id_code)) or (
+                number_code is not None and str(nnum) == str(number_code)
+            ):
+                return n.get("value")
+        return None
+
+    return {name: get_val(id_code=nutrient_id, number_code=number) for name, (nutrient_id, number, _) in NUTRIENTS.items()}
+
+
+def load_foods(paths):
+    foods = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            foods.extend((json.load(f) or {}).get("foods") or [])
+    return foods
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("payloads", nargs="*", help="Recorded FDC search responses (default: benchmarks/fixtures/fdc_search_*.json)")
+    parser.add_argument("--repeat", type=int, default=2000, help="Times every food is parsed per timing run.")
+    args = parser.parse_args()
+
+    paths = args.payloads or sorted(FIXTURES.glob("fdc_search_*.json"))
+    foods = load_foods(paths)
+    if not foods:
+        sys.exit("No foods found in the given payloads.")
+
+    # Both parsers have to agree on the four macros (as rendered, None shows as 0) before timing means anything
+    # parse_food also reads the "carbohydrates"/"fat" label keys, so foods only the new parser understands are skipped
+    for food in foods:
+        values = parse_food(food)
+        new = tuple(values[name] or 0 for name in ("calories", "protein", "carbs", "fat"))
+        old = tuple(value or 0 for value in legacy_extract_macros(food))
+        assert new == old or 0 in old, f"parsers disagree on fdcId {food.get('fdcId')}"
+
+    nutrient_counts = [len(food.get("foodNutrients") or []) for food in foods]
+    print(f"{len(foods)} food(s) from {len(paths)} payload(s), {min(nutrient_counts)}-{max(nutrient_counts)} nutrients each")
+
+    results = {}
+    parsers = (
+        ("legacy scan, 4 macros", legacy_extract_macros),
+        (f"legacy scan, {len(NUTRIENTS)} nutrients", legacy_extract_all),
+        (f"parse_food, {len(NUTRIENTS)} nutrients", parse_food),
+    )
+    for name, parse in parsers:
+        runs = timeit.repeat(lambda: [parse(food) for food in foods], number=args.repeat, repeat=5)
+        per_food_us = min(runs) / (args.repeat * len(foods)) * 1e6
+        results[name] = per_food_us
+        print(f"{name:<26} {per_food_us:8.2f} us/food")
+
+    legacy_macros, legacy_all, indexed = results.values()
+    print(f"speedup at equal coverage: {legacy_all / indexed:.1f}x")
+    print(f"vs the old 4-macro scan:   {legacy_macros / indexed:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# backend/benchmarks/load.py
+# Load harness: drives every API endpoint at a given concurrency and reports p50/p95/p99 latency and the
+# DB queries per request (read from the Server-Timing header, see fullsnack_project/instrumentation.py).
+#
+# Usage (from backend/):
+#   python manage.py seed_load_data --users 50 --days 60 --tokens-file /tmp/tokens.txt
+#   python benchmarks/load.py --tokens-file /tmp/tokens.txt [--requests 200] [--concurrency 16] [--only days,weeks]
+#
+# Without --base-url it starts the replay stubs (stub_upstreams.py) and `manage.py runserver` wired to them,
+# on the database configured in settings. With --base-url it targets a server you started yourself (point its
+# FDC_API_URL / UNSPLASH_API_URL at stub_upstreams.py). Write scenarios add logs, pass --read-only to skip them.
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+from stub_upstreams import StubUpstreams
+
+BACKEND = Path(__file__).resolve().parent.parent
+FOODS = ("banana", "oatmeal", "greek yogurt", "chicken breast", "brown rice", "apple", "salmon", "pasta")
+QUERIES_RE = re.compile(r'desc="(\d+) queries"')
+
+
+def food_body(ctx, rng):
+    return {"food_name": rng.choice(FOODS).title(), "calories": rng.randint(50, 600),
+            "protein": rng.randint(0, 40), "carbs": rng.randint(0, 80), "fat": rng.randint(0, 30)}
+
+
+def bulk_body(ctx, rng):
+    return {"create": [food_body(ctx, rng) for _ in range(10)]}
+
+
+def login_body(ctx, rng):
+    return {"email": ctx["email"], "password": ctx["password"]}
+
+
+def image_body(ctx, rng):
+    return {"q": ctx["food"]}
+
+
+# name, method, path template, body factory, writes
+SCENARIOS = [
+    ("login", "POST", "/api/v1/users/login/", login_body, False),
+    ("user-info", "GET", "/api/v1/users/info/", None, False),
+    ("foods-today", "GET", "/api/v1/foods/", None, False),
+    ("foods-range-30d", "GET", "/api/v1/foods/?start={month_ago}&end={today}", None, False),
+    ("food-detail", "GET", "/api/v1/foods/{log_id}/", None, False),
+    ("nutrition", "GET", "/api/v1/foods/nutrition/?query={food}", None, False),
+    ("nutrition-async", "GET", "/api/v1/foods/nutrition/async/?query={food}", None, False),
+    ("user-foods", "GET", "/api/v1/foods/mine/?q={prefix}", None, False),
+    ("weeks", "GET", "/api/v1/dates/weeks/", None, False),
+    ("week", "GET", "/api/v1/dates/weeks/{week_start}/", None, False),
+    ("days", "GET", "/api/v1/dates/days/", None, False),
+    ("days-of-week", "GET", "/api/v1/dates/days/?week_start={week_start}", None, False),
+    ("day", "GET", "/api/v1/dates/days/{today}/", None, False),
+    ("image-search", "GET", "/api/v1/images/search/?q={food}", None, False),
+    ("image-search-async", "GET", "/api/v1/images/search/async/?q={food}", None, False),
+    ("food-create", "POST", "/api/v1/foods/", food_body, True),
+    ("food-update", "PUT", "/api/v1/foods/{log_id}/", food_body, True),
+    ("foods-bulk-10", "POST", "/api/v1/foods/bulk/", bulk_body, True),
+    ("set-image", "PATCH", "/api/v1/images/foodlogs/{log_id}/set/", image_body, True),
+    ("set-image-async", "PATCH", "/api/v1/images/foodlogs/{log_id}/set/async/", image_body, True),
+]
+
+
+async def prepare_users(client, tokens, password):
+    # Each token's email (for login) and some of its log ids (for the detail/update scenarios)
+    start = (date.today() - timedelta(days=30)).isoformat()
+    users = []
+    for token in tokens:
+        headers = {"Authorization": f"Token {token}"}
+        info = (await client.get("/api/v1/users/info/", headers=headers)).json()
+        logs = (await client.get(f"/api/v1/foods/?start={start}&page_size=50", headers=headers)).json()
+        log_ids = [row["id"] for row in logs.get("results", [])]
+        if not log_ids:
+            sys.exit(f"Token {token[:6]}... has no food logs in the last 30 days, run seed_load_data first.")
+        users.append({"headers": headers, "email": info["user"]["email"], "password": password, "log_ids": log_ids})
+    return users
+
+
+def fill(template, ctx):
+    return template.format(**ctx)
+
+
+async def run_scenario(client, scenario, users, requests, concurrency, unique_queries, rng):
+    name, method, path, body, _ = scenario
+    today = date.today()
+    gate = asyncio.Semaphore(concurrency)
+    samples = []
+
+    async def one(i):
+        user = users[i % len(users)]
+        food = rng.choice(FOODS) + (f" {i}" if unique_queries else "")
+        ctx = {
+            **user, "food": food, "prefix": food[:3], "log_id": rng.choice(user["log_ids"]), "today": today.isoformat(),
+            "month_ago": (today - timedelta(days=30)).isoformat(),
+            "week_start": (today - timedelta(days=today.weekday())).isoformat(),
+        }
+        headers = {} if name == "login" else user["headers"]
+        async with gate:
+            start = time.perf_counter()
+            response = await client.request(
+                method, fill(path, ctx), headers=headers, json=body(ctx, rng) if body else None
+            )
+            elapsed = time.perf_counter() - start
+        queries = QUERIES_RE.search(response.headers.get("Server-Timing", ""))
+        samples.append((elapsed, response.status_code, int(queries.group(1)) if queries else None))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarize(name, samples, time.perf_counter() - started)
+
+
+def summarize(name, samples, wall):
+    latencies = sorted(elapsed * 1000 for elapsed, _, _ in samples)
+    cuts = statistics.quantiles(latencies, n=100, method="inclusive") if len(latencies) > 1 else latencies * 99
+    queries = [q for _, _, q in samples if q is not None]
+    return {
+        "scenario": name,
+        "requests": len(samples),
+        "errors": sum(1 for _, status, _ in samples if status >= 400),
+        "rps": round(len(samples) / wall, 1),
+        "p50_ms": round(cuts[49], 1),
+        "p95_ms": round(cuts[94], 1),
+        "p99_ms": round(cuts[98], 1),
+        "queries_per_request": round(statistics.mean(queries), 1) if queries else None,
+    }
+
+
+def print_table(rows):
+    columns = ["scenario", "requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "queries_per_request"]
+    widths = {c: max(len(c), *(len(str(row[c])) for row in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in rows:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(stub, settings_module):
+    # runserver (threaded) on a free port, with the upstream URLs pointed at the stubs
+    port = free_port()
+    # The stubs have no quota, so the quota limiter (fullsnack_project/quota.py) is off unless asked for
+    # and they don't serve the photos, so setting an image makes no thumbnails (image_app/thumbnails.py)
+    env = {"FDC_QUOTA_PER_HOUR": "0", "UNSPLASH_QUOTA_PER_HOUR": "0", "IMAGE_THUMBNAILS": "0", **os.environ,
+           "FDC_API_URL": stub.fdc_url, "UNSPLASH_API_URL": stub.unsplash_url}
+    command = [sys.executable, "manage.py", "runserver", f"127.0.0.1:{port}", "--noreload"]
+    if settings_module:
+        command.append(f"--settings={settings_module}")
+    # runserver logs every request, to a file so a full pipe can never block it
+    log = tempfile.NamedTemporaryFile(prefix="load-runserver-", suffix=".log", delete=False)
+    process = subprocess.Popen(command, cwd=BACKEND, env=env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            httpx.get(f"{base_url}/api/v1/users/test/", timeout=1)
+            print(f"runserver on {base_url}, log in {log.name}", file=sys.stderr)
+            return process, base_url
+        except httpx.TransportError:
+            if process.poll() is not None:
+                sys.exit(Path(log.name).read_text())
+            time.sleep(0.2)
+    process.terminate()
+    sys.exit("runserver did not start in 20s.")
+
+
+async def run(args, base_url):
+    tokens = [line.strip() for line in Path(args.tokens_file).read_text().splitlines() if line.strip()]
+    rng = random.Random(args.seed)
+    selected = [s for s in SCENARIOS if (not args.only or s[0] in args.only) and not (args.read_only and s[4])]
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        users = await prepare_users(client, tokens[: args.users] if args.users else tokens, args.password)
+        rows = []
+        for scenario in selected:
+            row = await run_scenario(client, scenario, users, args.requests, args.concurrency, args.unique_queries, rng)
+            rows.append(row)
+            print(f"{row['scenario']}: p95 {row['p95_ms']} ms", file=sys.stderr)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drives every API endpoint and reports latency percentiles.")
+    parser.add_argument("--tokens-file", required=True, help="Written by manage.py seed_load_data --tokens-file.")
+    parser.add_argument("--base-url", help="Target a running server instead of starting one.")
+    parser.add_argument("--settings", help="DJANGO_SETTINGS_MODULE for the server this script starts.")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per scenario.")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--users", type=int, default=0, help="Use only the first N tokens.")
+    parser.add_argument("--password", default="loadtest123", help="Password of the seeded users (login scenario).")
+    parser.add_argument("--only", type=lambda value: set(value.split(",")), help="Comma separated scenario names.")
+    parser.add_argument("--read-only", action="store_true", help="Skip scenarios that write.")
+    parser.add_argument("--unique-queries", action="store_true",
+                        help="Make every nutrition/image query unique, so the lookup caches always miss.")
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay of the stub upstreams.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    if args.base_url:
+        rows = asyncio.run(run(args, args.base_url))
+    else:
+        with StubUpstreams(latency_ms=args.latency_ms) as stub:
+            process, base_url = start_server(stub, args.settings)
+            try:
+                rows = asyncio.run(run(args, base_url))
+            finally:
+                process.terminate()
+                process.wait()
+
+    print_table(rows)
+    if args.json:
+        Path(args.json).write_text(json.dumps(rows, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# backend/benchmarks/stub_upstreams.py
+# Local stand-in for USDA FoodData Central and Unsplash that replays recorded payloads from fixtures/, so load
+# tests measure our code (and never spend API quota). An optional delay imitates the real upstream latency.
+#
+# Usage (from backend/): python benchmarks/stub_upstreams.py [--port 8765] [--latency-ms 120]
+# then start Django with
+#   FDC_API_URL=http://127.0.0.1:8765/fdc/v1 UNSPLASH_API_URL=http://127.0.0.1:8765/unsplash
+# load.py starts one by itself unless it is given --base-url.
+#
+# The fixtures are samples in each API's response format. Record real ones with
+#   curl "https://api.nal.usda.gov/fdc/v1/foods/search?api_key=$FDC_API_KEY&query=banana&pageSize=5" > fixtures/fdc_search_banana.json
+#   curl -H "Authorization: Client-ID $UNSPLASH_API_KEY" "https://api.unsplash.com/search/photos?query=banana&per_page=6" > fixtures/unsplash_search_banana.json
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlsplit
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+
+def load_routes():
+    # Path prefix -> (status, body bytes)
+    fdc = (FIXTURES / "fdc_search_banana.json").read_bytes()
+    unsplash = (FIXTURES / "unsplash_search_banana.json").read_bytes()
+    photo = json.dumps(json.loads(unsplash)["results"][0]).encode()
+    return {
+        "/fdc/v1/foods/search": (200, fdc),
+        "/unsplash/search/photos": (200, unsplash),
+        "/unsplash/photos/": (200, photo),
+    }
+
+
+class StubUpstreams:
+    """
+    Serves the recorded payloads on 127.0.0.1 from a background thread, as a context manager.
+    .fdc_url / .unsplash_url are the values for the FDC_API_URL / UNSPLASH_API_URL settings.
+    """
+
+    def __init__(self, port=0, latency_ms=0):
+        routes = load_routes()
+        delay = latency_ms / 1000
+        self.hits = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                stub.hits += 1
+                path = urlsplit(self.path).path
+                status, body = next(
+                    (route for prefix, route in routes.items() if path.startswith(prefix)),
+                    (404, b'{"error": "no recorded payload"}'),
+                )
+                if delay:
+                    time.sleep(delay)
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.fdc_url = f"{base}/fdc/v1"
+        self.unsplash_url = f"{base}/unsplash"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays recorded USDA/Unsplash payloads for load tests.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=0, help="Delay before every answer.")
+    args = parser.parse_args()
+
+    with StubUpstreams(args.port, args.latency_ms) as stub:
+        print(f"FDC_API_URL={stub.fdc_url} UNSPLASH_API_URL={stub.unsplash_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class DatetimeAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'datetime_app'
+
+    def ready(self):
+        # Registers the Day/Week resolver invalidation receivers
+        from . import signals  # noqa: F401
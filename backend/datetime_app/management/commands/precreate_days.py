@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from datetime_app.models import Day
+from datetime_app.resolver import ensure_days
+
+
+# Creates the Day/Week rows of the coming days ahead of time, so the first logs after midnight never insert them
+# Schedule it (cron, a systemd timer...) at least once a day, e.g.: 30 23 * * * python manage.py precreate_days
+class Command(BaseCommand):
+    help = "Pre-creates the Day and Week rows of today and the coming days."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=7, help="Days to cover, starting today.")
+
+    def handle(self, *args, **options):
+        if options["days"] < 1:
+            raise CommandError("--days must be at least 1.")
+        today = timezone.now().date()
+        dates = [today + timedelta(days=offset) for offset in range(options["days"])]
+        existing = Day.objects.filter(date__in=dates).count()
+        ensure_days(dates)
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(dates) - existing} day(s), {len(dates)} day(s) from {today} are in place."
+        ))
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:27
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_user_totals(apps, schema_editor):
+    # Builds the per-user rollups from the food logs that already exist
+    FoodLog = apps.get_model('food_data_app', 'FoodLog')
+    UserDayTotal = apps.get_model('datetime_app', 'UserDayTotal')
+    UserWeekTotal = apps.get_model('datetime_app', 'UserWeekTotal')
+
+    sums = dict(
+        calories=Sum('calories'), protein=Sum('protein'), carbs=Sum('carbs'), fat=Sum('fat'), log_count=Count('id'),
+    )
+    day_rows = (
+        FoodLog.objects.order_by()
+        .values('user_id', 'parent_day__date', 'parent_day__parent_week__start_date')
+        .annotate(**sums)
+    )
+    UserDayTotal.objects.bulk_create(
+        [
+            UserDayTotal(
+                user_id=row['user_id'],
+                date=row['parent_day__date'],
+                week_start=row['parent_day__parent_week__start_date'],
+                **{field: row[field] for field in sums},
+            )
+            for row in day_rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+    week_rows = (
+        FoodLog.objects.order_by()
+        .values('user_id', 'parent_day__parent_week__start_date')
+        .annotate(**sums)
+    )
+    UserWeekTotal.objects.bulk_create(
+        [
+            UserWeekTotal(
+                user_id=row['user_id'],
+                week_start=row['parent_day__parent_week__start_date'],
+                **{field: row[field] for field in sums},
+            )
+            for row in week_rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datetime_app', '0001_initial'),
+        ('food_data_app', '0003_foodlog_image_credit_name_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDayTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calories', models.PositiveIntegerField(default=0)),
+                ('protein', models.PositiveIntegerField(default=0)),
+                ('carbs', models.PositiveIntegerField(default=0)),
+                ('fat', models.PositiveIntegerField(default=0)),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('date', models.DateField()),
+                ('week_start', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='day_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'week_start'], name='user_day_total_week_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'date'), name='unique_user_day_total')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserWeekTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calories', models.PositiveIntegerField(default=0)),
+                ('protein', models.PositiveIntegerField(default=0)),
+                ('carbs', models.PositiveIntegerField(default=0)),
+                ('fat', models.PositiveIntegerField(default=0)),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('week_start', models.DateField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='week_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'week_start'), name='unique_user_week_total')],
+            },
+        ),
+        migrations.RunPython(backfill_user_totals, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,7 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
 
 class Week(models.Model):
     # Each week has a unique starting date (no two weeks start on the same Monday)
@@ -14,4 +17,85 @@ class Day(models.Model):
     daily_calorie_total = models.PositiveIntegerField(default=0)
 
     def __str__(self):
-        return str(self.date)
\ No newline at end of file
+        return str(self.date)
+
+    def apply_calorie_delta(self, delta):
+        # Shifts the day and week totals by delta inside SQL (F expressions) so concurrent writers never overwrite each other
+        # Greatest() clamps at 0 so a drifted total can't break the positive integer constraint
+        if not delta:
+            return
+        Day.objects.filter(pk=self.pk).update(daily_calorie_total=Greatest(
+            F('daily_calorie_total') + delta, Value(0), output_field=models.PositiveIntegerField()))
+        Week.objects.filter(pk=self.parent_week_id).update(weekly_calorie_total=Greatest(
+            F('weekly_calorie_total') + delta, Value(0), output_field=models.PositiveIntegerField()))
+
+        # Keeps the in-memory objects in sync with what was just written
+        # (days from the resolver have the total deferred, it is read fresh if anything needs it)
+        if 'daily_calorie_total' not in self.get_deferred_fields():
+            self.daily_calorie_total = max(self.daily_calorie_total + delta, 0)
+        if Day.parent_week.is_cached(self):
+            self.parent_week.weekly_calorie_total = max(self.parent_week.weekly_calorie_total + delta, 0)
+
+
+# Per-user rollups: the Day/Week totals above are shared by every user, these hold one user's macros for a day or week
+class MacroTotals(models.Model):
+    calories = models.PositiveIntegerField(default=0)
+    protein = models.PositiveIntegerField(default=0)
+    carbs = models.PositiveIntegerField(default=0)
+    fat = models.PositiveIntegerField(default=0)
+    # Number of food logs behind the totals, rows that drop to 0 are hidden from the dashboard
+    log_count = models.PositiveIntegerField(default=0)
+
+    TOTAL_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'log_count')
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def apply_delta(cls, deltas, **lookup):
+        # Adds each value in deltas to the matching row (found by lookup), creating the row on the first log
+        deltas = {field: value for field, value in deltas.items() if value}
+        if not deltas:
+            return
+        changes = {
+            field: Greatest(F(field) + value, Value(0), output_field=models.PositiveIntegerField())
+            for field, value in deltas.items()
+        }
+        if cls.objects.filter(**lookup).update(**changes):
+            return
+        try:
+            # Savepoint so a concurrent insert of the same row doesn't break the surrounding transaction
+            with transaction.atomic():
+                cls.objects.create(**lookup, **{field: max(value, 0) for field, value in deltas.items()})
+        except IntegrityError:
+            cls.objects.filter(**lookup).update(**changes)
+
+
+class UserDayTotal(MacroTotals):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='day_totals')
+    date = models.DateField()
+    week_start = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'date'], name='unique_user_day_total'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'week_start'], name='user_day_total_week_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} on {self.date}"
+
+
+class UserWeekTotal(MacroTotals):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='week_totals')
+    week_start = models.DateField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'week_start'], name='unique_user_week_total'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} week of {self.week_start}"
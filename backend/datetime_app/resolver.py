@@ -0,0 +1,136 @@
+# backend/datetime_app/resolver.py
+# Finds the Day (and Week) that a log date belongs to. At midnight every user's first log of the day wants to
+# create the same Day row, with get_or_create that raced into IntegrityErrors and lock waits. Here a missing row is
+# created with INSERT ... ON CONFLICT DO NOTHING (losers of the race just read the winner's row), and resolved ids
+# are remembered for the life of the process, so after the first log of a day resolving it costs no query.
+#
+# Ids are only remembered once the transaction that saw them commits, a rolled back insert can't leave a dangling
+# id behind (and deleting a Day or Week forgets everything, see signals.py). A lookup that misses also loads the
+# following LOOKAHEAD_DAYS days, so with `manage.py precreate_days` run ahead of time (cron) the day rollover finds
+# tomorrow's row already in memory.
+import threading
+from datetime import timedelta
+
+from django.db import connections, transaction
+
+from .models import Day, Week
+
+# Upcoming days loaded (when they exist) together with a missed date
+LOOKAHEAD_DAYS = 7
+# Past this many dates the oldest are dropped (backfills touch old dates once)
+MEMO_SIZE = 512
+# Attempts of the Postgres upsert, see _upsert_postgres
+UPSERT_ATTEMPTS = 3
+
+_memo = {}  # date -> (day id, week id)
+_memo_lock = threading.Lock()
+
+UPSERT_SQL = """
+WITH new_week AS (
+    INSERT INTO {week} (start_date, weekly_calorie_total) VALUES (%(week_start)s, 0)
+    ON CONFLICT (start_date) DO NOTHING
+    RETURNING id
+), week AS (
+    SELECT id FROM new_week
+    UNION ALL
+    SELECT id FROM {week} WHERE start_date = %(week_start)s
+), new_day AS (
+    INSERT INTO {day} ("date", parent_week_id, daily_calorie_total)
+    SELECT %(date)s, id, 0 FROM (SELECT id FROM week LIMIT 1) AS found_week
+    ON CONFLICT ("date") DO NOTHING
+    RETURNING id, parent_week_id
+)
+SELECT id, parent_week_id FROM new_day
+UNION ALL
+SELECT id, parent_week_id FROM {day} WHERE "date" = %(date)s
+LIMIT 1
+"""
+
+
+def week_start(log_date):
+    # Weeks start on Monday
+    return log_date - timedelta(days=log_date.weekday())
+
+
+def resolve_day(log_date):
+    """
+    The Day of log_date, created (with its Week) if missing. Only the ids and the date are loaded, the totals
+    are read from the database if something asks for them.
+    """
+    ids = _memo.get(log_date) or _lookup(log_date) or _upsert(log_date)
+    day_id, week_id = ids
+    return Day.from_db(Day.objects.db, ['id', 'date', 'parent_week_id'], (day_id, log_date, week_id))
+
+
+def ensure_days(dates):
+    # Creates whichever of dates (and their weeks) are missing, in a few queries for any number of dates
+    # Returns {date: day id}
+    return {d: day_id for d, (day_id, _) in _ensure(dates).items()}
+
+
+def forget():
+    with _memo_lock:
+        _memo.clear()
+
+
+def _ensure(dates):
+    dates = set(dates)
+    starts = {week_start(d) for d in dates}
+    Week.objects.bulk_create([Week(start_date=start) for start in starts], ignore_conflicts=True)
+    weeks = dict(Week.objects.filter(start_date__in=starts).values_list('start_date', 'pk'))
+    Day.objects.bulk_create(
+        [Day(date=d, parent_week_id=weeks[week_start(d)]) for d in dates], ignore_conflicts=True
+    )
+    found = {d: (pk, week_id) for d, pk, week_id in
+             Day.objects.filter(date__in=dates).values_list('date', 'pk', 'parent_week_id')}
+    _remember(found)
+    return found
+
+
+def _lookup(log_date):
+    # One indexed range read for the date and the days after it
+    rows = Day.objects.filter(
+        date__gte=log_date, date__lt=log_date + timedelta(days=LOOKAHEAD_DAYS)
+    ).values_list('date', 'pk', 'parent_week_id')
+    found = {d: (pk, week_id) for d, pk, week_id in rows}
+    _remember(found)
+    return found.get(log_date)
+
+
+def _upsert(log_date):
+    connection = connections[Day.objects.db]
+    if connection.vendor == 'postgresql':
+        ids = _upsert_postgres(connection, log_date)
+        if ids:
+            return ids
+    # Other databases (and a Postgres upsert that kept losing races) insert and read back separately
+    return _ensure([log_date])[log_date]
+
+
+def _upsert_postgres(connection, log_date):
+    # Week and Day in a single round trip. A row committed by a concurrent insert after the statement started is
+    # not visible to its SELECT (ON CONFLICT skipped it too), so an empty result means "retry", which sees it
+    sql = UPSERT_SQL.format(
+        week=connection.ops.quote_name(Week._meta.db_table), day=connection.ops.quote_name(Day._meta.db_table)
+    )
+    params = {'date': log_date, 'week_start': week_start(log_date)}
+    for _ in range(UPSERT_ATTEMPTS):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        if row:
+            _remember({log_date: tuple(row)})
+            return tuple(row)
+    return None
+
+
+def _remember(found):
+    if found:
+        transaction.on_commit(lambda: _store(found), using=Day.objects.db)
+
+
+def _store(found):
+    with _memo_lock:
+        _memo.update(found)
+        while len(_memo) > MEMO_SIZE:
+            del _memo[next(iter(_memo))]
@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Day, Week
+from .models import Day, Week, UserDayTotal, UserWeekTotal
 
 class DaySerializer(serializers.ModelSerializer):
     class Meta:
@@ -9,4 +9,43 @@ class DaySerializer(serializers.ModelSerializer):
 class WeekSerializer(serializers.ModelSerializer):
     class Meta:
         model = Week
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+
+# The per-user rollups keep the same field names the frontend already reads from Day/Week
+class UserDayTotalSerializer(serializers.ModelSerializer):
+    daily_calorie_total = serializers.IntegerField(source='calories')
+    daily_protein_total = serializers.IntegerField(source='protein')
+    daily_carbs_total = serializers.IntegerField(source='carbs')
+    daily_fat_total = serializers.IntegerField(source='fat')
+
+    class Meta:
+        model = UserDayTotal
+        fields = [
+            'id',
+            'date',
+            'week_start',
+            'daily_calorie_total',
+            'daily_protein_total',
+            'daily_carbs_total',
+            'daily_fat_total',
+            'log_count',
+        ]
+
+class UserWeekTotalSerializer(serializers.ModelSerializer):
+    start_date = serializers.DateField(source='week_start')
+    weekly_calorie_total = serializers.IntegerField(source='calories')
+    weekly_protein_total = serializers.IntegerField(source='protein')
+    weekly_carbs_total = serializers.IntegerField(source='carbs')
+    weekly_fat_total = serializers.IntegerField(source='fat')
+
+    class Meta:
+        model = UserWeekTotal
+        fields = [
+            'id',
+            'start_date',
+            'weekly_calorie_total',
+            'weekly_protein_total',
+            'weekly_carbs_total',
+            'weekly_fat_total',
+            'log_count',
+        ]
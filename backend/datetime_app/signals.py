@@ -0,0 +1,13 @@
+# backend/datetime_app/signals.py
+# Keeps the resolver's remembered Day/Week ids from pointing at deleted rows
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from . import resolver
+from .models import Day, Week
+
+
+@receiver(post_delete, sender=Day)
+@receiver(post_delete, sender=Week)
+def calendar_row_deleted(sender, instance, **kwargs):
+    resolver.forget()
@@ -4,28 +4,32 @@ from rest_framework.response import Response
 from datetime import datetime
 from django.http import Http404
 
-from .models import Day, Week
-from food_data_app.models import FoodLog
-from .serializers import DaySerializer, WeekSerializer
+from fullsnack_project.conditional import user_data_response
+from .models import UserDayTotal, UserWeekTotal
+from .serializers import UserDayTotalSerializer, UserWeekTotalSerializer
+
+# Every view reads the current user's precomputed rollups, which are looked up through the (user, date) / (user, week_start) indexes
+# The list views are also cached per user until their next food log write and answer conditional GETs (see conditional.py)
 
 class Weeks(APIView):
     def get(self, request):
-        # Filters based off of the user variable of the food logs of the days attached to it
-        weeks = Week.objects.filter(days__logs__user=request.user).distinct().order_by('-start_date')[:30]  # limit to past 12 weeks, most to least recent, only returns current user's info
-        serializer = WeekSerializer(weeks, many=True)
-        return Response(serializer.data)
+        # Weeks where the user has at least one log
+        def compute():
+            weeks = UserWeekTotal.objects.filter(user=request.user, log_count__gt=0).order_by('-week_start')[:30]  # limit to past 30 weeks, most to least recent, only returns current user's info
+            return UserWeekTotalSerializer(weeks, many=True).data
+        return user_data_response(request, "weeks", compute)
 
 class OneWeek(APIView):
-    def get_week(self, start_date):
+    def get_week(self, request, start_date):
         try:
             start_date_obj = datetime.strptime(start_date, "%Y-%m-%d").date()
         except ValueError:
             raise Http404("Invalid date format. Use YYYY-MM-DD.")
-        return get_object_or_404(Week, start_date=start_date_obj)
+        return get_object_or_404(UserWeekTotal, user=request.user, week_start=start_date_obj)
         
     def get(self, request, start_date):
-        week = self.get_week(start_date)
-        serialized = WeekSerializer(week)
+        week = self.get_week(request, start_date)
+        serialized = UserWeekTotalSerializer(week)
         return Response(serialized.data)
 
 class Days(APIView):
@@ -38,29 +42,30 @@ class Days(APIView):
             except ValueError:
                 return Response({"error": "Invalid week_start format. Use YYYY-MM-DD."}, status=400)
 
-            # Filter days that belong to the week with this start_date and current user
-            days = Day.objects.filter(
-                parent_week__start_date=week_date,
-                logs__user=request.user
-            ).distinct().order_by('date')
+            # Days of the current user that belong to the week with this start_date
+            def compute_week():
+                days = UserDayTotal.objects.filter(
+                    user=request.user,
+                    week_start=week_date,
+                    log_count__gt=0
+                ).order_by('date')
+                return UserDayTotalSerializer(days, many=True).data
+            return user_data_response(request, f"days:{week_date}", compute_week)
 
-            serializer = DaySerializer(days, many=True)
-            return Response(serializer.data)
-        
-        # logs__user is a reverse of the foreign key, it looks through objects that have a foreign key with it and their related name, in this case for the user variable attached to it
-        days = Day.objects.filter(logs__user=request.user).distinct().order_by('-date')[:30]  # limit to past 30 days, most to least recent, only returns current user's info
-        serializer = DaySerializer(days, many=True)
-        return Response(serializer.data)
+        def compute():
+            days = UserDayTotal.objects.filter(user=request.user, log_count__gt=0).order_by('-date')[:30]  # limit to past 30 days, most to least recent, only returns current user's info
+            return UserDayTotalSerializer(days, many=True).data
+        return user_data_response(request, "days", compute)
 
 class OneDay(APIView):
-    def get_day(self, date):
+    def get_day(self, request, date):
         try:
             date_obj = datetime.strptime(date, "%Y-%m-%d").date()
         except ValueError:
             raise Http404("Invalid date format. Use YYYY-MM-DD.")
-        return get_object_or_404(Day, date=date_obj)
+        return get_object_or_404(UserDayTotal, user=request.user, date=date_obj)
 
     def get(self, request, date):
-        day = self.get_day(date)
-        serialized = DaySerializer(day)
-        return Response(serialized.data)
\ No newline at end of file
+        day = self.get_day(request, date)
+        serialized = UserDayTotalSerializer(day)
+        return Response(serialized.data)
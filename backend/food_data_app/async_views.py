@@ -0,0 +1,38 @@
+# backend/food_data_app/async_views.py
+# ASGI variants of the views that wait on FDC, they don't hold a worker thread while the upstream answers
+import httpx
+from django.http import JsonResponse
+
+from fullsnack_project.async_views import AsyncAPIView
+from fullsnack_project import quota
+from fullsnack_project.upstream import CircuitOpenError
+from . import fdc
+
+
+# /api/v1/foods/nutrition/async/ -> same contract as NutritionLookup
+class AsyncNutritionLookup(AsyncAPIView):
+
+    async def get(self, request):
+        # Gets query if exists
+        query = (request.GET.get("query") or "").strip()
+        if not query:
+            return JsonResponse({"error": "Query parameter 'query' is required."}, status=400)
+
+        try:
+            item, source = await fdc.alookup(query)
+        except (httpx.HTTPError, CircuitOpenError):
+            return JsonResponse({"error": "Failed to reach USDA API."}, status=502)
+        except fdc.FdcSearchError:
+            return JsonResponse({"error": "USDA search failed."}, status=502)
+        except quota.QuotaExceeded as e:
+            response = JsonResponse({"error": "USDA lookups are busy, try again shortly."}, status=503)
+            response["Retry-After"] = quota.retry_after_header(e)
+            return response
+        except Exception:
+            return JsonResponse({"error": "Unexpected error."}, status=500)
+
+        response = JsonResponse({"items": []} if item is None else {"item": item})
+        response["X-Nutrition-Source"] = source
+        if source != fdc.ENGINE_LOCAL:
+            response["X-Cache"] = {"cache": "HIT", "stale": "STALE"}.get(source, "MISS")
+        return response
@@ -0,0 +1,132 @@
+# backend/food_data_app/bulk.py
+# Applies many FoodLog creates/updates/deletes in one transaction.
+# Rows are written with bulk_create/bulk_update/one DELETE, and the macro changes are summed per Day so every
+# affected Day, Week and per-user rollup is updated exactly once (FoodLog.save() would touch them once per log), and
+# the user's foods (UserFood) take every change in one record() call.
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from datetime_app.models import Day, Week, UserDayTotal, UserWeekTotal
+from fullsnack_project.caching import responses
+from .models import FoodLog, UserFood, get_log_day
+
+# Largest number of operations accepted in one request
+MAX_OPERATIONS = 500
+
+
+class UnknownFoodLogs(Exception):
+    # Some update/delete ids don't exist or belong to another user
+    def __init__(self, ids):
+        super().__init__(ids)
+        self.ids = sorted(ids)
+
+
+def shift(model, pk_deltas, field):
+    # One clamped UPDATE per row, same as Day.apply_calorie_delta
+    for pk, delta in pk_deltas.items():
+        if delta:
+            model.objects.filter(pk=pk).update(**{field: Greatest(
+                F(field) + delta, Value(0), output_field=models.PositiveIntegerField())})
+
+
+def apply_bulk(user, creates=(), updates=(), deletes=()):
+    """
+    creates: validated FoodLogSerializer data, updates: {id: validated (partial) data}, deletes: ids.
+    Returns (created logs, updated logs, deleted ids). Raises UnknownFoodLogs before writing anything
+    when an update/delete id isn't one of the user's logs.
+    """
+    # Summed macro changes per day id, plus the count change for the rollups
+    day_deltas = defaultdict(lambda: dict.fromkeys(FoodLog.MACRO_FIELDS + ('log_count',), 0))
+
+    with transaction.atomic():
+        ids = set(updates) | set(deletes)
+        # Images come along for the response, only the log rows are locked (Postgres can't lock an outer join's side)
+        logs = FoodLog.objects.select_for_update(of=("self",)).select_related("image").filter(user=user, pk__in=ids)
+        existing = {log.pk: log for log in logs}
+        missing = ids - set(existing)
+        if missing:
+            raise UnknownFoodLogs(missing)
+
+        # Updates: only the change against the stored row counts towards the totals
+        updated, changed_fields, removed = [], set(), []
+        for pk, data in updates.items():
+            log = existing[pk]
+            removed.append((log.food_name, log.time_logged))
+            deltas = day_deltas[log.parent_day_id]
+            for field, value in data.items():
+                if field in FoodLog.MACRO_FIELDS:
+                    deltas[field] += value - getattr(log, field)
+                setattr(log, field, value)
+                changed_fields.add(field)
+            updated.append(log)
+        if updated and changed_fields:
+            FoodLog.objects.bulk_update(updated, sorted(changed_fields), batch_size=500)
+
+        # Deletes: one query, the stored macros come off the totals
+        deleted = [existing[pk] for pk in deletes]
+        removed += [(log.food_name, log.time_logged) for log in deleted]
+        for log in deleted:
+            deltas = day_deltas[log.parent_day_id]
+            for field in FoodLog.MACRO_FIELDS:
+                deltas[field] -= getattr(log, field)
+            deltas['log_count'] -= 1
+        if deleted:
+            FoodLog.objects.filter(pk__in=[log.pk for log in deleted]).delete()
+
+        # Creates: all land on today's Day, like FoodLog.save()
+        created, known_days = [], {}
+        if creates:
+            day = get_log_day(timezone.now().date())
+            created = FoodLog.objects.bulk_create(
+                [FoodLog(user=user, parent_day=day, **data) for data in creates], batch_size=500
+            )
+            known_days[day.pk] = day
+            deltas = day_deltas[day.pk]
+            for log in created:
+                for field in FoodLog.MACRO_FIELDS:
+                    deltas[field] += getattr(log, field)
+                deltas['log_count'] += 1
+
+        apply_day_deltas(user, day_deltas, known_days)
+        UserFood.record(user.pk, added=updated + created, removed=removed)
+        responses.bump(user.pk)
+
+    return created, updated, [log.pk for log in deleted]
+
+
+def apply_day_deltas(user, day_deltas, known_days=None):
+    # Writes the summed changes once per Day, Week and per-user rollup row
+    # known_days: Day objects already loaded by the caller, only the other days are fetched
+    # Rows are locked in the order FoodLog.save() locks them (Day, Week, UserDayTotal, UserWeekTotal) and in
+    # ascending order within each table, so concurrent single and bulk writes can't deadlock on each other
+    known_days = known_days or {}
+    changed = [pk for pk, deltas in day_deltas.items() if any(deltas.values())]
+    days = [known_days[pk] for pk in changed if pk in known_days]
+    unknown = [pk for pk in changed if pk not in known_days]
+    if unknown:
+        days += Day.objects.filter(pk__in=unknown)
+    days.sort(key=lambda day: day.pk)
+    week_deltas = defaultdict(lambda: dict.fromkeys(FoodLog.MACRO_FIELDS + ('log_count',), 0))
+    week_calories = defaultdict(int)
+    day_calories = {}
+
+    for day in days:
+        deltas = day_deltas[day.pk]
+        week_start = day.date - timedelta(days=day.date.weekday())
+        day_calories[day.pk] = deltas['calories']
+        week_calories[day.parent_week_id] += deltas['calories']
+        for field, value in deltas.items():
+            week_deltas[week_start][field] += value
+
+    shift(Day, day_calories, 'daily_calorie_total')
+    shift(Week, dict(sorted(week_calories.items())), 'weekly_calorie_total')
+    for day in sorted(days, key=lambda day: day.date):
+        week_start = day.date - timedelta(days=day.date.weekday())
+        UserDayTotal.apply_delta(day_deltas[day.pk], user_id=user.pk, date=day.date, week_start=week_start)
+    for week_start in sorted(week_deltas):
+        UserWeekTotal.apply_delta(week_deltas[week_start], user_id=user.pk, week_start=week_start)
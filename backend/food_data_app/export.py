@@ -0,0 +1,60 @@
+# backend/food_data_app/export.py
+# Full food history dumps (CSV or NDJSON) for the export endpoint. Rows come off a server-side cursor as plain
+# values() tuples and are written out a chunk at a time, so memory stays flat however long the history is.
+import csv
+import io
+import json
+
+from .models import FoodLog, logged_between
+
+COLUMNS = ("id", "date", "time_logged", "food_name", "calories", "protein", "carbs", "fat", "image_url")
+# Rows fetched per cursor round trip, and rows written per chunk sent to the client
+FETCH_SIZE = 2000
+CHUNK_ROWS = 500
+
+CONTENT_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def export_rows(user, start=None, end=None):
+    # Oldest first, the (user, time_logged) index serves both the date range and the ordering
+    logs = FoodLog.objects.filter(user=user, **logged_between(start, end))
+    rows = logs.order_by("time_logged", "id").values_list(
+        "id", "parent_day__date", "time_logged", "food_name", "calories", "protein", "carbs", "fat", "image__url"
+    )
+    for row in rows.iterator(chunk_size=FETCH_SIZE):
+        log_id, log_date, logged_at, *rest = row
+        yield (log_id, log_date.isoformat(), logged_at.isoformat(), *rest)
+
+
+def csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % CHUNK_ROWS == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+def ndjson_chunks(rows):
+    buffer = io.StringIO()
+    for count, row in enumerate(rows, 1):
+        buffer.write(json.dumps(dict(zip(COLUMNS, row))))
+        buffer.write("\n")
+        if count % CHUNK_ROWS == 0:
+            yield _drain(buffer)
+    yield _drain(buffer)
+
+
+WRITERS = {"csv": csv_chunks, "ndjson": ndjson_chunks}
+
+
+def _drain(buffer):
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
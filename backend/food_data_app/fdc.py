@@ -0,0 +1,155 @@
+# backend/food_data_app/fdc.py
+# Talks to the USDA FoodData Central (FDC) API and turns its search results into the shape the frontend expects.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.functions import Length
+
+from fullsnack_project import upstream
+from fullsnack_project.caching import STALE, QueryCache, normalize_query
+from .models import FdcFood
+from . import nutrients
+
+# Where NutritionLookup gets its data from (settings.NUTRITION_ENGINE)
+ENGINE_REMOTE = "remote"
+ENGINE_LOCAL = "local"
+ENGINE_LOCAL_THEN_REMOTE = "local-then-remote"
+
+# Results are cached per normalized query, staple foods are searched over and over
+nutrition_cache = QueryCache(
+    "fdc",
+    alias=settings.LOOKUP_CACHE_ALIAS,
+    ttl=settings.NUTRITION_CACHE_TTL,
+    negative_ttl=settings.NUTRITION_CACHE_NEGATIVE_TTL,
+    stale_ttl=settings.LOOKUP_CACHE_STALE_TTL,
+)
+
+
+class FdcSearchError(Exception):
+    # FDC answered, but not with a 200
+    pass
+
+
+def search_request(query):
+    # URL and params of an FDC search for query
+    # Ask for multiple results and prioritize datasets that usually have full nutrients
+    params = {
+        "api_key": settings.FDC_API_KEY,
+        "query": query,
+        "pageSize": 5,
+        "dataType": ["Survey (FNDDS)", "SR Legacy", "Branded"],
+    }
+    return f"{settings.FDC_API_URL}/foods/search", params
+
+
+def parse_search_payload(payload, query):
+    # Turns an FDC search response into the normalized item, or None when nothing matched
+    foods = (payload or {}).get("foods") or []
+    if not foods:
+        return None
+
+    # Pick the first candidate with at least some macros present
+    # If all were empty, just use the first (still renders zeros)
+    candidates = (nutrients.parse_food(food) for food in foods)
+    chosen = next((values for values in candidates if nutrients.has_macros(values)), None)
+    if chosen is None:
+        chosen = nutrients.parse_food(foods[0])
+    return normalize_item(query.title(), chosen)
+
+
+def search_remote(query):
+    # Searches FDC for query and returns the normalized item, or None when nothing matched
+    # Raises requests.RequestException (including upstream.CircuitOpenError) when FDC can't be reached
+    # and FdcSearchError on a non-200 answer
+    url, params = search_request(query)
+    r = upstream.usda.get(url, params=params)
+    if r.status_code != 200:
+        raise FdcSearchError(r.status_code)
+    return parse_search_payload(r.json(), query)
+
+
+async def asearch_remote(query):
+    # Async version of search_remote for the ASGI views, goes through the shared pooled client
+    # Raises httpx.HTTPError (or upstream.CircuitOpenError) when FDC can't be reached and FdcSearchError on a non-200 answer
+    url, params = search_request(query)
+    r = await upstream.usda.aget(url, params=params)
+    if r.status_code != 200:
+        raise FdcSearchError(r.status_code)
+    return parse_search_payload(r.json(), query)
+
+
+def normalize_item(description, values):
+    # Return the data in the format expected by the front end
+    return {
+        "name": description,
+        "calories": round(float(values["calories"] or 0)),
+        "protein_g": round(float(values["protein"] or 0)),
+        "carbohydrates_total_g": round(float(values["carbs"] or 0)),
+        "fat_total_g": round(float(values["fat"] or 0)),
+        "fiber_g": round(float(values["fiber"] or 0)),
+        "sugar_g": round(float(values["sugar"] or 0)),
+        "sodium_mg": round(float(values["sodium"] or 0)),
+    }
+
+
+def search_local(query):
+    # Searches the imported FdcFood table, every word of the query has to appear in the description
+    words = normalize_query(query).split()
+    if not words:
+        return None
+    foods = FdcFood.objects.all()
+    for word in words:
+        foods = foods.filter(search_name__contains=word)
+
+    # Descriptions starting with the query first, then the shortest (least specific) descriptions
+    candidates = list(
+        foods.annotate(
+            prefix_rank=Case(
+                When(search_name__startswith=words[0], then=Value(0)), default=Value(1), output_field=IntegerField()
+            ),
+            name_length=Length("search_name"),
+        ).order_by("prefix_rank", "name_length", "fdc_id")[:5]
+    )
+    if not candidates:
+        return None
+
+    # Same rule as the remote search: first candidate with some macros present
+    chosen = next((f for f in candidates if any([f.calories, f.protein, f.carbs, f.fat])), candidates[0])
+    return normalize_item(query.title(), {name: getattr(chosen, name) for name in nutrients.NUTRIENTS})
+
+
+def source_of(hit):
+    # "stale" when FDC's quota is used up and an expired entry was served instead
+    if hit == STALE:
+        return "stale"
+    return "cache" if hit else "remote"
+
+
+def lookup(query):
+    # Returns (item, source) where source is "local", "cache", "stale" or "remote"
+    # Raises quota.QuotaExceeded when the query isn't cached and FDC's quota is used up
+    query = normalize_query(query)
+    engine = settings.NUTRITION_ENGINE
+
+    if engine in (ENGINE_LOCAL, ENGINE_LOCAL_THEN_REMOTE):
+        item = search_local(query)
+        if item is not None or engine == ENGINE_LOCAL:
+            return item, "local"
+
+    # Only going to FDC when the normalized query isn't cached (or already being fetched by another request)
+    hit, item = nutrition_cache.get_or_fetch(query, lambda: search_remote(query))
+    return item, source_of(hit)
+
+
+async def alookup(query):
+    # Async version of lookup, the cache and the local table are read in a worker thread
+    query = normalize_query(query)
+    engine = settings.NUTRITION_ENGINE
+
+    if engine in (ENGINE_LOCAL, ENGINE_LOCAL_THEN_REMOTE):
+        item = await sync_to_async(search_local)(query)
+        if item is not None or engine == ENGINE_LOCAL:
+            return item, "local"
+
+    hit, item = await nutrition_cache.aget_or_fetch(query, lambda: asearch_remote(query))
+    return item, source_of(hit)
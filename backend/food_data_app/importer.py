@@ -0,0 +1,136 @@
+# backend/food_data_app/importer.py
+# Imports food logs with their historical timestamps from a CSV file (another tracker's export, or our own from
+# export.py). The file is read and validated CHUNK_ROWS rows at a time and every chunk goes in with one bulk_create,
+# so the upload never has to fit in memory. The Day/Week totals and per-user rollups of every affected day are
+# written once at the end (bulk.apply_day_deltas). Either the whole file is imported or nothing is.
+import csv
+from collections import defaultdict
+from datetime import datetime, time
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from datetime_app.resolver import ensure_days
+from fullsnack_project.caching import responses
+from image_app.models import FoodImage
+from .bulk import apply_day_deltas
+from .models import FoodLog, ImageStatus, UserFood
+
+CHUNK_ROWS = 1000
+# Bad rows reported back (of the first invalid chunk)
+MAX_ERRORS = 20
+REQUIRED_COLUMNS = {"food_name", "calories", "protein", "carbs", "fat"}
+
+
+class ImportFailed(Exception):
+    # errors: [{"line": n, "errors": {...}}], nothing has been written
+    def __init__(self, detail, errors=()):
+        super().__init__(detail)
+        self.detail = detail
+        self.errors = list(errors)
+
+
+class FoodLogImportSerializer(serializers.ModelSerializer):
+    # A row needs when it was eaten: a timestamp, or only a date (logged at noon)
+    time_logged = serializers.DateTimeField(required=False)
+    date = serializers.DateField(required=False, write_only=True)
+    # Becomes a shared FoodImage, see _image_ids
+    image_url = serializers.URLField(required=False, max_length=2048)
+
+    class Meta:
+        model = FoodLog
+        fields = ["food_name", "calories", "protein", "carbs", "fat", "image_url", "time_logged", "date"]
+
+    def validate(self, attrs):
+        log_date = attrs.pop("date", None)
+        if "time_logged" not in attrs:
+            if log_date is None:
+                raise serializers.ValidationError("Each row needs a 'time_logged' or a 'date'.")
+            attrs["time_logged"] = timezone.make_aware(datetime.combine(log_date, time(12)))
+        if attrs["time_logged"] > timezone.now():
+            raise serializers.ValidationError({"time_logged": "Can't be in the future."})
+        attrs["image_url"] = attrs.get("image_url") or None
+        attrs["image_status"] = ImageStatus.READY if attrs["image_url"] else ImageStatus.NONE
+        return attrs
+
+
+def import_csv(user, text):
+    """
+    text: the CSV as a text stream (iterated line by line). Returns (logs imported, days touched).
+    Raises ImportFailed, with the offending lines, on a bad header or bad rows.
+    """
+    reader = csv.DictReader(text)
+    columns = set(reader.fieldnames or ())
+    missing = REQUIRED_COLUMNS - columns
+    if missing or not columns & {"time_logged", "date"}:
+        raise ImportFailed(
+            f"The header needs {', '.join(sorted(REQUIRED_COLUMNS))} and time_logged or date "
+            f"(missing: {', '.join(sorted(missing)) or 'time_logged/date'})."
+        )
+
+    day_deltas = defaultdict(lambda: dict.fromkeys(FoodLog.MACRO_FIELDS + ('log_count',), 0))
+    day_ids, image_ids = {}, {}
+    imported = 0
+    with transaction.atomic():
+        for lines, rows in _chunks(reader):
+            imported += _import_chunk(user, lines, rows, day_ids, image_ids, day_deltas)
+        if not imported:
+            raise ImportFailed("The file has no rows.")
+        apply_day_deltas(user, day_deltas)
+        responses.bump(user.pk)
+    return imported, len(day_deltas)
+
+
+def _chunks(reader):
+    lines, rows = [], []
+    for row in reader:
+        # Blank cells count as missing, so optional columns can be left empty
+        rows.append({key: value for key, value in row.items() if key and value not in ("", None)})
+        lines.append(reader.line_num)
+        if len(rows) == CHUNK_ROWS:
+            yield lines, rows
+            lines, rows = [], []
+    if rows:
+        yield lines, rows
+
+
+def _import_chunk(user, lines, rows, day_ids, image_ids, day_deltas):
+    ser = FoodLogImportSerializer(data=rows, many=True)
+    if not ser.is_valid():
+        errors = [{"line": line, "errors": row_errors} for line, row_errors in zip(lines, ser.errors) if row_errors]
+        raise ImportFailed("Some rows are invalid, nothing was imported.", errors[:MAX_ERRORS])
+
+    # Days (and weeks) of the chunk resolved together, each date once per import
+    dates = {timezone.localdate(data["time_logged"]) for data in ser.validated_data}
+    new_dates = dates - set(day_ids)
+    if new_dates:
+        day_ids.update(ensure_days(new_dates))
+    new_urls = {data["image_url"] for data in ser.validated_data if data["image_url"]} - set(image_ids)
+    if new_urls:
+        image_ids.update(_image_ids(new_urls))
+
+    logs = []
+    for data in ser.validated_data:
+        day_id = day_ids[timezone.localdate(data["time_logged"])]
+        image_id = image_ids.get(data.pop("image_url"))
+        logs.append(FoodLog(user=user, parent_day_id=day_id, image_id=image_id, **data))
+        deltas = day_deltas[day_id]
+        for field in FoodLog.MACRO_FIELDS:
+            deltas[field] += data[field]
+        deltas['log_count'] += 1
+    # bulk_create skips FoodLog.save(), the totals are applied once per day by import_csv, the user's foods per chunk
+    FoodLog.objects.bulk_create(logs, batch_size=CHUNK_ROWS)
+    UserFood.record(user.pk, added=logs)
+    return len(logs)
+
+
+def _image_ids(urls):
+    # {url: FoodImage id}. A URL we already know (our own export re-imported) keeps its photo's credits, new ones
+    # get a row without an Unsplash id or credits, shared by every log showing that URL
+    found = dict(FoodImage.objects.filter(url__in=urls).values_list("url", "pk"))
+    missing = urls - set(found)
+    if missing:
+        FoodImage.objects.bulk_create([FoodImage(url=url, credit_source="") for url in missing])
+        found.update(FoodImage.objects.filter(url__in=missing).values_list("url", "pk"))
+    return found
@@ -0,0 +1,214 @@
+import csv
+import json
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from fullsnack_project.caching import normalize_query
+from food_data_app import nutrients
+from food_data_app.models import FdcFood
+
+# FDC data types we load, keyed by the names used in the CSV downloads (food.csv "data_type" column)
+DATA_TYPES = {
+    "sr_legacy_food": "SR Legacy",
+    "survey_fndds_food": "Survey (FNDDS)",
+    "branded_food": "Branded",
+}
+# Top-level keys of the JSON downloads and the data type they hold
+JSON_KEYS = {
+    "SRLegacyFoods": "SR Legacy",
+    "SurveyFoods": "Survey (FNDDS)",
+    "BrandedFoods": "Branded",
+}
+# The only nutrients we keep from food_nutrient.csv, nutrient_id -> FdcFood field
+NUTRIENT_FIELDS = {str(nutrient_id): name for name, (nutrient_id, _, _) in nutrients.NUTRIENTS.items()}
+
+BATCH_SIZE = 2000
+# Characters read from a JSON download at a time
+JSON_CHUNK = 1 << 20
+
+
+def iter_json_arrays(f, chunk_size):
+    """
+    Yields (key, item) for every item of the top-level arrays of a {"key": [...], ...} document, decoding one item
+    at a time from chunk_size reads so neither the file nor the arrays are held in memory. Other values are skipped.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos = "", 0
+
+    def more():
+        nonlocal buf, pos
+        chunk = f.read(chunk_size)
+        buf, pos = buf[pos:] + chunk, 0
+        return bool(chunk)
+
+    def peek(skipped=" \t\r\n"):
+        # Moves past whitespace (and separators), returns the next character or "" at the end of the file
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in skipped:
+                pos += 1
+            if pos < len(buf):
+                return buf[pos]
+            if not more():
+                return ""
+
+    def value():
+        nonlocal pos
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Cut off by the end of the chunk
+                if not more():
+                    raise
+                continue
+            # A number right at the end of the chunk may go on in the next one
+            if end == len(buf) and more():
+                continue
+            pos = end
+            return item
+
+    def expect(char):
+        nonlocal pos
+        if peek() != char:
+            raise ValueError(f"Expected {char!r} in the JSON file.")
+        pos += 1
+
+    expect("{")
+    while peek(" \t\r\n,") not in ("}", ""):
+        key = value()
+        expect(":")
+        if peek() != "[":
+            value()
+            continue
+        pos += 1
+        while peek(" \t\r\n,") != "]":
+            yield key, value()
+        pos += 1
+
+
+# Loads the USDA FoodData Central bulk downloads (https://fdc.nal.usda.gov/download-datasets) into FdcFood
+# Usage: python manage.py import_fdc <unzipped CSV folder or .json file> [...]
+# Running it again updates existing rows in place, so newer FDC releases can be loaded over older ones
+class Command(BaseCommand):
+    help = "Imports SR Legacy, FNDDS and Branded foods from FDC bulk CSV folders or JSON files."
+
+    def add_arguments(self, parser):
+        parser.add_argument("paths", nargs="+", help="Unzipped CSV download folders and/or JSON download files.")
+
+    def handle(self, *args, **options):
+        total = 0
+        for raw_path in options["paths"]:
+            path = Path(raw_path)
+            if path.is_dir():
+                count = self.import_csv_folder(path)
+            elif path.suffix.lower() == ".json":
+                count = self.save(self.read_json_file(path))
+            else:
+                raise CommandError(f"{path} is neither a CSV download folder nor a .json file.")
+
+            total += count
+            self.stdout.write(f"{path}: {count} food(s)")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {total} food(s)."))
+
+    def build_row(self, fdc_id, data_type, food, brand_owner=""):
+        # Nutrients are parsed once here instead of on every lookup
+        description = (food.get("description") or "").strip()
+        values = nutrients.parse_food(food)
+        return FdcFood(
+            fdc_id=int(fdc_id),
+            data_type=data_type,
+            description=description[:512],
+            brand_owner=(brand_owner or "")[:255],
+            search_name=normalize_query(description)[:512],
+            **{name: float(value or 0) for name, value in values.items()},
+        )
+
+    def read_json_file(self, path):
+        # The JSON downloads are a single object, e.g. {"SRLegacyFoods": [...]}, read one food at a time
+        with path.open(encoding="utf-8") as f:
+            for key, food in iter_json_arrays(f, JSON_CHUNK):
+                data_type = JSON_KEYS.get(key)
+                if data_type:
+                    yield self.build_row(food["fdcId"], data_type, food, food.get("brandOwner"))
+
+    def import_csv_folder(self, path):
+        food_csv = path / "food.csv"
+        nutrient_csv = path / "food_nutrient.csv"
+        if not food_csv.exists() or not nutrient_csv.exists():
+            raise CommandError(f"{path} must contain food.csv and food_nutrient.csv.")
+
+        # The files are streamed in turn and joined in the database a batch at a time, so memory stays flat
+        # whatever the download's size: the foods (their nutrients reset), then their brands, then their nutrients.
+        # One transaction, so lookups never see a food between two passes
+        with transaction.atomic():
+            count = self.save(self.read_food_csv(food_csv))
+            branded_csv = path / "branded_food.csv"
+            if branded_csv.exists():
+                self.update_foods(self.read_brands_csv(branded_csv), ["brand_owner"])
+            self.update_foods(self.read_nutrient_csv(nutrient_csv), list(nutrients.NUTRIENTS))
+        return count
+
+    def read_food_csv(self, path):
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                data_type = DATA_TYPES.get(row["data_type"])
+                if data_type:
+                    yield self.build_row(row["fdc_id"], data_type, {"description": row["description"]})
+
+    def read_brands_csv(self, path):
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                yield row["fdc_id"], "brand_owner", (row.get("brand_owner") or "")[:255]
+
+    def read_nutrient_csv(self, path):
+        # food_nutrient.csv is by far the biggest file, only the nutrients we use are kept
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                field = NUTRIENT_FIELDS.get(row["nutrient_id"])
+                if field:
+                    yield row["fdc_id"], field, float(row["amount"] or 0)
+
+    def update_foods(self, values, fields):
+        # Sets (fdc_id, field, value) on the imported foods, BATCH_SIZE foods at a time. Foods that weren't
+        # imported (other data types) are ignored, and the first value of a food's field wins
+        batch = {}
+        for fdc_id, field, value in values:
+            batch.setdefault(int(fdc_id), {}).setdefault(field, value)
+            if len(batch) >= BATCH_SIZE:
+                self.apply_updates(batch, fields)
+                batch = {}
+        if batch:
+            self.apply_updates(batch, fields)
+
+    def apply_updates(self, batch, fields):
+        foods = list(FdcFood.objects.filter(fdc_id__in=batch).only("fdc_id", *fields))
+        for food in foods:
+            for field, value in batch[food.fdc_id].items():
+                setattr(food, field, value)
+        FdcFood.objects.bulk_update(foods, fields)
+
+    def save(self, rows):
+        # Upserts in batches so memory stays flat and re-imports overwrite older values
+        count = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= BATCH_SIZE:
+                count += self.flush(batch)
+                batch = []
+        if batch:
+            count += self.flush(batch)
+        return count
+
+    def flush(self, batch):
+        FdcFood.objects.bulk_create(
+            batch,
+            update_conflicts=True,
+            unique_fields=["fdc_id"],
+            update_fields=["data_type", "description", "brand_owner", "search_name", *nutrients.NUTRIENTS],
+        )
+        return len(batch)
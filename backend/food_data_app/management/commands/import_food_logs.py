@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from food_data_app.importer import ImportFailed, import_csv
+
+User = get_user_model()
+
+
+# Imports a CSV of historical food logs for one user, same format as POST /api/v1/foods/import/
+# Usage: python manage.py import_food_logs user@example.com history.csv
+class Command(BaseCommand):
+    help = "Imports food logs (with their original dates) from a CSV file into a user's history."
+
+    def add_arguments(self, parser):
+        parser.add_argument("email")
+        parser.add_argument("path")
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(email=options["email"]).first()
+        if user is None:
+            raise CommandError(f"No user with the email {options['email']}.")
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as text:
+                imported, days = import_csv(user, text)
+        except OSError as e:
+            raise CommandError(str(e))
+        except ImportFailed as e:
+            for error in e.errors:
+                self.stderr.write(f"line {error['line']}: {error['errors']}")
+            raise CommandError(e.detail)
+        self.stdout.write(self.style.SUCCESS(f"Imported {imported} food log(s) over {days} day(s)."))
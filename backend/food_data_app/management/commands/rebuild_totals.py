@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from datetime_app.models import Day, Week
+from food_data_app.models import FoodLog
+from food_data_app.totals import rebuild_user_foods, rebuild_user_totals
+
+
+# Recomputes every Day/Week calorie total, per-user rollup and user food from the food logs in bulk and fixes any that
+# have drifted
+# Usage: python manage.py rebuild_totals [--dry-run]
+class Command(BaseCommand):
+    help = "Reconciles Day/Week calorie totals, the per-user rollups and user foods with the food logs they contain."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Only report how many totals have drifted.")
+
+    def handle(self, *args, **options):
+        # Sum of calories per day / per week, evaluated inside the database as correlated subqueries
+        day_sum = Coalesce(Subquery(
+            FoodLog.objects.filter(parent_day=OuterRef("pk"))
+            .order_by().values("parent_day").annotate(total=Sum("calories")).values("total")
+        ), 0)
+        week_sum = Coalesce(Subquery(
+            FoodLog.objects.filter(parent_day__parent_week=OuterRef("pk"))
+            .order_by().values("parent_day__parent_week").annotate(total=Sum("calories")).values("total")
+        ), 0)
+
+        drifted_days = Day.objects.annotate(actual=day_sum).exclude(daily_calorie_total=F("actual"))
+        drifted_weeks = Week.objects.annotate(actual=week_sum).exclude(weekly_calorie_total=F("actual"))
+
+        if options["dry_run"]:
+            self.stdout.write(f"{drifted_days.count()} day(s) and {drifted_weeks.count()} week(s) have drifted.")
+            return
+
+        # One UPDATE per table, only touching the rows that are actually wrong
+        with transaction.atomic():
+            days_fixed = Day.objects.filter(pk__in=drifted_days.values("pk")).update(daily_calorie_total=day_sum)
+            weeks_fixed = Week.objects.filter(pk__in=drifted_weeks.values("pk")).update(weekly_calorie_total=week_sum)
+            user_days, user_weeks = rebuild_user_totals()
+            user_foods = rebuild_user_foods()
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {days_fixed} day total(s) and {weeks_fixed} week total(s)."))
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {user_days} per-user day and {user_weeks} per-user week rollup(s)."))
+        self.stdout.write(self.style.SUCCESS(f"Rewrote {user_foods} user food(s)."))
@@ -0,0 +1,96 @@
+import random
+from datetime import datetime, time, timedelta
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from datetime_app.resolver import ensure_days
+from food_data_app.models import FoodLog
+
+User = get_user_model()
+
+# (name, calories, protein, carbs, fat) per serving
+FOODS = (
+    ("Oatmeal", 150, 5, 27, 3), ("Banana", 105, 1, 27, 0), ("Greek yogurt", 100, 17, 6, 0),
+    ("Scrambled eggs", 180, 12, 2, 14), ("Whole wheat toast", 80, 4, 14, 1), ("Coffee with milk", 40, 2, 4, 2),
+    ("Chicken breast", 280, 53, 0, 6), ("Brown rice", 215, 5, 45, 2), ("Caesar salad", 330, 9, 12, 28),
+    ("Turkey sandwich", 360, 24, 38, 12), ("Apple", 95, 0, 25, 0), ("Almonds", 165, 6, 6, 14),
+    ("Salmon fillet", 370, 40, 0, 22), ("Pasta with marinara", 420, 14, 78, 6), ("Steamed broccoli", 55, 4, 11, 1),
+    ("Cheeseburger", 540, 30, 40, 28), ("French fries", 365, 4, 48, 17), ("Protein shake", 160, 30, 5, 2),
+    ("Pepperoni pizza slice", 300, 13, 34, 12), ("Dark chocolate", 170, 2, 13, 12),
+)
+# Hours of the day logs are spread over (breakfast to late snack)
+MEAL_HOURS = (7, 10, 12, 15, 18, 21)
+
+
+# Bulk-generates users with a few weeks of food logs for load testing (see benchmarks/load.py)
+# Usage: python manage.py seed_load_data --users 50 --logs-per-day 5 --days 60 --tokens-file tokens.txt
+class Command(BaseCommand):
+    help = "Creates load-test users (loadN@example.com) with food logs, days, weeks and rollups."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--logs-per-day", type=int, default=4)
+        parser.add_argument("--days", type=int, default=30, help="Days of history ending today.")
+        parser.add_argument("--password", default="loadtest123")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed, the same seed gives the same logs.")
+        parser.add_argument("--tokens-file", help="Writes one auth token per line for the load harness.")
+
+    def handle(self, *args, **options):
+        users, per_day, days = options["users"], options["logs_per_day"], options["days"]
+        if users < 1 or per_day < 1 or days < 1:
+            raise CommandError("--users, --logs-per-day and --days must be at least 1.")
+        rng = random.Random(options["seed"])
+        today = timezone.now().date()
+        dates = [today - timedelta(days=offset) for offset in range(days)]
+
+        with transaction.atomic():
+            clients = self.create_users(users, options["password"])
+            # Weeks and Days are shared by every user, only the missing ones are created
+            day_ids = ensure_days(dates)
+
+            logs = []
+            for client in clients:
+                for log_date in dates:
+                    for _ in range(per_day):
+                        name, calories, protein, carbs, fat = rng.choice(FOODS)
+                        # Portions vary a little so totals aren't all multiples of the same numbers
+                        scale = rng.uniform(0.75, 1.5)
+                        logged_at = timezone.make_aware(datetime.combine(log_date, time(rng.choice(MEAL_HOURS))))
+                        logs.append(FoodLog(
+                            user=client, parent_day_id=day_ids[log_date], time_logged=logged_at, food_name=name,
+                            calories=round(calories * scale), protein=round(protein * scale),
+                            carbs=round(carbs * scale), fat=round(fat * scale),
+                        ))
+            # bulk_create skips FoodLog.save(), the totals are rebuilt in one pass below
+            FoodLog.objects.bulk_create(logs, batch_size=2000)
+
+            call_command("rebuild_totals", stdout=self.stdout)
+
+        if options["tokens_file"]:
+            keys = Token.objects.filter(user__in=clients).values_list("key", flat=True)
+            Path(options["tokens_file"]).write_text("\n".join(keys) + "\n")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(clients)} user(s) and {len(logs)} food log(s) over {days} day(s)."
+        ))
+
+    def create_users(self, count, password):
+        # Next free loadN@example.com numbers, so the command can be run again to add more users
+        start = User.objects.filter(email__startswith="load", email__endswith="@example.com").count()
+        hashed = make_password(password)  # hashing once, it is deliberately slow
+        emails = [f"load{n}@example.com" for n in range(start, start + count)]
+        User.objects.bulk_create(
+            [User(username=email, email=email, password=hashed, first_name="Load", last_name="Tester")
+             for email in emails],
+            batch_size=1000,
+        )
+        clients = list(User.objects.filter(email__in=emails))
+        Token.objects.bulk_create([Token(user=client, key=Token.generate_key()) for client in clients])
+        return clients
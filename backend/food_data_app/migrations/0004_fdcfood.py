@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    # Trigram index so LIKE '%word%' searches on search_name use an index, only available on Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS food_data_app_fdcfood_search_trgm '
+        'ON food_data_app_fdcfood USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS food_data_app_fdcfood_search_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0003_foodlog_image_credit_name_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FdcFood',
+            fields=[
+                ('fdc_id', models.PositiveIntegerField(primary_key=True, serialize=False)),
+                ('data_type', models.CharField(max_length=30)),
+                ('description', models.CharField(max_length=512)),
+                ('brand_owner', models.CharField(blank=True, max_length=255)),
+                ('search_name', models.CharField(db_index=True, max_length=512)),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fat', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0004_fdcfood'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fdcfood',
+            name='fiber',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fdcfood',
+            name='sodium',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fdcfood',
+            name='sugar',
+            field=models.FloatField(default=0),
+        ),
+    ]
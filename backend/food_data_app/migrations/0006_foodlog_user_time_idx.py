@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:43
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('datetime_app', '0002_user_totals'),
+        ('food_data_app', '0005_fdcfood_fiber_sugar_sodium'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='foodlog',
+            index=models.Index(fields=['user', 'time_logged'], name='foodlog_user_time_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0006_foodlog_user_time_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='foodlog',
+            name='time_logged',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
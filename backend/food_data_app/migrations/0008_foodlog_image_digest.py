@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0007_foodlog_time_logged_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlog',
+            name='image_digest',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
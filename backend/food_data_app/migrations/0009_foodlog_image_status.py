@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:30
+
+from django.db import migrations, models
+
+
+def mark_existing_images(apps, schema_editor):
+    # Logs that already have an image got it synchronously, before image jobs existed
+    FoodLog = apps.get_model('food_data_app', 'FoodLog')
+    FoodLog.objects.exclude(image_url__isnull=True).exclude(image_url='').update(image_status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0008_foodlog_image_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlog',
+            name='image_status',
+            field=models.CharField(blank=True, choices=[('', 'No image'), ('pending', 'Pending'), ('ready', 'Ready'), ('failed', 'Failed')], default='', max_length=10),
+        ),
+        migrations.RunPython(mark_existing_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def check_constraints_now(schema_editor):
+    # The new foreign key is DEFERRABLE INITIALLY DEFERRED on Postgres: the updates below would leave its checks
+    # pending until commit, and the columns dropped later in this (atomic) migration can't be altered while they are
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+
+
+def move_images(apps, schema_editor):
+    # One FoodImage per distinct image URL on the logs (its first credits win), then each log points at its image
+    check_constraints_now(schema_editor)
+    FoodLog = apps.get_model('food_data_app', 'FoodLog')
+    FoodImage = apps.get_model('image_app', 'FoodImage')
+
+    rows = (
+        FoodLog.objects.exclude(image_url__isnull=True).exclude(image_url='').order_by()
+        .values_list('image_url', 'image_credit_name', 'image_credit_profile', 'image_credit_source', 'image_digest')
+        .distinct()
+    )
+    images = {}
+    for url, name, profile, source, digest in rows.iterator():
+        if url not in images:
+            images[url] = FoodImage.objects.create(
+                url=url, digest=digest, credit_name=name, credit_profile=profile, credit_source=source,
+            )
+        elif digest and not images[url].digest:
+            images[url].digest = digest
+            images[url].save(update_fields=['digest'])
+    for url, image in images.items():
+        FoodLog.objects.filter(image_url=url).update(image=image)
+
+
+def copy_images_back(apps, schema_editor):
+    check_constraints_now(schema_editor)
+    FoodLog = apps.get_model('food_data_app', 'FoodLog')
+    FoodImage = apps.get_model('image_app', 'FoodImage')
+    for image in FoodImage.objects.filter(logs__isnull=False).distinct().iterator():
+        FoodLog.objects.filter(image=image).update(
+            image_url=image.url, image_digest=image.digest, image_credit_name=image.credit_name,
+            image_credit_profile=image.credit_profile, image_credit_source=image.credit_source,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0009_foodlog_image_status'),
+        ('image_app', '0002_foodimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='foodlog',
+            name='image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='logs', to='image_app.foodimage'),
+        ),
+        migrations.RunPython(move_images, copy_images_back),
+        migrations.RemoveField(
+            model_name='foodlog',
+            name='image_credit_name',
+        ),
+        migrations.RemoveField(
+            model_name='foodlog',
+            name='image_credit_profile',
+        ),
+        migrations.RemoveField(
+            model_name='foodlog',
+            name='image_credit_source',
+        ),
+        migrations.RemoveField(
+            model_name='foodlog',
+            name='image_digest',
+        ),
+        migrations.RemoveField(
+            model_name='foodlog',
+            name='image_url',
+        ),
+    ]
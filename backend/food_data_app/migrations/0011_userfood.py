@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:47
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_trigram_index(apps, schema_editor):
+    # Same as FdcFood's (migration 0004): autocomplete's LIKE '%word%' on search_name uses an index on Postgres
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS food_data_app_userfood_search_trgm '
+        'ON food_data_app_userfood USING gin (search_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS food_data_app_userfood_search_trgm')
+
+
+def backfill_user_foods(apps, schema_editor):
+    # One food per user and normalized name from the logs that already exist, the newest log's values win
+    FoodLog = apps.get_model('food_data_app', 'FoodLog')
+    UserFood = apps.get_model('food_data_app', 'UserFood')
+
+    foods = {}
+    rows = FoodLog.objects.order_by('time_logged', 'pk').values_list(
+        'user_id', 'food_name', 'calories', 'protein', 'carbs', 'fat', 'image_id', 'time_logged'
+    )
+    for user_id, name, calories, protein, carbs, fat, image_id, time_logged in rows.iterator(chunk_size=2000):
+        key = " ".join(name.lower().split())[:100]
+        food = foods.get((user_id, key))
+        if food is None:
+            food = foods[user_id, key] = UserFood(user_id=user_id, search_name=key, log_count=0)
+        food.log_count += 1
+        food.name, food.calories, food.protein, food.carbs, food.fat = name, calories, protein, carbs, fat
+        food.image_id, food.last_logged = image_id, time_logged
+    UserFood.objects.bulk_create(foods.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('food_data_app', '0010_foodlog_image'),
+        ('image_app', '0002_foodimage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserFood',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('search_name', models.CharField(max_length=100)),
+                ('calories', models.PositiveIntegerField()),
+                ('protein', models.PositiveIntegerField()),
+                ('carbs', models.PositiveIntegerField()),
+                ('fat', models.PositiveIntegerField()),
+                ('log_count', models.PositiveIntegerField(default=0)),
+                ('last_logged', models.DateTimeField()),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='user_foods', to='image_app.foodimage')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='foods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'search_name'), name='unique_user_food')],
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_user_foods, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,38 @@
-from django.db import models
+from collections import defaultdict
+from django.db import IntegrityError, models, transaction
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime_app.models import Day, Week
-from datetime import timedelta
+from datetime_app.models import Day, UserDayTotal, UserWeekTotal
+from datetime_app.resolver import resolve_day
+from fullsnack_project.caching import normalize_query, responses
+from datetime import datetime, time, timedelta
 
 User = get_user_model()
 
+def get_log_day(log_date):
+    # Day (and its Week) that logs made on log_date belong to, created on first use (see datetime_app/resolver.py)
+    return resolve_day(log_date)
+
+
+def logged_between(start, end):
+    # Filter kwargs for the logs filed under the local days start..end (inclusive, either may be None). Logs go to
+    # the Day of their local time_logged date, so bounding time_logged is the same and uses (user, time_logged)
+    bounds = {}
+    if start:
+        bounds['time_logged__gte'] = timezone.make_aware(datetime.combine(start, time.min))
+    if end:
+        bounds['time_logged__lt'] = timezone.make_aware(datetime.combine(end + timedelta(days=1), time.min))
+    return bounds
+
+
+class ImageStatus(models.TextChoices):
+    # Where a log's image stands, clients poll it after asking for one (image_app/jobs.py finds it in the background)
+    NONE = "", "No image"
+    PENDING = "pending", "Pending"
+    READY = "ready", "Ready"
+    FAILED = "failed", "Failed"
+
+
 class FoodLog(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='foodlogs')
     food_name = models.CharField(max_length=100)
@@ -13,36 +40,111 @@ class FoodLog(models.Model):
     protein = models.PositiveIntegerField()
     carbs = models.PositiveIntegerField()
     fat = models.PositiveIntegerField()
-    image_url = models.URLField(max_length=2048, blank=True, null=True)
-    time_logged = models.DateTimeField(auto_now_add=True)
+    # Now by default, imports (see importer.py) bring their own historical timestamps
+    time_logged = models.DateTimeField(default=timezone.now)
     parent_day = models.ForeignKey(Day, on_delete=models.CASCADE, related_name='logs')
-    # Used for Unsplash required credits for used image
-    image_credit_name = models.CharField(max_length=120, blank=True)
-    image_credit_profile = models.URLField(blank=True)
-    image_credit_source = models.CharField(max_length=50, blank=True, default="Unsplash")
+    # The photo and its credits live in one shared row, readers select_related() it
+    image = models.ForeignKey('image_app.FoodImage', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='logs')
+    image_status = models.CharField(max_length=10, choices=ImageStatus.choices, blank=True, default=ImageStatus.NONE)
+
+    MACRO_FIELDS = ('calories', 'protein', 'carbs', 'fat')
+
+    class Meta:
+        indexes = [
+            # Serves a user's history newest first and the keyset pagination of the range query
+            models.Index(fields=['user', 'time_logged'], name='foodlog_user_time_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembers the stored macros so save()/delete() only have to apply the difference to the totals
+        instance._stored_macros = {field: instance.__dict__.get(field) for field in cls.MACRO_FIELDS}
+        # and what the user's foods (UserFood) took from it, the fields loaded at least
+        instance._stored_food = {field: instance.__dict__[field] for field in ('food_name', 'image_id')
+                                 if field in instance.__dict__}
+        return instance
 
     def save(self, *args, **kwargs):
-        if not self.pk:
-            log_date = timezone.now().date()
-            week_start = log_date - timedelta(days=log_date.weekday())
-            week, _ = Week.objects.get_or_create(start_date=week_start)
-            day, _ = Day.objects.get_or_create(date=log_date, defaults={'parent_week': week})
-            self.parent_day = day
-
-        super().save(*args, **kwargs)
-
-        # Keeps an aggregate of the calories logged today
-        self.parent_day.daily_calorie_total = self.parent_day.logs.aggregate(
-            total=models.Sum('calories'))['total'] or 0
-        self.parent_day.save()
-
-        # Keeps an aggregate of  the calories logged this week, double underscore in filter means look at the parent_day variable and find it's parent week variable
-        self.parent_day.parent_week.weekly_calorie_total = FoodLog.objects.filter(
-            parent_day__parent_week=self.parent_day.parent_week
-        ).aggregate(total=models.Sum('calories'))['total'] or 0
-        self.parent_day.parent_week.save()
+        update_fields = kwargs.get('update_fields')
+
+        def saved(*names):
+            return update_fields is None or any(name in update_fields for name in names)
+
+        # The log and its day/week totals are written together or not at all
+        with transaction.atomic():
+            if not self.pk:
+                self.parent_day = get_log_day(timezone.localdate(self.time_logged))
+                deltas = {field: getattr(self, field) for field in self.MACRO_FIELDS}
+                deltas['log_count'] = 1
+                food_changed, removed = True, ()
+            else:
+                stored = self._get_stored_macros()
+                deltas = {field: getattr(self, field) - stored[field] if saved(field) else 0
+                          for field in self.MACRO_FIELDS}
+                name = self._get_stored_name()
+                stored_food = getattr(self, '_stored_food', {})
+                # Status-only saves and updates that keep the name, macros and image leave the user's foods
+                # alone; an image that wasn't loaded counts as changed
+                food_changed = (
+                    any(deltas.values())
+                    or (saved('food_name') and self.food_name != name)
+                    or (saved('image', 'image_id') and self.image_id != stored_food.get('image_id', object()))
+                )
+                removed = [(name, self.time_logged)]
+
+            super().save(*args, **kwargs)
+
+            # Applies only the change in macros instead of re-aggregating every log of the day and week
+            self._apply_deltas(deltas)
+            if food_changed:
+                UserFood.record(self.user_id, added=[self], removed=removed)
+            self._stored_macros = {field: getattr(self, field) for field in self.MACRO_FIELDS}
+            self._stored_food = {'food_name': self.food_name, 'image_id': self.image_id}
+            # Any change (image included) invalidates the user's cached dashboard reads
+            responses.bump(self.user_id)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            deltas = {field: -value for field, value in self._get_stored_macros().items()}
+            deltas['log_count'] = -1
+            name = self._get_stored_name()
+            result = super().delete(*args, **kwargs)
+            self._apply_deltas(deltas)
+            UserFood.record(self.user_id, removed=[(name, self.time_logged)])
+            responses.bump(self.user_id)
+        return result
+
+    def _get_stored_macros(self):
+        # Instances not loaded through the ORM (or with macros deferred) fall back to reading the row
+        stored = getattr(self, '_stored_macros', None)
+        if stored is None or None in stored.values():
+            row = FoodLog.objects.filter(pk=self.pk).values(*self.MACRO_FIELDS).first()
+            stored = row or {field: 0 for field in self.MACRO_FIELDS}
+        return stored
+
+    def _get_stored_name(self):
+        name = getattr(self, '_stored_food', {}).get('food_name')
+        if name is None:
+            name = FoodLog.objects.filter(pk=self.pk).values_list('food_name', flat=True).first() or self.food_name
+        return name
+
+    def _apply_deltas(self, deltas):
+        if not any(deltas.values()):
+            return
+        # Day, Week, UserDayTotal then UserWeekTotal: the lock order bulk.apply_day_deltas uses too
+        day = self.parent_day
+        if deltas['calories']:
+            day.apply_calorie_delta(deltas['calories'])
+
+        # Per-user rollups read by the dashboard
+        week_start = day.date - timedelta(days=day.date.weekday())
+        UserDayTotal.apply_delta(deltas, user_id=self.user_id, date=day.date, week_start=week_start)
+        UserWeekTotal.apply_delta(deltas, user_id=self.user_id, week_start=week_start)
 
     def recalculate_totals(self):
+        # Full re-aggregation, only needed to repair totals that have drifted (see the rebuild_totals command)
         day = self.parent_day
         week = day.parent_week
 
@@ -52,4 +154,140 @@ class FoodLog(models.Model):
         week.weekly_calorie_total = FoodLog.objects.filter(
             parent_day__parent_week=week
         ).aggregate(total=models.Sum('calories'))['total'] or 0
-        week.save()
\ No newline at end of file
+        week.save()
+
+
+# The user's own foods: one row per distinct (normalized) food name they logged, with the macros and image of the
+# newest of those logs and how many there are. Re-logging from here needs no USDA or Unsplash lookup.
+# Kept up to date by record(): FoodLog.save()/delete() for single writes, bulk.py and importer.py once per batch
+# (totals.rebuild_user_foods() recomputes the whole table)
+class UserFood(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='foods')
+    # As the newest log spells it
+    name = models.CharField(max_length=100)
+    # food_key(name), what autocomplete matches against
+    # Postgres also gets a pg_trgm GIN index on it (see migration 0011) so substring matches stay indexed
+    search_name = models.CharField(max_length=100)
+    calories = models.PositiveIntegerField()
+    protein = models.PositiveIntegerField()
+    carbs = models.PositiveIntegerField()
+    fat = models.PositiveIntegerField()
+    image = models.ForeignKey('image_app.FoodImage', on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='user_foods')
+    log_count = models.PositiveIntegerField(default=0)
+    last_logged = models.DateTimeField()
+
+    COPIED_FIELDS = ('name', 'calories', 'protein', 'carbs', 'fat', 'image', 'last_logged')
+
+    class Meta:
+        constraints = [
+            # Its index serves the user's prefix lookups too
+            models.UniqueConstraint(fields=['user', 'search_name'], name='unique_user_food'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.user_id})"
+
+    @staticmethod
+    def food_key(name):
+        # "Greek  Yogurt" and "greek yogurt" are the same food
+        return normalize_query(name)[:100]
+
+    @classmethod
+    def record(cls, user_id, added=(), removed=()):
+        """
+        Counts logs in or out of the user's foods, in one SELECT and one write per kind of change.
+        added: FoodLogs now carrying their name (created, updated or renamed to it), the newest one's macros and
+        image become the food's. removed: (name, time_logged) of logs that no longer do (deleted, or updated:
+        an update is passed in both, so its count doesn't change).
+        """
+        changes = defaultdict(lambda: {'count': 0, 'added': [], 'newest': None, 'removed': None})
+        for log in added:
+            change = changes[cls.food_key(log.food_name)]
+            change['count'] += 1
+            change['added'].append(log)
+            # Of logs made at the same time, the last one given wins
+            if change['newest'] is None or log.time_logged >= change['newest'].time_logged:
+                change['newest'] = log
+        for name, time_logged in removed:
+            change = changes[cls.food_key(name)]
+            change['count'] -= 1
+            change['removed'] = max(change['removed'] or time_logged, time_logged)
+        if not changes:
+            return
+
+        foods = {
+            food.search_name: food
+            for food in cls.objects.select_for_update().filter(user_id=user_id, search_name__in=list(changes))
+        }
+        new, changed, emptied = [], [], []
+        for key, change in changes.items():
+            newest = change['newest']
+            food = foods.get(key)
+            if food is None:
+                # Removing a log of a food that isn't there (the table drifted) has nothing to take from
+                if newest is not None and change['count'] > 0:
+                    new.append(cls(user_id=user_id, search_name=key, log_count=change['count']).copy_log(newest))
+                continue
+            food.log_count = max(food.log_count + change['count'], 0)
+            if not food.log_count:
+                emptied.append(food.pk)
+                continue
+            if newest is not None and newest.time_logged >= food.last_logged:
+                food.copy_log(newest)
+            elif change['removed'] is not None and change['removed'] >= food.last_logged:
+                # The log the food was showing is gone, the newest one left takes over
+                food.copy_log(food.newest_log() or food)
+            changed.append(food)
+
+        if emptied:
+            cls.objects.filter(pk__in=emptied).delete()
+        if changed:
+            cls.objects.bulk_update(changed, ['log_count', *cls.COPIED_FIELDS])
+        if new:
+            try:
+                # Savepoint so a concurrent first log of the same food doesn't break the surrounding transaction
+                with transaction.atomic():
+                    cls.objects.bulk_create(new)
+            except IntegrityError:
+                # Their rows exist now, counted in again as updates
+                cls.record(user_id, added=[log for food in new for log in changes[food.search_name]['added']])
+
+    def copy_log(self, log):
+        # Takes the name, macros and image of log (a FoodLog, or this food itself to keep what it has)
+        self.name = getattr(log, 'food_name', self.name)[:100]
+        for field in FoodLog.MACRO_FIELDS:
+            setattr(self, field, getattr(log, field))
+        self.image_id = log.image_id
+        self.last_logged = getattr(log, 'time_logged', self.last_logged)
+        return self
+
+    def newest_log(self):
+        # The user's newest log counted under this food, None when there is none left
+        logs = FoodLog.objects.filter(user_id=self.user_id)
+        for word in self.search_name.split():
+            logs = logs.filter(food_name__icontains=word)
+        logs = logs.order_by('-time_logged').iterator()
+        return next((log for log in logs if self.food_key(log.food_name) == self.search_name), None)
+
+
+# Local copy of USDA FoodData Central foods, loaded from the bulk downloads by the import_fdc command
+# Macros are extracted once at import time (per 100 g, like the FDC search API) so lookups are a single indexed query
+class FdcFood(models.Model):
+    fdc_id = models.PositiveIntegerField(primary_key=True)
+    data_type = models.CharField(max_length=30)
+    description = models.CharField(max_length=512)
+    brand_owner = models.CharField(max_length=255, blank=True)
+    # Lower-cased, whitespace-normalized description that searches run against
+    # Postgres also gets a pg_trgm GIN index on it (see migration 0004) so substring matches stay indexed
+    search_name = models.CharField(max_length=512, db_index=True)
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fat = models.FloatField(default=0)
+    fiber = models.FloatField(default=0)
+    sugar = models.FloatField(default=0)
+    sodium = models.FloatField(default=0)  # mg
+
+    def __str__(self):
+        return self.description
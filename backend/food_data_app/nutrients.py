@@ -0,0 +1,77 @@
+# backend/food_data_app/nutrients.py
+# Parses FoodData Central (FDC) food records into nutrient values.
+# Works with both the search API shape ({"nutrientId", "nutrientNumber", "value"})
+# and the bulk download shape ({"nutrient": {"id", "number"}, "amount"}).
+
+# name -> (FDC nutrient id, legacy nutrient number, labelNutrients keys used by branded foods)
+# FDC labels carbs/fat as "carbohydrates"/"fat", the older "totalCarbohydrate"/"totalFat" keys are still accepted
+NUTRIENTS = {
+    "calories": (1008, "208", ("calories",)),                          # Energy (kcal)
+    "protein": (1003, "203", ("protein",)),                            # Protein (g)
+    "carbs": (1005, "205", ("totalCarbohydrate", "carbohydrates")),    # Carbohydrate, by difference (g)
+    "fat": (1004, "204", ("totalFat", "fat")),                         # Total lipid (fat) (g)
+    "fiber": (1079, "291", ("fiber",)),                                # Fiber, total dietary (g)
+    "sugar": (2000, "269", ("sugars",)),                               # Sugars, total (g)
+    "sodium": (1093, "307", ("sodium",)),                              # Sodium, Na (mg)
+}
+MACROS = ("calories", "protein", "carbs", "fat")
+NUTRIENT_IDS = frozenset(nutrient_id for nutrient_id, _, _ in NUTRIENTS.values())
+
+# Lookup tables built once: nutrient id (as int and as str) or number (as str, see index_nutrients) -> name in NUTRIENTS
+_BY_ID = {}
+_BY_NUMBER = {}
+for _name, (_nutrient_id, _number, _) in NUTRIENTS.items():
+    _BY_ID[_nutrient_id] = _BY_ID[str(_nutrient_id)] = _name
+    _BY_NUMBER[_number] = _name
+
+
+def index_nutrients(food):
+    # Builds {name: value} for the NUTRIENTS present in foodNutrients in a single pass,
+    # stopping as soon as all of them were found. Ids and numbers are matched through the tables above,
+    # so ids aren't cast to str per comparison like the old get_val scan did. Numbers are strings in FDC data but
+    # some sources send them as ints, they are cast before the lookup.
+    index = {}
+    remaining = len(NUTRIENTS)
+    for n in food.get("foodNutrients") or ():
+        nested = n.get("nutrient")
+        if nested is None:
+            name = _BY_ID.get(n.get("nutrientId")) or _BY_NUMBER.get(str(n.get("nutrientNumber")))
+            value = n.get("value")
+        else:
+            name = _BY_ID.get(nested.get("id")) or _BY_NUMBER.get(str(nested.get("number")))
+            value = n.get("amount")
+        # The first entry for a nutrient wins, like the old linear scan
+        if name is not None and name not in index:
+            index[name] = value
+            remaining -= 1
+            if not remaining:
+                break
+    return index
+
+
+def parse_food(food):
+    # Returns {"calories": ..., "protein": ..., ..., "sodium": ...}, missing nutrients are None
+    values = index_nutrients(food)
+    labels = None
+    for name, (_, _, label_keys) in NUTRIENTS.items():
+        value = values.get(name)
+        # Fallback: branded items often only have labelNutrients (per serving)
+        if value in (None, 0):
+            if labels is None:
+                labels = food.get("labelNutrients") or {}
+            for key in label_keys:
+                label_value = (labels.get(key) or {}).get("value")
+                if label_value is not None:
+                    value = label_value
+                    break
+        values[name] = value
+    return values
+
+
+def parse_foods(foods):
+    # Batch version of parse_food, keeps the input order
+    return [parse_food(food) for food in foods]
+
+
+def has_macros(values):
+    return any(values[name] not in (None, 0) for name in MACROS)
@@ -0,0 +1,11 @@
+# backend/food_data_app/pagination.py
+from rest_framework.pagination import CursorPagination
+
+
+# Keyset pagination over a user's logs, newest first
+# The cursor encodes the last time_logged seen, so every page is an indexed range scan (no OFFSET)
+class FoodLogCursorPagination(CursorPagination):
+    ordering = ("-time_logged", "-id")
+    page_size = 100
+    page_size_query_param = "page_size"
+    max_page_size = 500
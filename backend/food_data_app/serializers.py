@@ -1,7 +1,28 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import FoodLog
+from image_app import thumbnails
+from .models import FoodLog, UserFood
+
+# Reads from the log's shared FoodImage: views select_related("image"), null when the log has none
+def image_field(source, field=serializers.CharField):
+    return field(source=f"image.{source}", read_only=True, allow_null=True)
+
+
+def thumbnail_links(image):
+    if image is None or not image.digest:
+        return None
+    return {size: reverse("image-thumbnail", args=[image.digest, size]) for size in thumbnails.SIZES}
+
 
 class FoodLogSerializer(serializers.ModelSerializer):
+    image_url = image_field("url", serializers.URLField)
+    image_credit_name = image_field("credit_name")
+    image_credit_profile = image_field("credit_profile", serializers.URLField)
+    image_credit_photo = image_field("credit_photo", serializers.URLField)
+    image_credit_source = image_field("credit_source")
+    # Paths of the image's local copies by size (see image_app/thumbnails.py), null while image_url is all there is
+    thumbnails = serializers.SerializerMethodField()
+
     class Meta:
         model = FoodLog
         fields = [
@@ -18,6 +39,35 @@ class FoodLogSerializer(serializers.ModelSerializer):
             'image_credit_name', 
             'image_credit_profile', 
             'image_credit_source',
-            'time_logged'
+            'image_credit_photo',
+            'thumbnails',
+            'image_status',
         ]
-        read_only_fields = ["id", "image_url", "time_logged", "parent_day", "user"]
\ No newline at end of file
+        read_only_fields = ["id", "time_logged", "parent_day", "user", "image_status"]
+
+    def get_thumbnails(self, obj):
+        return thumbnail_links(obj.image)
+
+
+# Log history rows also carry their day and week, the view select_related()s both so this costs no extra queries
+class FoodLogHistorySerializer(FoodLogSerializer):
+    date = serializers.DateField(source="parent_day.date", read_only=True)
+    week_start = serializers.DateField(source="parent_day.parent_week.start_date", read_only=True)
+
+    class Meta(FoodLogSerializer.Meta):
+        fields = FoodLogSerializer.Meta.fields + ["date", "week_start"]
+
+
+# The user's own foods (autocomplete, "log again"), the view select_related()s the image
+class UserFoodSerializer(serializers.ModelSerializer):
+    image_url = image_field("url", serializers.URLField)
+    thumbnails = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserFood
+        fields = ["id", "name", "calories", "protein", "carbs", "fat", "image_url", "thumbnails", "log_count",
+                  "last_logged"]
+        read_only_fields = fields
+
+    def get_thumbnails(self, obj):
+        return thumbnail_links(obj.image)
@@ -0,0 +1,84 @@
+# backend/food_data_app/totals.py
+# Bulk (re)computation of the per-user rollups from the food logs themselves.
+# Single writes keep the rollups (and the user's foods) up to date incrementally in FoodLog.save()/delete(), this is for
+# repairs and bulk paths.
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from datetime_app.models import UserDayTotal, UserWeekTotal
+from fullsnack_project.caching import responses
+from .models import FoodLog, UserFood
+
+ROLLUP_SUMS = dict(
+    calories=Sum('calories'),
+    protein=Sum('protein'),
+    carbs=Sum('carbs'),
+    fat=Sum('fat'),
+    log_count=Count('id'),
+)
+
+
+def rebuild_user_totals():
+    # Replaces every rollup row with fresh aggregates, returns how many day and week rows were written
+    logs = FoodLog.objects.order_by()
+
+    day_rows = list(
+        logs.values('user_id', 'parent_day__date', 'parent_day__parent_week__start_date').annotate(**ROLLUP_SUMS)
+    )
+    week_rows = list(
+        logs.values('user_id', 'parent_day__parent_week__start_date').annotate(**ROLLUP_SUMS)
+    )
+
+    with transaction.atomic():
+        UserDayTotal.objects.all().delete()
+        UserWeekTotal.objects.all().delete()
+
+        UserDayTotal.objects.bulk_create(
+            [
+                UserDayTotal(
+                    user_id=row['user_id'],
+                    date=row['parent_day__date'],
+                    week_start=row['parent_day__parent_week__start_date'],
+                    **{field: row[field] for field in ROLLUP_SUMS},
+                )
+                for row in day_rows
+            ],
+            batch_size=1000,
+        )
+        UserWeekTotal.objects.bulk_create(
+            [
+                UserWeekTotal(
+                    user_id=row['user_id'],
+                    week_start=row['parent_day__parent_week__start_date'],
+                    **{field: row[field] for field in ROLLUP_SUMS},
+                )
+                for row in week_rows
+            ],
+            batch_size=1000,
+        )
+        # Every user's cached reads may be built on the old rows
+        transaction.on_commit(responses.cache.clear)
+    return len(day_rows), len(week_rows)
+
+
+def rebuild_user_foods():
+    # Replaces every UserFood row with one per user and food name, returns how many were written
+    foods = {}
+    rows = FoodLog.objects.order_by('time_logged', 'pk').values_list(
+        'user_id', 'food_name', *FoodLog.MACRO_FIELDS, 'image_id', 'time_logged'
+    )
+    for user_id, name, calories, protein, carbs, fat, image_id, time_logged in rows.iterator(chunk_size=2000):
+        key = UserFood.food_key(name)
+        food = foods.get((user_id, key))
+        if food is None:
+            food = foods[user_id, key] = UserFood(user_id=user_id, search_name=key, log_count=0)
+        food.log_count += 1
+        # Oldest first, so the newest log's values are the ones left
+        food.name, food.calories, food.protein, food.carbs, food.fat = name, calories, protein, carbs, fat
+        food.image_id, food.last_logged = image_id, time_logged
+
+    with transaction.atomic():
+        UserFood.objects.all().delete()
+        UserFood.objects.bulk_create(foods.values(), batch_size=1000)
+        transaction.on_commit(responses.cache.clear)
+    return len(foods)
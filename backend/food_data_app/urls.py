@@ -1,8 +1,19 @@
 from django.urls import path
-from .views import FoodLogs, FoodLogSingle, NutritionLookup
+from .views import (
+    FoodLogs, FoodLogSingle, FoodLogBulk, FoodLogExport, FoodLogImport, NutritionLookup, UserFoods, LogUserFoodAgain,
+)
+from .async_views import AsyncNutritionLookup
 
 urlpatterns = [
     path('', FoodLogs.as_view(), name='foodlogs'),
     path('<int:pk>/', FoodLogSingle.as_view(), name='foodlog-single'),
+    path('bulk/', FoodLogBulk.as_view(), name='foodlog-bulk'),
+    path('export/', FoodLogExport.as_view(), name='foodlog-export'),
+    path('import/', FoodLogImport.as_view(), name='foodlog-import'),
+    # The user's own foods: autocomplete and one tap re-logging, without going to USDA
+    path('mine/', UserFoods.as_view(), name='user-foods'),
+    path('mine/<int:pk>/log/', LogUserFoodAgain.as_view(), name='user-food-log'),
     path('nutrition/', NutritionLookup.as_view(), name='nutrition-lookup'),
+    # Same lookup served without blocking a worker while FDC answers (needs the ASGI server)
+    path('nutrition/async/', AsyncNutritionLookup.as_view(), name='nutrition-lookup-async'),
 ]
\ No newline at end of file
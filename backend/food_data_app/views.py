@@ -1,8 +1,12 @@
 # backend/food_data_app/views.py
 from datetime import date
+import io
 import requests
 
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 
@@ -11,14 +15,26 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status as s
 
-from .models import FoodLog
-from .serializers import FoodLogSerializer
+from datetime_app.models import Day
+from fullsnack_project import quota
+from fullsnack_project.conditional import user_data_response
+from image_app import jobs
+from .models import FoodLog, ImageStatus, UserFood, logged_between
+from .serializers import FoodLogSerializer, FoodLogHistorySerializer, UserFoodSerializer
+from .pagination import FoodLogCursorPagination
+from . import bulk, export, fdc, importer
 
 
 # ---------------------------------------------------------------------
 # /api/v1/foods/           -> list/create (optionally filter by ?day=YYYY-MM-DD)
+#                             or a cursor-paginated range: ?start=YYYY-MM-DD&end=YYYY-MM-DD
 # /api/v1/foods/<pk>/      -> retrieve/update/delete (scoped to request.user)
 # /api/v1/foods/nutrition/ -> USDA proxy: ?query=food name  (returns {"item": {...}})
+# /api/v1/foods/bulk/      -> many creates/updates/deletes in one transaction
+# /api/v1/foods/export/    -> whole history as a streamed file: ?format=csv|ndjson&start=&end=
+# /api/v1/foods/import/    -> historical logs from an uploaded CSV ("file")
+# /api/v1/foods/mine/      -> the user's own foods for autocomplete: ?q=prefix&sort=frequent|recent&limit=
+# /api/v1/foods/mine/<pk>/log/ -> logs one of them again, no lookups
 # ---------------------------------------------------------------------
 
 class FoodLogs(APIView):
@@ -26,6 +42,9 @@ class FoodLogs(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        if "start" in request.query_params or "end" in request.query_params:
+            return self.get_range(request)
+
         # Keeps track of what day it is (default today if not provided)
         day_str = request.query_params.get("day")
         if day_str:
@@ -37,16 +56,49 @@ class FoodLogs(APIView):
         else:
             target = timezone.now().date()
 
-        # Filter by user and the Day’s date (FoodLog has FK parent_day -> Day(date))
-        logs = FoodLog.objects.filter(user=request.user, parent_day__date=target).order_by("-time_logged")
-        serialized = FoodLogSerializer(logs, many=True)
-        return Response(serialized.data, status=s.HTTP_200_OK)
+        # Filter by user and the local day the logs were made on (the Day they belong to), through the
+        # (user, time_logged) index. Cached per user until their next food log write, unchanged polls get a 304
+        def compute():
+            logs = FoodLog.objects.filter(user=request.user, **logged_between(target, target)) \
+                .select_related("image").order_by("-time_logged")
+            return FoodLogSerializer(logs, many=True).data
+
+        return user_data_response(request, f"foodlogs:{target}", compute)
+
+    def get_range(self, request):
+        # Every log from start to end (inclusive, end defaults to today and start to end), newest first
+        # Pages through a cursor (?cursor= from the 'next' link), so a month of history is a few bounded queries
+        try:
+            end = date.fromisoformat(request.query_params.get("end") or timezone.now().date().isoformat())
+            start = date.fromisoformat(request.query_params.get("start") or end.isoformat())
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD."}, status=s.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({"detail": "'start' must not be after 'end'."}, status=s.HTTP_400_BAD_REQUEST)
+
+        logs = FoodLog.objects.filter(user=request.user, **logged_between(start, end)) \
+            .select_related("parent_day__parent_week", "image")
+
+        paginator = FoodLogCursorPagination()
+        page = paginator.paginate_queryset(logs, request, view=self)
+        return paginator.get_paginated_response(FoodLogHistorySerializer(page, many=True).data)
 
     def post(self, request):
         # FoodLog.save() sets parent_day (Day/Week) and updates totals
         ser = FoodLogSerializer(data=request.data)
         if ser.is_valid():
-            food = ser.save(user=request.user)
+            # The image is found in the background (image_app/jobs.py): the previewed "photo_id" if sent,
+            # else (with IMAGE_AUTO_ENQUEUE) the first search result for the food's name
+            photo_id = str(request.data.get("photo_id") or "").strip()
+            if photo_id and not jobs.is_photo_id(photo_id):
+                return Response({"photo_id": ["Not a valid Unsplash photo id."]}, status=s.HTTP_400_BAD_REQUEST)
+            wants_image = bool(photo_id) or settings.IMAGE_AUTO_ENQUEUE
+            # A log marked pending always has its job
+            with transaction.atomic():
+                food = ser.save(user=request.user,
+                                image_status=ImageStatus.PENDING if wants_image else ImageStatus.NONE)
+                if wants_image:
+                    jobs.enqueue(food, photo_id, food.food_name)
             return Response(FoodLogSerializer(food).data, status=s.HTTP_201_CREATED)
         return Response(ser.errors, status=s.HTTP_400_BAD_REQUEST)
 
@@ -55,7 +107,7 @@ class FoodLogSingle(APIView):
     # Retrieve, update, or delete a single FoodLog owned by the current user.
 
     def _get(self, request, pk):
-        return get_object_or_404(FoodLog, pk=pk, user=request.user)
+        return get_object_or_404(FoodLog.objects.select_related("image"), pk=pk, user=request.user)
 
     def get(self, request, pk):
         food = self._get(request, pk)
@@ -65,26 +117,199 @@ class FoodLogSingle(APIView):
         food = self._get(request, pk)
         ser = FoodLogSerializer(food, data=request.data)
         if ser.is_valid():
-            updated = ser.save()  # model.save() will recalc day/week totals
+            updated = ser.save()  # model.save() applies the calorie change to day/week totals
             return Response(FoodLogSerializer(updated).data, status=s.HTTP_200_OK)
         return Response(ser.errors, status=s.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
-        # Gets the log to be deleted
-        food = self._get(request, pk)
-        # Saves the parent day of the log before deletion
-        parent_day = food.parent_day
+        # Gets the log to be deleted, with the day FoodLog.delete() shifts
+        food = get_object_or_404(FoodLog.objects.select_related("parent_day"), pk=pk, user=request.user)
 
-        # Removes the log then recomputes day/week totals
+        # Removes the log, FoodLog.delete() subtracts its calories from the day/week totals
         food.delete()
-        food.recalculate_totals()
 
-        # Returns a message saying the delete was successful and the new daily calorie total
-        parent_day.refresh_from_db(fields=["daily_calorie_total"])
-        return Response({"detail": "Deleted.", "daily_total": parent_day.daily_calorie_total}, status=s.HTTP_200_OK)
+        # Returns a message saying the delete was successful and the new daily calorie total, read back from the
+        # database (the in-memory day misses other writes made to it since it was loaded)
+        daily_total = Day.objects.filter(pk=food.parent_day_id).values_list("daily_calorie_total", flat=True).first()
+        return Response({"detail": "Deleted.", "daily_total": daily_total or 0}, status=s.HTTP_200_OK)
+
+
+class FoodLogExport(APIView):
+    # Streams every log of the user (optionally between start and end, inclusive) as CSV or NDJSON
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= picks the file format here, not one of DRF's renderers (errors still render as JSON)
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request):
+        file_format = request.query_params.get("format", "csv")
+        if file_format not in export.WRITERS:
+            return Response({"detail": "'format' must be csv or ndjson."}, status=s.HTTP_400_BAD_REQUEST)
+        try:
+            start = date.fromisoformat(request.query_params["start"]) if request.query_params.get("start") else None
+            end = date.fromisoformat(request.query_params["end"]) if request.query_params.get("end") else None
+        except ValueError:
+            return Response({"detail": "Dates must be YYYY-MM-DD."}, status=s.HTTP_400_BAD_REQUEST)
+        if start and end and start > end:
+            return Response({"detail": "'start' must not be after 'end'."}, status=s.HTTP_400_BAD_REQUEST)
+
+        # Nothing is read until the response is iterated, one cursor chunk at a time
+        rows = export.export_rows(request.user, start, end)
+        response = StreamingHttpResponse(
+            export.WRITERS[file_format](rows), content_type=export.CONTENT_TYPES[file_format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="fullsnack-food-log.{file_format}"'
+        response["Cache-Control"] = "private, no-store"
+        return response
+
+
+class FoodLogImport(APIView):
+    # Multipart upload of a CSV file, see importer.py for the columns
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"detail": "Upload the CSV as 'file'."}, status=s.HTTP_400_BAD_REQUEST)
+        # Decoded as it is read, the upload is never loaded whole (utf-8-sig drops a spreadsheet's BOM)
+        text = io.TextIOWrapper(upload.file, encoding="utf-8-sig", newline="")
+        try:
+            imported, days = importer.import_csv(request.user, text)
+        except importer.ImportFailed as e:
+            return Response({"detail": e.detail, "errors": e.errors}, status=s.HTTP_400_BAD_REQUEST)
+        except UnicodeDecodeError:
+            return Response({"detail": "The file must be UTF-8 encoded."}, status=s.HTTP_400_BAD_REQUEST)
+        finally:
+            # The upload closes its own file, the wrapper must not
+            text.detach()
+        return Response({"imported": imported, "days": days}, status=s.HTTP_201_CREATED)
+
+
+def ids_list(values):
+    # Ids sent by the client, None if any of them isn't an integer
+    try:
+        return [int(value) for value in values]
+    except (TypeError, ValueError):
+        return None
+
+
+class FoodLogBulk(APIView):
+    """
+    Body: {"create": [{food_name, calories, ...}], "update": [{"id": 1, "calories": 120}], "delete": [2, 3]}
+    Every part is optional. All operations succeed together or nothing is written.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        data = request.data if isinstance(request.data, dict) else {}
+        creates = data.get("create") or []
+        updates = data.get("update") or []
+        deletes = data.get("delete") or []
+        # ids_list iterates whatever it gets, a string "23" would be the ids 2 and 3
+        deletes = ids_list(deletes) if isinstance(deletes, list) else None
+        if not isinstance(creates, list) or not isinstance(updates, list) or deletes is None:
+            return Response({"detail": "Expected lists for 'create' and 'update' and a list of ids for 'delete'."},
+                            status=s.HTTP_400_BAD_REQUEST)
+        if len(creates) + len(updates) + len(deletes) > bulk.MAX_OPERATIONS:
+            return Response({"detail": f"At most {bulk.MAX_OPERATIONS} operations per request."},
+                            status=s.HTTP_400_BAD_REQUEST)
+
+        # Every update needs the id of the log it changes
+        update_ids = ids_list(item.get("id") if isinstance(item, dict) else None for item in updates)
+        if update_ids is None:
+            return Response({"update": "Every update needs an integer 'id'."}, status=s.HTTP_400_BAD_REQUEST)
+        if len(set(update_ids)) != len(update_ids) or len(set(deletes)) != len(deletes) \
+                or set(update_ids) & set(deletes):
+            return Response({"detail": "Each food log id may only appear once."}, status=s.HTTP_400_BAD_REQUEST)
+
+        # Validates everything before writing anything
+        create_ser = FoodLogSerializer(data=creates, many=True)
+        update_ser = FoodLogSerializer(data=updates, many=True, partial=True)
+        errors = {}
+        if creates and not create_ser.is_valid():
+            errors["create"] = create_ser.errors
+        if updates and not update_ser.is_valid():
+            errors["update"] = update_ser.errors
+        if errors:
+            return Response(errors, status=s.HTTP_400_BAD_REQUEST)
+
+        try:
+            created, updated, deleted = bulk.apply_bulk(
+                request.user,
+                creates=create_ser.validated_data if creates else [],
+                updates=dict(zip(update_ids, update_ser.validated_data)) if updates else {},
+                deletes=deletes,
+            )
+        except bulk.UnknownFoodLogs as e:
+            return Response({"detail": "Food logs not found.", "ids": e.ids}, status=s.HTTP_404_NOT_FOUND)
+
+        return Response(
+            {
+                "created": FoodLogSerializer(created, many=True).data,
+                "updated": FoodLogSerializer(updated, many=True).data,
+                "deleted": deleted,
+            },
+            status=s.HTTP_200_OK,
+        )
+
+
+# Most foods returned by one autocomplete request
+USER_FOODS_MAX_LIMIT = 50
+
+
+def search_user_foods(user, query, sort="frequent"):
+    # The user's foods whose name contains every word of query, names starting with it first
+    foods = UserFood.objects.filter(user=user).select_related("image")
+    words = UserFood.food_key(query).split()
+    for word in words:
+        foods = foods.filter(search_name__contains=word)
+    order = ["-log_count", "-last_logged"] if sort == "frequent" else ["-last_logged"]
+    if words:
+        foods = foods.annotate(prefix_rank=Case(
+            When(search_name__startswith=" ".join(words), then=Value(0)), default=Value(1), output_field=IntegerField()
+        ))
+        order.insert(0, "prefix_rank")
+    return foods.order_by(*order, "pk")
+
+
+class UserFoods(APIView):
+    # Autocomplete over the foods the user logged before (kept up to date on every log write, see UserFood)
+    # A handful of rows from one indexed query, cached per user until their next write like the other reads
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        query = UserFood.food_key(request.query_params.get("q") or "")
+        sort = request.query_params.get("sort") or "frequent"
+        if sort not in ("frequent", "recent"):
+            return Response({"detail": "'sort' must be frequent or recent."}, status=s.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get("limit") or 10), 1), USER_FOODS_MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "'limit' must be a number."}, status=s.HTTP_400_BAD_REQUEST)
+
+        def compute():
+            return {"items": UserFoodSerializer(search_user_foods(request.user, query, sort)[:limit], many=True).data}
+
+        return user_data_response(request, f"userfoods:{sort}:{limit}:{query}", compute)
+
+
+class LogUserFoodAgain(APIView):
+    # One tap re-log: a new log now with the food's name, macros and image, no USDA lookup and no image job
+    permission_classes = [IsAuthenticated]
 
+    def post(self, request, pk):
+        food = get_object_or_404(UserFood.objects.select_related("image"), pk=pk, user=request.user)
+        log = FoodLog(
+            user=request.user, food_name=food.name, calories=food.calories, protein=food.protein,
+            carbs=food.carbs, fat=food.fat, image=food.image,
+            image_status=ImageStatus.READY if food.image_id else ImageStatus.NONE,
+        )
+        log.save()
+        return Response(FoodLogSerializer(log).data, status=s.HTTP_201_CREATED)
 
-# Looks up nutritional data from the FDC API from a given food name
+
+# Looks up nutritional data from the FDC API from a given food name (cached per normalized query, see fdc.py)
 class NutritionLookup(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -95,88 +320,24 @@ class NutritionLookup(APIView):
             return Response({"error": "Query parameter 'query' is required."}, status=s.HTTP_400_BAD_REQUEST)
 
         try:
-            search_url = "https://api.nal.usda.gov/fdc/v1/foods/search"
-            # Ask for multiple results and prioritize datasets that usually have full nutrients
-            params = {
-                "api_key": settings.FDC_API_KEY,
-                "query": query,
-                "pageSize": 5,
-                "dataType": ["Survey (FNDDS)", "SR Legacy", "Branded"],
-            }
-            r = requests.get(search_url, params=params, timeout=10)
-            if r.status_code != 200:
-                return Response({"error": "USDA search failed."}, status=s.HTTP_502_BAD_GATEWAY)
-
-            payload = r.json() or {}
-            foods = payload.get("foods") or []
-            if not foods:
-                return Response({"items": []}, status=s.HTTP_200_OK)
-
-            def extract_macros(food):
-                # Return (desc, calories, protein_g, carbs_g, fat_g) from either foodNutrients or labelNutrients.
-
-                # First try foodNutrients (array of dicts)
-                fn = food.get("foodNutrients") or []
-                
-
-                def get_val(id_code=None, number_code=None):
-                    for n in fn:
-                        nid = n.get("nutrientId")
-                        nnum = n.get("nutrientNumber")
-                        if (id_code is not None and str(nid) == str(id_code)) or (
-                            number_code is not None and str(nnum) == str(number_code)
-                        ):
-                            return n.get("value")
-                    return None
-
-                # Prefer nutrientId, but accept nutrientNumber
-                calories = get_val(id_code=1008, number_code="208")  # Energy (kcal)
-                protein  = get_val(id_code=1003, number_code="203")  # Protein (g)
-                carbs    = get_val(id_code=1005, number_code="205")  # Carbs (g)
-                fat      = get_val(id_code=1004, number_code="204")  # Fat (g)
-                
-                description = query.title()
-
-                # Fallback: branded items often have labelNutrients
-                if any(v in (None, 0) for v in [calories, protein, carbs, fat]):
-                    ln = food.get("labelNutrients") or {}
-
-                    def lv(key):
-                        v = (ln.get(key) or {}).get("value")
-                        return v if v is not None else None
-
-                    calories = calories if calories not in (None, 0) else lv("calories")
-                    protein  = protein  if protein  not in (None, 0) else lv("protein")
-                    carbs    = carbs    if carbs    not in (None, 0) else lv("totalCarbohydrate")
-                    fat      = fat      if fat      not in (None, 0) else lv("totalFat")
-
-                return description, calories, protein, carbs, fat
-
-            # Pick the first candidate with at least some macros present
-            chosen = None
-            for f in foods:
-                desc, cal, pro, cho, fat = extract_macros(f)
-                if any(v not in (None, 0) for v in [cal, pro, cho, fat]):
-                    chosen = (desc, cal, pro, cho, fat)
-                    break
-
-            # If all were empty, just use the first (still renders zeros)
-            if chosen is None:
-                chosen = extract_macros(foods[0])
-
-            description, calories, protein, carbs, fat = chosen
-
-            # Return the data in the format expected by the front end
-            normalized = {
-                "name": description,
-                "calories": round(float(calories or 0)),
-                "protein_g": round(float(protein or 0)),
-                "carbohydrates_total_g": round(float(carbs or 0)),
-                "fat_total_g": round(float(fat or 0)),
-            }
-            return Response({"item": normalized}, status=s.HTTP_200_OK)
-
+            item, source = fdc.lookup(query)
         except requests.RequestException:
             return Response({"error": "Failed to reach USDA API."}, status=s.HTTP_502_BAD_GATEWAY)
+        except fdc.FdcSearchError:
+            return Response({"error": "USDA search failed."}, status=s.HTTP_502_BAD_GATEWAY)
+        except quota.QuotaExceeded as e:
+            # Only when there was no stale answer either
+            return Response({"error": "USDA lookups are busy, try again shortly."},
+                            status=s.HTTP_503_SERVICE_UNAVAILABLE, headers={"Retry-After": quota.retry_after_header(e)})
         except Exception:
             return Response({"error": "Unexpected error."}, status=s.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        if item is None:
+            response = Response({"items": []}, status=s.HTTP_200_OK)
+        else:
+            response = Response({"item": item}, status=s.HTTP_200_OK)
+        # Lets clients (and us) see where the answer came from and whether FDC was called for it
+        response["X-Nutrition-Source"] = source
+        if source != fdc.ENGINE_LOCAL:
+            response["X-Cache"] = {"cache": "HIT", "stale": "STALE"}.get(source, "MISS")
+        return response
@@ -0,0 +1,64 @@
+# backend/fullsnack_project/async_http.py
+# Pooled async HTTP clients for the ASGI views (see the async_views modules).
+# Each upstream gets its own httpx.AsyncClient, so connection limits apply per host and
+# keep-alive connections (and their TLS sessions) are reused between requests instead of reopened every call.
+import asyncio
+import weakref
+
+import httpx
+from django.conf import settings
+
+# Clients are bound to the event loop they were created in, so they are kept per loop. Under ASGI that is one loop for
+# the life of the worker; under WSGI every async_to_sync call runs in a new loop, whose clients are closed when
+# asyncio.run() shuts it down (see _closer) instead of leaving their connections open
+_clients = weakref.WeakKeyDictionary()
+_closers = weakref.WeakKeyDictionary()
+
+
+def build_client(name):
+    config = settings.UPSTREAM_HTTP[name]
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(config["timeout"], connect=config.get("connect_timeout", 3)),
+        limits=httpx.Limits(
+            max_connections=config["max_connections"],
+            max_keepalive_connections=config["max_keepalive_connections"],
+            keepalive_expiry=config.get("keepalive_expiry", 30),
+        ),
+    )
+
+
+async def _closer(clients):
+    # Parked at its yield until the loop shuts down: asyncio.run() closes a loop's async generators before closing it,
+    # which runs the finally block in that loop
+    try:
+        yield
+    finally:
+        for client in clients.values():
+            await client.aclose()
+
+
+def get_client(name):
+    # Returns the shared client of upstream name ("usda", "unsplash", see settings.UPSTREAM_HTTP) for the running loop
+    loop = asyncio.get_running_loop()
+    clients = _clients.get(loop)
+    if clients is None:
+        clients = _clients[loop] = {}
+        closer = _closers[loop] = _closer(clients)
+        # Started here, inside the loop, so the loop's async generator hooks see it; nothing is awaited before the yield
+        try:
+            closer.asend(None).send(None)
+        except StopIteration:
+            pass
+    client = clients.get(name)
+    if client is None or client.is_closed:
+        client = clients[name] = build_client(name)
+    return client
+
+
+async def close_clients():
+    # Closes the running loop's clients (e.g. on ASGI lifespan shutdown or at the end of a test)
+    loop = asyncio.get_running_loop()
+    _clients.pop(loop, None)
+    closer = _closers.pop(loop, None)
+    if closer is not None:
+        await closer.aclose()
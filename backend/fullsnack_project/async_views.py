@@ -0,0 +1,46 @@
+# backend/fullsnack_project/async_views.py
+# Base class for the async (ASGI) variants of views that mostly wait on upstream HTTP calls.
+# DRF's APIView is sync only, so these are plain Django views that authenticate the same way DRF does.
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import classonlymethod
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+
+class AsyncAPIView(View):
+    # Token auth only, like the DRF views (no sessions, so no CSRF check either)
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    def authenticate(self, request):
+        # Runs the configured DRF authentication classes, returns the user or None
+        for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            result = authentication_class().authenticate(request)
+            if result is not None:
+                return result[0]
+        return None
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            user = await sync_to_async(self.authenticate)(request)
+        except exceptions.AuthenticationFailed as e:
+            return JsonResponse({"detail": str(e.detail)}, status=401)
+        if user is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        request.user = user
+        return await super().dispatch(request, *args, **kwargs)
+
+    def get_data(self, request):
+        # JSON body of the request as a dict (empty when missing or not JSON)
+        try:
+            data = json.loads(request.body or b"{}")
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
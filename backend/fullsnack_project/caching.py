@@ -0,0 +1,263 @@
+# backend/fullsnack_project/caching.py
+# Small helpers on top of Django's cache framework shared by the apps.
+import asyncio
+import hashlib
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import instrumentation
+from .quota import QuotaExceeded
+from .singleflight import SingleFlight
+
+# What get()/get_or_fetch() return as `hit` for an expired entry served because the upstream can't be called
+STALE = "stale"
+# Seconds between checks for the result of a fetch running in another process
+SHARED_POLL_INTERVAL = 0.05
+
+# In-flight lookups of this process, see QueryCache.get_or_fetch
+flights = SingleFlight(wait=settings.LOOKUP_COALESCE_WAIT)
+
+
+def normalize_query(query):
+    # "  Greek   YOGURT " and "greek yogurt" share one cache entry
+    return " ".join((query or "").lower().split())
+
+
+class QueryCache:
+    """
+    Caches upstream lookup results keyed by the normalized search query (or any other key, see normalize).
+
+    Entries live in the Django cache alias given (size limit and eviction come from that backend's
+    MAX_ENTRIES / CULL_FREQUENCY options). Empty results (None, [] or {}) are cached too, but only for
+    negative_ttl seconds so a food that later appears upstream isn't hidden for long.
+    Hit and miss counters are kept in the same cache so every worker sharing the backend reports together.
+
+    get_or_fetch() also coalesces misses: while one caller fetches a query, the others asking for it wait for that
+    result instead of calling the upstream too (counted as "coalesced"). Entries are kept stale_ttl seconds past
+    their expiry, when the fetch is refused for lack of quota (QuotaExceeded) the expired entry is served instead
+    (hit is STALE, counted as "stale").
+    """
+
+    def __init__(self, namespace, alias="default", ttl=60 * 60 * 24, negative_ttl=60 * 10, normalize=normalize_query,
+                 stale_ttl=0):
+        self.namespace = namespace
+        self.alias = alias
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.stale_ttl = stale_ttl
+        # Pass normalize=str for case-sensitive keys such as upstream ids
+        self.normalize = normalize
+
+    @property
+    def cache(self):
+        # Looked up on every call so settings overrides (e.g. in tests) are respected
+        return caches[self.alias]
+
+    def key(self, query):
+        # Hashing keeps keys short and safe for every backend (memcached rejects spaces and long keys)
+        digest = hashlib.sha1(self.normalize(query).encode()).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def get(self, query):
+        # Returns (hit, value) so a cached empty result can be told apart from a miss
+        fresh, value = self._read(query)
+        hit = fresh is True
+        self._count("hits" if hit else "misses")
+        instrumentation.record_cache(hit)
+        return (True, value) if hit else (False, None)
+
+    def set(self, query, value):
+        # Stored with the time it expires, the backend keeps it stale_ttl longer for get_or_fetch's fallback
+        ttl = self.ttl if value else self.negative_ttl
+        self.cache.set(self.key(query), (time.time() + ttl, value), timeout=ttl + self.stale_ttl)
+
+    def _read(self, query):
+        # (True, value) for a fresh entry, (False, value) for an expired one, (None, None) when there is none
+        entry = self.cache.get(self.key(query))
+        if entry is None:
+            return None, None
+        expires, value = entry
+        return expires > time.time(), value
+
+    def delete(self, query):
+        self.cache.delete(self.key(query))
+
+    def get_or_fetch(self, query, fetch):
+        """
+        Returns (hit, value): the cached value, or fetch() cached. Callers that only waited for a concurrent
+        identical fetch get hit=True. Exceptions of fetch() reach every caller that waited for it.
+        """
+        hit, value = self.get(query)
+        if hit:
+            return True, value
+        try:
+            leader, (hit, value) = flights.do(self.key(query), lambda: self._fetch(query, fetch))
+        except QuotaExceeded as e:
+            return self._stale(query, e)
+        if not leader:
+            self._count("coalesced")
+        return hit or not leader, value
+
+    async def aget_or_fetch(self, query, fetch):
+        # Async version of get_or_fetch, fetch is an async function
+        hit, value = await sync_to_async(self.get)(query)
+        if hit:
+            return True, value
+        try:
+            leader, (hit, value) = await flights.ado(self.key(query), lambda: self._afetch(query, fetch))
+        except QuotaExceeded as e:
+            return await sync_to_async(self._stale)(query, e)
+        if not leader:
+            await sync_to_async(self._count)("coalesced")
+        return hit or not leader, value
+
+    def _stale(self, query, error):
+        # The expired entry if there is one, otherwise the QuotaExceeded error goes on
+        fresh, value = self._read(query)
+        if fresh is None:
+            raise error
+        self._count("stale")
+        return STALE, value
+
+    def _fetch(self, query, fetch):
+        # Returns (hit, value), hit when another process fetched it meanwhile
+        lock = self._lock_key(query)
+        owner = not settings.LOOKUP_COALESCE_SHARED or self.cache.add(lock, 1, timeout=settings.LOOKUP_COALESCE_WAIT)
+        if not owner:
+            deadline = time.monotonic() + settings.LOOKUP_COALESCE_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(SHARED_POLL_INTERVAL)
+                state, value = self._shared_state(query, lock)
+                if state == "cached":
+                    return True, value
+                if state == "released":
+                    break
+            # The other process failed or is too slow, fetching here after all
+        try:
+            value = fetch()
+            self.set(query, value)
+        finally:
+            if owner and settings.LOOKUP_COALESCE_SHARED:
+                self.cache.delete(lock)
+        return False, value
+
+    async def _afetch(self, query, fetch):
+        lock = self._lock_key(query)
+        shared = settings.LOOKUP_COALESCE_SHARED
+        owner = not shared or await sync_to_async(self.cache.add)(lock, 1, timeout=settings.LOOKUP_COALESCE_WAIT)
+        if not owner:
+            deadline = time.monotonic() + settings.LOOKUP_COALESCE_WAIT
+            while time.monotonic() < deadline:
+                await asyncio.sleep(SHARED_POLL_INTERVAL)
+                state, value = await sync_to_async(self._shared_state)(query, lock)
+                if state == "cached":
+                    return True, value
+                if state == "released":
+                    break
+        try:
+            value = await fetch()
+            await sync_to_async(self.set)(query, value)
+        finally:
+            if owner and shared:
+                await sync_to_async(self.cache.delete)(lock)
+        return False, value
+
+    def _shared_state(self, query, lock):
+        # "cached" once the process holding the lock cached its result, "released" when it let go of the lock
+        # without one (its fetch failed), "busy" while it is still fetching
+        fresh, value = self._read(query)
+        if fresh:
+            return "cached", value
+        if self.cache.get(lock) is None:
+            return "released", None
+        return "busy", None
+
+    def _lock_key(self, query):
+        return f"{self.key(query)}:lock"
+
+    def stats(self):
+        hits = self.cache.get(self._stat_key("hits"), 0)
+        misses = self.cache.get(self._stat_key("misses"), 0)
+        coalesced = self.cache.get(self._stat_key("coalesced"), 0)
+        stale = self.cache.get(self._stat_key("stale"), 0)
+        total = hits + misses
+        return {"hits": hits, "misses": misses, "coalesced": coalesced, "stale": stale,
+                "hit_rate": round(hits / total, 3) if total else 0.0}
+
+    def _stat_key(self, name):
+        return f"{self.namespace}:stats:{name}"
+
+    def _count(self, name):
+        key = self._stat_key(name)
+        # add() is a no-op when the counter already exists, incr() then bumps it
+        self.cache.add(key, 0, timeout=None)
+        try:
+            self.cache.incr(key)
+        except ValueError:
+            # Counter was evicted between add() and incr(), losing one count is fine
+            pass
+
+
+class UserResponseCache:
+    """
+    Read-through cache of per-user response data.
+
+    Every entry key includes the user's current data version, so a write only has to bump that version
+    (bump(), called by FoodLog writes) and every older entry for the user is skipped and left to expire.
+    The version is the time (ns) of the user's last write, or of the first read after the version was lost to eviction,
+    so it never goes back to an older value and doubles as the Last-Modified time of the user's data.
+    """
+
+    def __init__(self, namespace, alias="default", ttl=60 * 5):
+        self.namespace = namespace
+        self.alias = alias
+        # Entries (hit/miss stats included) go through a QueryCache, empty lists are cached as long as the rest
+        self.entries = QueryCache(namespace, alias=alias, ttl=ttl, negative_ttl=ttl, normalize=str)
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _version_key(self, user_id):
+        return f"{self.namespace}:version:{user_id}"
+
+    def version(self, user_id):
+        key = self._version_key(user_id)
+        self.cache.add(key, time.time_ns(), timeout=None)
+        return self.cache.get(key) or time.time_ns()
+
+    def bump(self, user_id):
+        # Bumped again on commit, a read racing the transaction could otherwise cache the old rows under the new version
+        self._bump(user_id)
+        transaction.on_commit(lambda: self._bump(user_id))
+
+    def _bump(self, user_id):
+        key = self._version_key(user_id)
+        # +1 keeps two bumps in the same nanosecond (or a clock behind the last writer's) distinct
+        self.cache.set(key, max(time.time_ns(), self.cache.get(key, 0) + 1), timeout=None)
+
+    def fetch(self, user_id, key, compute, version=None):
+        # Returns (hit, data), compute() builds the data on a miss
+        # Pass the version when the caller already read it (e.g. for an ETag) so both agree
+        if version is None:
+            version = self.version(user_id)
+        entry_key = f"{user_id}:{version}:{key}"
+        hit, data = self.entries.get(entry_key)
+        if hit:
+            return True, data
+        data = compute()
+        self.entries.set(entry_key, data)
+        return False, data
+
+    def stats(self):
+        return self.entries.stats()
+
+
+# Dashboard reads (days, weeks, a day's logs) of each user, see UserResponseCache
+responses = UserResponseCache(
+    "responses", alias=settings.RESPONSE_CACHE_ALIAS, ttl=settings.RESPONSE_CACHE_TTL
+)
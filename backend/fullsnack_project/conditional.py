@@ -0,0 +1,41 @@
+# backend/fullsnack_project/conditional.py
+# Conditional GET for per-user reads: the user's data version (caching.responses) is the change marker, so
+# validators are computed without touching the database and an unchanged poll gets a 304 before any serializing.
+import hashlib
+import time
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from .caching import responses
+
+
+def user_data_response(request, key, compute):
+    """
+    Response for the current user's data named key (e.g. "days"), compute() returns the serialized data.
+    Answers 304 when the client's If-None-Match / If-Modified-Since still match, otherwise serves the
+    data from the response cache (X-Cache HIT) or computes and caches it (MISS).
+    """
+    version = responses.version(request.user.pk)
+    # Strong validator: one version per user, one key per view/filter
+    etag = quote_etag(f"{version:x}-{hashlib.sha1(key.encode()).hexdigest()[:12]}")
+    # Whole seconds, rounded up and only given out once that second is over: a later write then always lands in a
+    # later second, so an If-Modified-Since alone never matches data it hasn't seen. Clients that send both
+    # headers are matched on the ETag first (RFC 9110)
+    last_modified = -(-version // 1_000_000_000)
+    if last_modified * 1_000_000_000 > time.time_ns():
+        last_modified = None
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        hit, data = responses.fetch(request.user.pk, key, compute, version=version)
+        response = Response(data)
+        response["X-Cache"] = "HIT" if hit else "MISS"
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    # Per-user data, shared caches must revalidate with the token
+    response["Cache-Control"] = "private, no-cache"
+    patch_vary_headers(response, ["Authorization"])
+    return response
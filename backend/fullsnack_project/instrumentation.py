@@ -0,0 +1,269 @@
+# backend/fullsnack_project/instrumentation.py
+# Per-request timing: wall time, DB queries, upstream HTTP calls and cache hits of every request, reported in a
+# Server-Timing header and aggregated per view into histograms that /metrics serves in Prometheus text format.
+#
+# The numbers of the running request live in a ContextVar, so they follow the request into sync_to_async threads
+# and async views. Code outside a request (management commands, tests calling helpers directly) records nothing.
+import contextvars
+import cProfile
+import os
+import threading
+import time
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import Counter, Histogram
+
+# Query count buckets (a histogram of "how many queries does this view run")
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = ("db_queries", "db_seconds", "upstream_calls", "upstream_seconds", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.upstream_calls = 0
+        self.upstream_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+# Recording hooks, called by the DB wrapper below, upstream.Upstream and caching.QueryCache
+
+def record_query(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.db_queries += 1
+        stats.db_seconds += seconds
+
+
+def record_upstream(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.upstream_calls += 1
+        stats.upstream_seconds += seconds
+
+
+def record_cache(hit):
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+def _time_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record_query(time.perf_counter() - start)
+
+
+def _install_wrapper(connection, **kwargs):
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+def install_db_wrapper():
+    # Every connection gets the wrapper, including ones opened later by other threads
+    connection_created.connect(_install_wrapper, dispatch_uid="instrumentation_db_wrapper")
+    for connection in connections.all(initialized_only=True):
+        _install_wrapper(connection)
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.duration = Histogram()
+        self.db_queries = Histogram(QUERY_BUCKETS)
+        self.db_seconds = Histogram()
+        self.upstream_seconds = Histogram()
+        self.cache = Counter()
+        self.responses = Counter()
+
+    def observe(self, stats, duration, status):
+        self.duration.observe(duration)
+        self.db_queries.observe(stats.db_queries)
+        self.db_seconds.observe(stats.db_seconds)
+        if stats.upstream_calls:
+            self.upstream_seconds.observe(stats.upstream_seconds)
+        if stats.cache_hits:
+            self.cache.inc("hit", stats.cache_hits)
+        if stats.cache_misses:
+            self.cache.inc("miss", stats.cache_misses)
+        self.responses.inc(str(status))
+
+
+_views = {}
+_views_lock = threading.Lock()
+
+
+def view_metrics(name):
+    metrics = _views.get(name)
+    if metrics is None:
+        with _views_lock:
+            metrics = _views.setdefault(name, ViewMetrics())
+    return metrics
+
+
+def view_name(request):
+    # DRF and Django class-based views expose their class on the resolved function
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    view = getattr(match.func, "view_class", None) or getattr(match.func, "cls", None)
+    return view.__name__ if view else match.url_name or match.func.__name__
+
+
+def server_timing(stats, duration):
+    return ", ".join([
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.db_queries} queries"',
+        f'upstream;dur={stats.upstream_seconds * 1000:.1f};desc="{stats.upstream_calls} calls"',
+        f'cache;desc="{stats.cache_hits} hits, {stats.cache_misses} misses"',
+        f"total;dur={duration * 1000:.1f}",
+    ])
+
+
+class InstrumentationMiddleware:
+    """
+    Times every request (see the module comment). Sends "X-Profile: 1" to run one request under cProfile
+    when settings.PROFILE_REQUESTS is on, the stats land in PROFILE_DIR (open them with snakeviz or
+    flameprof for a flame graph) and the file name comes back in X-Profile-File.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        install_db_wrapper()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            if self.wants_profile(request):
+                response = self.profile(request)
+            else:
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        # cProfile only follows one thread, so async requests are timed but never profiled
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, duration):
+        view_metrics(view_name(request)).observe(stats, duration, response.status_code)
+        if settings.SERVER_TIMING:
+            response["Server-Timing"] = server_timing(stats, duration)
+        return response
+
+    def wants_profile(self, request):
+        return settings.PROFILE_REQUESTS and request.headers.get("X-Profile") == "1"
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        response = profiler.runcall(self.get_response, request)
+        folder = Path(settings.PROFILE_DIR)
+        folder.mkdir(parents=True, exist_ok=True)
+        path = folder / f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{view_name(request)}.prof"
+        profiler.dump_stats(path)
+        response["X-Profile-File"] = path.name
+        return response
+
+
+# Prometheus text exposition format
+# https://prometheus.io/docs/instrumenting/exposition_formats/
+
+def _labels(**labels):
+    def escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{key}="{escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _histogram_lines(name, snapshot, **labels):
+    lines = [
+        f"{name}_bucket{_labels(**labels, le=bound)} {count}"
+        for bound, count in snapshot["buckets"].items()
+    ]
+    lines.append(f"{name}_sum{_labels(**labels)} {snapshot['sum']}")
+    lines.append(f"{name}_count{_labels(**labels)} {snapshot['count']}")
+    return lines
+
+
+def render_prometheus():
+    # Imported here, upstream.py records into this module
+    from . import upstream
+
+    with _views_lock:
+        views = sorted(_views.items())
+
+    histograms = [
+        ("fullsnack_request_duration_seconds", "Wall time per request.", "duration"),
+        ("fullsnack_request_db_queries", "Database queries per request.", "db_queries"),
+        ("fullsnack_request_db_seconds", "Time spent in database queries per request.", "db_seconds"),
+        ("fullsnack_request_upstream_seconds", "Time spent calling USDA/Unsplash per request that called them.",
+         "upstream_seconds"),
+    ]
+    lines = []
+    for name, help_text, attr in histograms:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for view, metrics in views:
+            lines += _histogram_lines(name, getattr(metrics, attr).snapshot(), view=view)
+
+    lines += ["# HELP fullsnack_requests_total Responses by view and status code.",
+              "# TYPE fullsnack_requests_total counter"]
+    for view, metrics in views:
+        for status, count in sorted(metrics.responses.snapshot().items()):
+            lines.append(f"fullsnack_requests_total{_labels(view=view, status=status)} {count}")
+
+    lines += ["# HELP fullsnack_cache_lookups_total Cache lookups made while serving each view.",
+              "# TYPE fullsnack_cache_lookups_total counter"]
+    for view, metrics in views:
+        for result, count in sorted(metrics.cache.snapshot().items()):
+            lines.append(f"fullsnack_cache_lookups_total{_labels(view=view, result=result)} {count}")
+
+    lines += ["# HELP fullsnack_upstream_latency_seconds Latency of each call to a third-party API.",
+              "# TYPE fullsnack_upstream_latency_seconds histogram"]
+    for name, client in upstream.UPSTREAMS.items():
+        lines += _histogram_lines("fullsnack_upstream_latency_seconds", client.latency.snapshot(), upstream=name)
+    lines += ["# HELP fullsnack_upstream_errors_total Failed calls to a third-party API by kind.",
+              "# TYPE fullsnack_upstream_errors_total counter"]
+    for name, client in upstream.UPSTREAMS.items():
+        for kind, count in sorted(client.errors.snapshot().items()):
+            lines.append(f"fullsnack_upstream_errors_total{_labels(upstream=name, kind=kind)} {count}")
+    lines += ["# HELP fullsnack_upstream_circuit_open 1 while the upstream's circuit breaker is not closed.",
+              "# TYPE fullsnack_upstream_circuit_open gauge"]
+    for name, client in upstream.UPSTREAMS.items():
+        lines.append(f"fullsnack_upstream_circuit_open{_labels(upstream=name)} {int(client.breaker.state != 'closed')}")
+    lines += ["# HELP fullsnack_upstream_quota_tokens Calls left in the upstream's quota bucket (shared by every worker).",
+              "# TYPE fullsnack_upstream_quota_tokens gauge"]
+    for name, client in upstream.UPSTREAMS.items():
+        state = client.bucket.snapshot()
+        if state["enabled"]:
+            lines.append(f"fullsnack_upstream_quota_tokens{_labels(upstream=name)} {state['tokens']}")
+
+    return "\n".join(lines) + "\n"
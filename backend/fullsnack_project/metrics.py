@@ -0,0 +1,48 @@
+# backend/fullsnack_project/metrics.py
+# In-process metric primitives (thread-safe). Each worker process keeps its own numbers.
+import threading
+
+# Latency buckets in seconds, the same defaults Prometheus client libraries use
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    def snapshot(self):
+        # Cumulative bucket counts keyed by upper bound ("+Inf" last), like a Prometheus histogram
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip([*map(str, self.buckets), "+Inf"], counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"buckets": cumulative, "sum": round(total, 6), "count": count}
+
+
+class Counter:
+    # A group of named counters, e.g. errors by kind
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, name, amount=1):
+        with self._lock:
+            self._values[name] = self._values.get(name, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._values)
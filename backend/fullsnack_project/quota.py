@@ -0,0 +1,139 @@
+# backend/fullsnack_project/quota.py
+# Token buckets that keep us under the hourly quotas of the USDA and Unsplash API keys, shared by every worker.
+#
+# Each upstream's bucket (settings.UPSTREAM_HTTP[name]["quota_per_hour"] / ["quota_burst"]) lives in the cache
+# alias settings.UPSTREAM_QUOTA_ALIAS, updated under a short cache.add() lock, so workers sharing that cache share one
+# budget. The lock needs a backend whose add() is atomic: the database, Redis or memcached ones (see CACHES). The file
+# cache's add() is a check then a write, two workers can both take the lock and overspend the budget.
+# Calls take a token before going out:
+#   normal  may take the bucket's last token (nutrition lookups, the image jobs)
+#   low     leaves the last PRIORITY_RESERVE["low"] of the bucket to normal calls, previews are the first to be shed
+# Nobody waits for a token: a shed call raises QuotaExceeded, QueryCache.get_or_fetch then answers from a stale entry
+# when it has one.
+import contextlib
+import contextvars
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+NORMAL = "normal"
+LOW = "low"
+# Share of the bucket each priority has to leave for the ones above it
+PRIORITY_RESERVE = {NORMAL: 0.0, LOW: 0.3}
+
+# How long the bucket lock is held at most, and how long to try for it before going ahead without it
+LOCK_TIMEOUT = 2
+LOCK_WAIT = 0.05
+
+_priority = contextvars.ContextVar("upstream_priority", default=NORMAL)
+
+
+class QuotaExceeded(Exception):
+    # The upstream's budget is spent for now, retry_after: seconds until a call of this priority fits again
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} quota exhausted, retry in {retry_after:.0f}s.")
+        self.name = name
+        self.retry_after = retry_after
+
+
+@contextlib.contextmanager
+def priority(level):
+    # Upstream calls made inside the block (sync_to_async threads included) use this priority
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+def retry_after_header(error):
+    # Whole seconds for a Retry-After header
+    return str(max(1, math.ceil(error.retry_after)))
+
+
+class TokenBucket:
+    def __init__(self, name):
+        self.name = name
+
+    @property
+    def config(self):
+        return settings.UPSTREAM_HTTP[self.name]
+
+    @property
+    def enabled(self):
+        return bool(self.config.get("quota_per_hour"))
+
+    @property
+    def capacity(self):
+        return self.config.get("quota_burst") or self.config["quota_per_hour"]
+
+    @property
+    def rate(self):
+        # Tokens per second
+        return self.config["quota_per_hour"] / 3600
+
+    @property
+    def cache(self):
+        return caches[settings.UPSTREAM_QUOTA_ALIAS]
+
+    def take(self, level=NORMAL):
+        """
+        Takes a token if one is available at this priority. Returns 0 when it did, otherwise the seconds until
+        one would be.
+        """
+        floor = 1 + self.capacity * PRIORITY_RESERVE[level]
+        with self._locked():
+            tokens = self._tokens()
+            if tokens >= floor:
+                self._store(tokens - 1)
+                return 0
+        return (floor - tokens) / self.rate
+
+    def drain(self):
+        # The upstream said 429: stop every worker until the bucket refills
+        with self._locked():
+            self._store(0)
+
+    def snapshot(self):
+        if not self.enabled:
+            return {"enabled": False}
+        return {"enabled": True, "tokens": round(self._tokens(), 1), "capacity": self.capacity,
+                "per_hour": self.config["quota_per_hour"]}
+
+    def _key(self):
+        return f"quota:{self.name}"
+
+    def _tokens(self):
+        # Refills for the time since the last update, a bucket not in the cache (new or evicted) starts full
+        state = self.cache.get(self._key())
+        if state is None:
+            return self.capacity
+        tokens, updated = state
+        return min(self.capacity, tokens + (time.time() - updated) * self.rate)
+
+    def _store(self, tokens):
+        # Kept until it would have refilled anyway
+        self.cache.set(self._key(), (tokens, time.time()), timeout=int(self.capacity / self.rate) + 60)
+
+    @contextlib.contextmanager
+    def _locked(self):
+        # cache.add() is atomic on the database, Redis and memcached backends (not the file one), a worker that can't
+        # get the lock in LOCK_WAIT goes ahead anyway: briefly overshooting the budget beats stalling requests on a
+        # lost lock
+        lock = f"{self._key()}:lock"
+        deadline = time.monotonic() + LOCK_WAIT
+        owner = self.cache.add(lock, 1, timeout=LOCK_TIMEOUT)
+        while not owner and time.monotonic() < deadline:
+            time.sleep(0.002)
+            owner = self.cache.add(lock, 1, timeout=LOCK_TIMEOUT)
+        try:
+            yield
+        finally:
+            if owner:
+                self.cache.delete(lock)
@@ -12,9 +12,14 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import sys
+
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
+# manage.py test
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
 
 
 # Quick-start development settings - unsuitable for production
@@ -48,7 +53,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Times every request (DB, upstream, cache) for Server-Timing and /metrics, first so it sees the whole request
+    'fullsnack_project.instrumentation.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Compresses responses for clients that accept gzip (near the top, so it compresses the final body)
+    'django.middleware.gzip.GZipMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -111,7 +120,8 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        # TokenAuthentication with the token -> user lookup cached, see user_app/authentication.py
+        "user_app.authentication.CachedTokenAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -146,4 +156,124 @@ AUTH_USER_MODEL = 'user_app.Client'
 load_dotenv()
 FDC_API_KEY = os.getenv("FDC_API_KEY")
 UNSPLASH_API_KEY = os.getenv("UNSPLASH_API_KEY")
-UNSPLASH_SECRET_KEY = os.getenv("UNSPLASH_SECRET_KEY")
\ No newline at end of file
+UNSPLASH_SECRET_KEY = os.getenv("UNSPLASH_SECRET_KEY")
+
+# USDA FoodData Central base URL (overridable to point at a local stub)
+FDC_API_URL = os.getenv("FDC_API_URL", "https://api.nal.usda.gov/fdc/v1")
+# Unsplash API base URL (overridable to point at a local stub)
+UNSPLASH_API_URL = os.getenv("UNSPLASH_API_URL", "https://api.unsplash.com")
+
+# Outbound HTTP clients, one pooled client per upstream (see fullsnack_project/upstream.py)
+# timeout/connect_timeout: seconds, keep-alive connections are reused between requests
+# retries/backoff: transient failures (connection errors, 502/503/504) are retried with jittered exponential backoff
+# breaker_failures/breaker_reset: after that many failures in a row calls fail fast for breaker_reset seconds
+UPSTREAM_HTTP = {
+    "usda": {
+        "timeout": 10, "connect_timeout": 3, "max_connections": 20, "max_keepalive_connections": 10,
+        "retries": 2, "backoff": 0.2, "breaker_failures": 5, "breaker_reset": 30,
+        # Hourly quota of the API key (api.data.gov default), 0 turns the limiter off, see fullsnack_project/quota.py
+        "quota_per_hour": int(os.getenv("FDC_QUOTA_PER_HOUR", 1000)), "quota_burst": 50,
+    },
+    "unsplash": {
+        "timeout": 8, "connect_timeout": 3, "max_connections": 10, "max_keepalive_connections": 5,
+        "retries": 2, "backoff": 0.2, "breaker_failures": 5, "breaker_reset": 30,
+        # Demo keys get 50 requests an hour, production keys 5000
+        "quota_per_hour": int(os.getenv("UNSPLASH_QUOTA_PER_HOUR", 50)), "quota_burst": 10,
+    },
+    # Photo downloads for the thumbnails (image_app/thumbnails.py), the image CDN doesn't count against the API quota
+    "images": {
+        "timeout": 10, "connect_timeout": 3, "max_connections": 10, "max_keepalive_connections": 5,
+        "retries": 2, "backoff": 0.2, "breaker_failures": 5, "breaker_reset": 30,
+    },
+}
+# The quota buckets live in this cache, it has to be shared by the workers and have an atomic add() for them to share
+# one budget: the database or Redis caches of CACHES, never a file cache
+UPSTREAM_QUOTA_ALIAS = os.getenv("UPSTREAM_QUOTA_ALIAS", "lookups")
+
+# Where NutritionLookup gets its data: "remote" (FDC API), "local" (foods loaded with manage.py import_fdc)
+# or "local-then-remote" (local table first, FDC API when nothing matched locally)
+NUTRITION_ENGINE = os.getenv("NUTRITION_ENGINE", "remote")
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# "lookups" holds upstream search results and the quota buckets, "auth" token -> user lookups and "responses"
+# per-user dashboard reads (invalidated by a per-user version that FoodLog writes bump). All three have to be shared
+# by every worker: a per-process copy keeps serving a logged out token or a read older than the last write in the
+# other workers, and multiplies the API quotas by the number of workers. They are database caches (one table each,
+# made by `python manage.py createcachetable`), or Redis when REDIS_URL is set (needs the redis package): both have
+# the atomic add() that the quota and lookup locks rely on, which the file cache doesn't.
+# LOCAL_MEMORY_CACHES=1 keeps them in process memory instead, for a single process only (runserver, the test suite
+# by default): startup fails when WEB_CONCURRENCY asks for more workers
+REDIS_URL = os.getenv("REDIS_URL")
+LOCAL_MEMORY_CACHES = os.getenv("LOCAL_MEMORY_CACHES", "1" if TESTING else "0") == "1"
+if LOCAL_MEMORY_CACHES and int(os.getenv("WEB_CONCURRENCY") or 1) > 1:
+    raise ImproperlyConfigured("LOCAL_MEMORY_CACHES=1 is for a single process, WEB_CONCURRENCY is above 1.")
+AUTH_TOKEN_CACHE_TTL = int(os.getenv("AUTH_TOKEN_CACHE_TTL", 60))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 60 * 5))
+
+
+def shared_cache(name, **options):
+    if LOCAL_MEMORY_CACHES:
+        return {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": name, **options}
+    if REDIS_URL:
+        # Redis evicts by its own maxmemory policy, MAX_ENTRIES is for the other backends
+        options.pop("OPTIONS", None)
+        return {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": REDIS_URL, "KEY_PREFIX": name,
+                **options}
+    return {"BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": f"cache_{name}", **options}
+
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "lookups": shared_cache(
+        "lookups", TIMEOUT=None,
+        OPTIONS={"MAX_ENTRIES": int(os.getenv("LOOKUP_CACHE_MAX_ENTRIES", 5000))},
+    ),
+    "auth": shared_cache(
+        "auth", TIMEOUT=AUTH_TOKEN_CACHE_TTL,
+        OPTIONS={"MAX_ENTRIES": int(os.getenv("AUTH_CACHE_MAX_ENTRIES", 10000))},
+    ),
+    "responses": shared_cache(
+        "responses", TIMEOUT=RESPONSE_CACHE_TTL,
+        OPTIONS={"MAX_ENTRIES": int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", 10000))},
+    ),
+}
+AUTH_CACHE_ALIAS = "auth"
+RESPONSE_CACHE_ALIAS = "responses"
+LOOKUP_CACHE_ALIAS = "lookups"
+NUTRITION_CACHE_TTL = int(os.getenv("NUTRITION_CACHE_TTL", 60 * 60 * 24 * 7))  # FDC data rarely changes
+NUTRITION_CACHE_NEGATIVE_TTL = int(os.getenv("NUTRITION_CACHE_NEGATIVE_TTL", 60 * 30))
+UNSPLASH_CACHE_TTL = int(os.getenv("UNSPLASH_CACHE_TTL", 60 * 60 * 24))  # demo keys only get 50 requests/hour
+UNSPLASH_CACHE_NEGATIVE_TTL = int(os.getenv("UNSPLASH_CACHE_NEGATIVE_TTL", 60 * 10))
+# Expired lookups are kept this much longer, to answer from while an upstream's quota is used up
+LOOKUP_CACHE_STALE_TTL = int(os.getenv("LOOKUP_CACHE_STALE_TTL", 60 * 60 * 24 * 7))
+# Identical lookups running at the same time share one upstream call (fullsnack_project/singleflight.py)
+# Within a process always, across processes too with LOOKUP_COALESCE_SHARED=1 (a lock in the lookups cache, which the
+# workers share, see CACHES). Waiters give up after LOOKUP_COALESCE_WAIT s
+LOOKUP_COALESCE_SHARED = os.getenv("LOOKUP_COALESCE_SHARED", "0") == "1"
+LOOKUP_COALESCE_WAIT = float(os.getenv("LOOKUP_COALESCE_WAIT", 10))
+
+# Food log images (image_app/thumbnails.py): the image job downloads a log's photo once and stores resized WebP/JPEG
+# copies under IMAGE_CACHE_DIR, served by /api/v1/images/t/. Past IMAGE_CACHE_MAX_BYTES the least recently served
+# files are deleted (they are rebuilt from the photo's URL when asked for again). IMAGE_THUMBNAILS=0 turns it off
+IMAGE_THUMBNAILS = os.getenv("IMAGE_THUMBNAILS", "1") == "1"
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", str(BASE_DIR / "image_cache"))
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+# Images are found and stored by background jobs (image_app/jobs.py, run by `manage.py run_image_jobs`).
+# A failing job is retried with backoff up to IMAGE_JOB_MAX_ATTEMPTS times, a worker that died holding a job
+# loses it after IMAGE_JOB_LEASE seconds, finished jobs are deleted after IMAGE_JOB_RETENTION seconds.
+# With IMAGE_AUTO_ENQUEUE every food log created without a photo_id gets the first search result for its name
+IMAGE_JOB_MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", 5))
+IMAGE_JOB_LEASE = int(os.getenv("IMAGE_JOB_LEASE", 120))
+IMAGE_JOB_RETENTION = int(os.getenv("IMAGE_JOB_RETENTION", 60 * 60 * 24 * 7))
+IMAGE_AUTO_ENQUEUE = os.getenv("IMAGE_AUTO_ENQUEUE", "1") == "1"
+
+# Instrumentation (fullsnack_project/instrumentation.py)
+# Server-Timing header on every response, /metrics in Prometheus format (needs "Authorization: Bearer <METRICS_TOKEN>",
+# open without a token only while DEBUG), and per-request cProfile dumps for requests sending "X-Profile: 1"
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "profiles"))
@@ -0,0 +1,93 @@
+# backend/fullsnack_project/singleflight.py
+# Request coalescing: while a call for a key is running, identical calls in the same process wait for its result
+# instead of making their own. QueryCache.get_or_fetch uses it so a trending food costs one upstream call however
+# many users search for it at the same moment (and settings.LOOKUP_COALESCE_SHARED extends that across processes).
+import asyncio
+import threading
+import weakref
+
+
+class _Flight:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    do(key, fn) / ado(key, fn): the first caller for a key runs fn and every caller that arrives before it returns
+    gets the same result (or exception). Returns (leader, value), leader is False for callers that waited.
+    A caller that waited longer than `wait` seconds gives up and runs fn itself.
+    """
+
+    def __init__(self, wait=10):
+        self.wait = wait
+        self._flights = {}
+        self._lock = threading.Lock()
+        # Futures belong to one event loop, so the async flights are kept per loop
+        self._async_flights = weakref.WeakKeyDictionary()
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(self.wait):
+                return True, fn()
+            if flight.error is not None:
+                raise flight.error
+            return False, flight.value
+
+        try:
+            flight.value = fn()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return True, flight.value
+
+    async def ado(self, key, fn):
+        # fn is an async function, runs in the current event loop
+        flights = self._async_flights.setdefault(asyncio.get_running_loop(), {})
+        future = flights.get(key)
+        if future is not None:
+            try:
+                # shield: a waiter that is cancelled (client gone) must not cancel the call the others wait on
+                return False, await asyncio.wait_for(asyncio.shield(future), self.wait)
+            except asyncio.TimeoutError:
+                return True, await fn()
+            except asyncio.CancelledError:
+                # The leader was cancelled, not us: make the call ourselves
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                return True, await fn()
+
+        future = flights[key] = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting, an unretrieved exception would otherwise be logged
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            value = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+        finally:
+            flights.pop(key, None)
+        return True, value
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
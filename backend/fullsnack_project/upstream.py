@@ -0,0 +1,265 @@
+# backend/fullsnack_project/upstream.py
+# Shared clients for the third-party APIs we call (USDA FoodData Central and Unsplash, and Unsplash's image CDN).
+#
+# Every upstream gets one pooled requests.Session (reused keep-alive connections), bounded retries with
+# jittered backoff for transient failures, a circuit breaker that fails fast while the upstream is down,
+# a token bucket that keeps every worker together under the API key's hourly quota (quota.py)
+# and latency/error metrics. Settings live in settings.UPSTREAM_HTTP. The async views use the same
+# breaker and metrics through aget() on top of the pooled httpx clients in async_http.py.
+import asyncio
+import random
+import threading
+import time
+
+import httpx
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import async_http, instrumentation, quota
+from .metrics import Counter, Histogram
+
+# Answers worth retrying, they are usually gone a moment later
+RETRY_STATUSES = (502, 503, 504)
+
+
+class CircuitOpenError(requests.RequestException):
+    # Raised instead of calling an upstream whose circuit breaker is open
+    pass
+
+
+class CircuitBreaker:
+    """
+    closed: calls go through, consecutive failures are counted.
+    open: after `failure_threshold` failures in a row every call fails fast for `reset_timeout` seconds.
+    half-open: once the timeout passed a single trial call is let through, its outcome closes or reopens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def cancel_trial(self):
+        # The trial call ended without an outcome (no quota left, cancelled...), the next call may be the trial
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.reset()
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class Upstream:
+    def __init__(self, name):
+        self.name = name
+        self.latency = Histogram()
+        self.errors = Counter()
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._breaker = None
+        self.bucket = quota.TokenBucket(name)
+
+    @property
+    def config(self):
+        return settings.UPSTREAM_HTTP[self.name]
+
+    @property
+    def breaker(self):
+        if self._breaker is None:
+            self._breaker = CircuitBreaker(
+                failure_threshold=self.config.get("breaker_failures", 5),
+                reset_timeout=self.config.get("breaker_reset", 30),
+            )
+        return self._breaker
+
+    @property
+    def session(self):
+        # Built on first use, then shared by every request (and thread) of this process
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    retry = Retry(
+                        total=self.config.get("retries", 2),
+                        backoff_factor=self.config.get("backoff", 0.2),
+                        backoff_jitter=self.config.get("backoff", 0.2),
+                        status_forcelist=RETRY_STATUSES,
+                        allowed_methods=frozenset({"GET"}),
+                        raise_on_status=False,
+                    )
+                    adapter = HTTPAdapter(
+                        pool_connections=1,
+                        pool_maxsize=self.config["max_connections"],
+                        max_retries=retry,
+                    )
+                    session = requests.Session()
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def timeout(self):
+        return (self.config.get("connect_timeout", 3), self.config["timeout"])
+
+    def get(self, url, **kwargs):
+        # Same as requests.get, through the pooled session and the circuit breaker
+        # Raises CircuitOpenError (a requests.RequestException) without calling out while the circuit is open
+        # and quota.QuotaExceeded when the API key's budget can't fit the call at the current priority
+        self._before_call()
+        recorded = False
+        try:
+            self._take_quota()
+            start = time.perf_counter()
+            try:
+                response = self.session.get(url, timeout=self.timeout(), **kwargs)
+            except requests.RequestException as e:
+                recorded = True
+                self._after_error(e, start)
+                raise
+            recorded = True
+            self._after_response(response, start)
+            return response
+        finally:
+            if not recorded:
+                self._no_outcome()
+
+    async def aget(self, url, **kwargs):
+        # Async version of get() on the shared httpx client, retries transient failures the same way
+        self._before_call()
+        recorded = False
+        try:
+            await self._atake_quota()
+            start = time.perf_counter()
+            retries = self.config.get("retries", 2)
+            client = async_http.get_client(self.name)
+            for attempt in range(retries + 1):
+                try:
+                    response = await client.get(url, **kwargs)
+                except httpx.TransportError as e:
+                    if attempt == retries:
+                        recorded = True
+                        self._after_error(e, start)
+                        raise
+                except httpx.HTTPError as e:
+                    recorded = True
+                    self._after_error(e, start)
+                    raise
+                else:
+                    if response.status_code not in RETRY_STATUSES or attempt == retries:
+                        recorded = True
+                        self._after_response(response, start)
+                        return response
+                await asyncio.sleep(self.backoff_delay(attempt))
+        finally:
+            if not recorded:
+                self._no_outcome()
+
+    def backoff_delay(self, attempt):
+        # Exponential backoff with jitter so retries from many workers don't line up
+        backoff = self.config.get("backoff", 0.2)
+        return backoff * (2 ** attempt) + random.uniform(0, backoff)
+
+    def snapshot(self):
+        return {
+            "circuit": self.breaker.state,
+            "latency_seconds": self.latency.snapshot(),
+            "errors": self.errors.snapshot(),
+            "quota": self.bucket.snapshot(),
+        }
+
+    def _before_call(self):
+        if not self.breaker.allow():
+            self.errors.inc("circuit_open")
+            raise CircuitOpenError(f"{self.name} circuit is open, not calling it.")
+
+    def _take_quota(self):
+        # Calls the bucket has no token for (at their priority) are shed right away
+        if not self.bucket.enabled:
+            return
+        wait = self.bucket.take(quota.current_priority())
+        if wait:
+            self._shed(wait)
+
+    async def _atake_quota(self):
+        if not self.bucket.enabled:
+            return
+        wait = await sync_to_async(self.bucket.take)(quota.current_priority())
+        if wait:
+            self._shed(wait)
+
+    def _shed(self, retry_after):
+        self.errors.inc("quota")
+        raise quota.QuotaExceeded(self.name, retry_after)
+
+    def _no_outcome(self):
+        # The call ended without an answer or a network error to judge the upstream by (quota shed, cache backend
+        # error, the task cancelled when an ASGI client disconnects...): if it was the half-open trial, the next
+        # call takes its place instead of the circuit staying open for good
+        self.breaker.cancel_trial()
+
+    def _after_error(self, error, start):
+        elapsed = time.perf_counter() - start
+        self.latency.observe(elapsed)
+        instrumentation.record_upstream(elapsed)
+        self.errors.inc("timeout" if isinstance(error, (requests.Timeout, httpx.TimeoutException)) else "connection")
+        self.breaker.record_failure()
+
+    def _after_response(self, response, start):
+        elapsed = time.perf_counter() - start
+        self.latency.observe(elapsed)
+        instrumentation.record_upstream(elapsed)
+        if response.status_code >= 500:
+            self.errors.inc(f"status_{response.status_code}")
+            self.breaker.record_failure()
+        else:
+            if response.status_code >= 400:
+                # 4xx means the upstream is up (bad request, quota...), it doesn't trip the breaker
+                self.errors.inc(f"status_{response.status_code}")
+            if response.status_code == 429 and self.bucket.enabled:
+                # Our count was off (the key is shared, or restarted), every worker stops until the bucket refills
+                self.bucket.drain()
+            self.breaker.record_success()
+
+
+usda = Upstream("usda")
+unsplash = Upstream("unsplash")
+images = Upstream("images")
+UPSTREAMS = {upstream.name: upstream for upstream in (usda, unsplash, images)}
+
+
+def snapshot():
+    # Metrics and breaker state of every upstream, keyed by name
+    return {name: upstream.snapshot() for name, upstream in UPSTREAMS.items()}
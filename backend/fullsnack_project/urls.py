@@ -16,6 +16,7 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from .views import CacheHealth, Metrics, UpstreamHealth
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -23,4 +24,7 @@ urlpatterns = [
     path("api/v1/foods/", include("food_data_app.urls")),
     path("api/v1/dates/", include("datetime_app.urls")),
     path("api/v1/images/", include("image_app.urls")),
+    path("api/v1/health/upstreams/", UpstreamHealth.as_view(), name="upstream-health"),
+    path("api/v1/health/caches/", CacheHealth.as_view(), name="cache-health"),
+    path("metrics", Metrics.as_view(), name="metrics"),
 ]
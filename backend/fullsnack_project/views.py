@@ -0,0 +1,51 @@
+# backend/fullsnack_project/views.py
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound
+from django.views import View
+from rest_framework.views import APIView
+from rest_framework.response import Response
+from rest_framework.permissions import IsAdminUser
+
+from . import instrumentation, upstream
+from .caching import responses
+
+
+# /api/v1/health/upstreams/ -> circuit breaker state, latency histogram and error counts per upstream (this worker only)
+class UpstreamHealth(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(upstream.snapshot())
+
+
+# /api/v1/health/caches/ -> hit/miss counts and hit rate of the shared lookup caches and the per-user response cache
+class CacheHealth(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        # Imported here so the project package doesn't depend on the apps at import time
+        from food_data_app.fdc import nutrition_cache
+        from image_app.unsplash import photo_cache, search_cache
+
+        return Response({
+            "nutrition": nutrition_cache.stats(),
+            "unsplash_search": search_cache.stats(),
+            "unsplash_photo": photo_cache.stats(),
+            "responses": responses.stats(),
+        })
+
+
+# /metrics -> per-view request, DB, upstream and cache metrics of this worker, in Prometheus text format
+class Metrics(View):
+
+    def get(self, request):
+        token = settings.METRICS_TOKEN
+        if token:
+            sent = request.headers.get("Authorization", "").removeprefix("Bearer ")
+            if not hmac.compare_digest(sent, token):
+                return HttpResponseForbidden()
+        elif not settings.DEBUG:
+            return HttpResponseNotFound()
+        return HttpResponse(instrumentation.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
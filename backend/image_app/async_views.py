@@ -0,0 +1,72 @@
+# backend/image_app/async_views.py
+# ASGI variants of the Unsplash views, they don't hold a worker thread while Unsplash answers
+import httpx
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+
+from fullsnack_project import quota, upstream
+from fullsnack_project.async_views import AsyncAPIView
+from food_data_app.models import FoodLog
+from food_data_app.serializers import FoodLogSerializer
+from . import jobs, unsplash
+from .views import MAX_KEY_LENGTH
+
+
+async def fetch(lookup, arg, level=quota.NORMAL):
+    # Runs an unsplash.a* lookup at a quota priority, returns (result, error response)
+    try:
+        with quota.priority(level):
+            return await lookup(arg), None
+    except (httpx.HTTPError, upstream.CircuitOpenError):
+        return None, JsonResponse({"detail": "Failed to reach Unsplash."}, status=502)
+    except unsplash.UnsplashError as e:
+        return None, JsonResponse({"detail": "Unsplash error.", "status": e.status}, status=502)
+    except quota.QuotaExceeded as e:
+        response = JsonResponse({"detail": "Image search is busy, try again shortly."}, status=503)
+        response["Retry-After"] = quota.retry_after_header(e)
+        return None, response
+
+
+# /api/v1/images/search/async/ -> same contract as UnsplashPreview
+class AsyncUnsplashPreview(AsyncAPIView):
+
+    async def get(self, request):
+        query = (request.GET.get("q") or "").strip()
+        if not query:
+            return JsonResponse({"detail": "Missing query param 'q'."}, status=400)
+
+        results, error = await fetch(unsplash.asearch_photos, query, quota.LOW)
+        if error:
+            return error
+        return JsonResponse({"images": [unsplash.preview_image(item, query) for item in results]})
+
+
+# /api/v1/images/foodlogs/<pk>/set/async/ -> same contract as SetFoodLogImage
+class AsyncSetFoodLogImage(AsyncAPIView):
+
+    async def patch(self, request, pk):
+        data = self.get_data(request)
+        photo_id = str(data.get("photo_id") or request.GET.get("photo_id") or "").strip()
+        q = (data.get("q") or request.GET.get("q") or "").strip()
+        if not photo_id and not q:
+            return JsonResponse({"detail": "Missing query 'q'."}, status=400)
+        if photo_id and not jobs.is_photo_id(photo_id):
+            return JsonResponse({"detail": "Invalid 'photo_id'."}, status=400)
+        key = request.headers.get("Idempotency-Key")
+        if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+            return JsonResponse({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."}, status=400)
+
+        # Gets current user's foodlog based on foodlog ID
+        foodlog = await FoodLog.objects.filter(pk=pk, user=request.user).select_related("image").afirst()
+        if foodlog is None:
+            return JsonResponse({"detail": "No FoodLog matches the given query."}, status=404)
+
+        try:
+            job, created = await sync_to_async(jobs.enqueue)(foodlog, photo_id, q, key)
+        except jobs.IdempotencyConflict as e:
+            return JsonResponse({"detail": str(e)}, status=409)
+        if created:
+            await sync_to_async(jobs.mark_pending)(foodlog)
+
+        data = await sync_to_async(lambda: FoodLogSerializer(foodlog).data)()
+        return JsonResponse({"foodlog": data, "job": jobs.job_data(job)}, status=202)
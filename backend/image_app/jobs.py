@@ -0,0 +1,223 @@
+# backend/image_app/jobs.py
+# Background queue for food log images, kept in the database (ImageJob) so it needs no broker.
+# Setting an image only records what to look for and answers 202: a worker (`manage.py run_image_jobs`) then
+# searches Unsplash, stores the thumbnails and saves the photo on the log, while the client polls the log's
+# image_status (pending -> ready / failed).
+#
+# Workers claim due jobs with SELECT ... FOR UPDATE SKIP LOCKED (on Postgres) and a conditional UPDATE, so any
+# number of them can run side by side, and hold a job for IMAGE_JOB_LEASE seconds. Failures that may pass
+# (Unsplash down, quota used up) are retried with exponential backoff, the others fail the job right away.
+# Only the newest job of a log is applied, an older one still queued or running is cancelled. Photos are stored
+# once (FoodImage), a job for a photo some log already uses needs no Unsplash call.
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from fullsnack_project import quota
+from fullsnack_project.caching import responses
+from food_data_app.models import FoodLog, ImageStatus
+from . import thumbnails, unsplash
+from .models import FoodImage, ImageJob
+
+# Unsplash photo ids are short URL-safe strings, anything else is refused before it reaches ImageJob or a URL path
+PHOTO_ID_RE = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+# Retry delays: RETRY_BASE * 2^(attempt - 1) seconds, at most RETRY_MAX
+RETRY_BASE = 5
+RETRY_MAX = 60 * 10
+
+
+class IdempotencyConflict(Exception):
+    # The Idempotency-Key was already used for a different request
+    pass
+
+
+class JobFailed(Exception):
+    # Retrying won't help (nothing found, Unsplash refused the request)
+    pass
+
+
+def is_photo_id(value):
+    return bool(PHOTO_ID_RE.fullmatch(value))
+
+
+def enqueue(foodlog, photo_id="", query="", key=None):
+    """
+    Queues a job finding foodlog's image: the photo photo_id if given, else the first search result for query.
+    key: the client's Idempotency-Key, a repeated key returns the job it created the first time.
+    Returns (job, created). Doesn't touch foodlog.image_status, callers mark it pending.
+    Raises ValueError for a photo_id that isn't one (views check is_photo_id() first and answer 400).
+    """
+    if photo_id and not is_photo_id(photo_id):
+        raise ValueError(f"Not an Unsplash photo id: {photo_id[:70]!r}")
+    fields = {"foodlog_id": foodlog.pk, "photo_id": photo_id, "query": query[:200]}
+    if key is None:
+        return ImageJob.objects.create(**fields), True
+
+    key = f"{foodlog.user_id}:{key}"
+    job = ImageJob.objects.filter(idempotency_key=key).first()
+    if job is None:
+        try:
+            with transaction.atomic():
+                return ImageJob.objects.create(idempotency_key=key, **fields), True
+        except IntegrityError:
+            # The same request retried while the first was still in flight
+            job = ImageJob.objects.get(idempotency_key=key)
+    if any(getattr(job, field) != value for field, value in fields.items()):
+        raise IdempotencyConflict("This Idempotency-Key was used for a different request.")
+    return job, False
+
+
+def mark_pending(foodlog):
+    # A plain UPDATE, FoodLog.save() would also re-apply the (unchanged) macros to the totals
+    FoodLog.objects.filter(pk=foodlog.pk).update(image_status=ImageStatus.PENDING)
+    foodlog.image_status = ImageStatus.PENDING
+    responses.bump(foodlog.user_id)
+
+
+def job_data(job):
+    return {"id": job.pk, "status": job.status, "attempts": job.attempts}
+
+
+def claim(limit=10, worker=None):
+    # Takes up to limit due jobs (queued and ready to run, or running on a lease that expired) for this worker
+    worker = worker or uuid.uuid4().hex
+    now = timezone.now()
+    due = Q(status=ImageJob.Status.QUEUED, run_after__lte=now) | Q(status=ImageJob.Status.RUNNING, locked_until__lt=now)
+    with transaction.atomic():
+        # Rows another worker is claiming are skipped instead of waited on (databases without row locks rely on
+        # the update's condition: a job another worker took in between is no longer due)
+        pks = list(
+            ImageJob.objects.select_for_update(skip_locked=True)
+            .filter(due).order_by('run_after', 'pk').values_list('pk', flat=True)[:limit]
+        )
+        if not pks:
+            return []
+        ImageJob.objects.filter(due, pk__in=pks).update(
+            status=ImageJob.Status.RUNNING, worker=worker, attempts=F('attempts') + 1,
+            locked_until=now + timedelta(seconds=settings.IMAGE_JOB_LEASE),
+        )
+    return list(ImageJob.objects.filter(pk__in=pks, worker=worker, status=ImageJob.Status.RUNNING).order_by('pk'))
+
+
+def run(job):
+    # Runs a claimed job and records the outcome, returns the job's new status
+    if _superseded(job):
+        return _finish(job, ImageJob.Status.CANCELLED)
+    try:
+        image = _known_image(job.photo_id) or _new_image(job)
+        with transaction.atomic():
+            foodlog = FoodLog.objects.select_for_update().filter(pk=job.foodlog_id).first()
+            if foodlog is None or _superseded(job):
+                return _finish(job, ImageJob.Status.CANCELLED)
+            foodlog.image = image
+            foodlog.image_status = ImageStatus.READY
+            foodlog.save()
+            return _finish(job, ImageJob.Status.DONE)
+    except JobFailed as e:
+        return _fail(job, str(e))
+    except quota.QuotaExceeded as e:
+        return _retry(job, str(e), delay=e.retry_after)
+    except Exception as e:
+        # Unsplash unreachable or a 5xx, or a bug: retried, and failed for good once out of attempts
+        return _retry(job, f"{type(e).__name__}: {e}")
+
+
+def run_pending(limit=10, worker=None):
+    # Claims and runs due jobs until there are none left, returns how many ran
+    count = 0
+    while True:
+        claimed = claim(limit, worker)
+        if not claimed:
+            return count
+        for job in claimed:
+            run(job)
+        count += len(claimed)
+
+
+def prune():
+    # Deletes jobs finished more than IMAGE_JOB_RETENTION seconds ago, returns how many
+    cutoff = timezone.now() - timedelta(seconds=settings.IMAGE_JOB_RETENTION)
+    return ImageJob.objects.filter(finished_at__lt=cutoff).delete()[0]
+
+
+def _known_image(photo_id):
+    # A photo some log already uses costs no Unsplash call (nor download, unless its thumbnails are missing)
+    image = FoodImage.objects.filter(photo_id=photo_id).first() if photo_id else None
+    if image is not None and not image.digest:
+        image.digest = thumbnails.local_copy(image.url)
+        if image.digest:
+            image.save(update_fields=['digest'])
+    return image
+
+
+def _new_image(job):
+    photo = _find_photo(job)
+    # A search can land on a photo we already have
+    image = _known_image(photo.get("id"))
+    if image is not None:
+        return image
+    # Downloaded and resized before taking any lock, kept even if the job ends up cancelled
+    image = unsplash.save_photo(photo, thumbnails.local_copy(unsplash.chosen_url(photo)))
+    if image is None:
+        raise JobFailed("No usable image URL returned.")
+    return image
+
+
+def _find_photo(job):
+    # The jobs run at normal priority, the reserve the previews leave is theirs (a shed job is retried later)
+    try:
+        with quota.priority(quota.NORMAL):
+            if job.photo_id:
+                photo = unsplash.get_photo(job.photo_id)
+            else:
+                results = unsplash.search_photos(job.query)
+                photo = results[0] if results else None
+    except unsplash.UnsplashError as e:
+        if e.status == 429 or e.status >= 500:
+            raise
+        raise JobFailed(f"Unsplash error {e.status}.")
+    if photo is None:
+        raise JobFailed("No images found for that query.")
+    return photo
+
+
+def _superseded(job):
+    return ImageJob.objects.filter(foodlog_id=job.foodlog_id, pk__gt=job.pk).exists()
+
+
+def _finish(job, status, error=""):
+    job.status = status
+    job.last_error = error[:500]
+    job.finished_at = timezone.now()
+    job.locked_until = None
+    job.save(update_fields=['status', 'last_error', 'finished_at', 'locked_until'])
+    return status
+
+
+def _retry(job, error, delay=None):
+    if job.attempts >= settings.IMAGE_JOB_MAX_ATTEMPTS:
+        return _fail(job, error)
+    if delay is None:
+        delay = min(RETRY_BASE * 2 ** (job.attempts - 1), RETRY_MAX)
+    job.status = ImageJob.Status.QUEUED
+    job.last_error = error[:500]
+    job.run_after = timezone.now() + timedelta(seconds=delay)
+    job.locked_until = None
+    job.save(update_fields=['status', 'last_error', 'run_after', 'locked_until'])
+    return job.status
+
+
+def _fail(job, error):
+    with transaction.atomic():
+        # The log only shows the failure if no newer job is on its way
+        user_id = FoodLog.objects.filter(pk=job.foodlog_id).values_list('user_id', flat=True).first()
+        if user_id is not None and not _superseded(job):
+            FoodLog.objects.filter(pk=job.foodlog_id).update(image_status=ImageStatus.FAILED)
+            responses.bump(user_id)
+        return _finish(job, ImageJob.Status.FAILED, error)
@@ -0,0 +1,54 @@
+import os
+import socket
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from image_app import jobs
+
+# Idle polls between deletes of old finished jobs
+PRUNE_EVERY = 500
+
+
+# Runs the queued image jobs (see image_app/jobs.py). Keep one or more running next to the web server (systemd,
+# supervisord...), workers can share the queue. --once drains what is due and exits (cron, tests, deploy scripts)
+class Command(BaseCommand):
+    help = "Finds and stores the images of food logs queued by the API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run the jobs that are due, then exit.")
+        parser.add_argument("--batch", type=int, default=10, help="Jobs claimed at a time.")
+        parser.add_argument("--poll", type=float, default=2.0, help="Seconds to wait when the queue is empty.")
+
+    def handle(self, *args, **options):
+        if options["batch"] < 1 or options["poll"] <= 0:
+            raise CommandError("--batch must be at least 1 and --poll positive.")
+        # Shows up on the jobs it holds, to tell which worker has what
+        worker = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"[:64]
+
+        if options["once"]:
+            ran = jobs.run_pending(options["batch"], worker)
+            self.stdout.write(self.style.SUCCESS(f"Ran {ran} image job(s)."))
+            return
+
+        self.stdout.write(f"Image worker {worker} started, Ctrl+C to stop.")
+        idle = 0
+        try:
+            while True:
+                # Long running: connections the database dropped (or past CONN_MAX_AGE) are replaced
+                close_old_connections()
+                claimed = jobs.claim(options["batch"], worker)
+                for job in claimed:
+                    status = jobs.run(job)
+                    self.stdout.write(f"Job {job.pk} (food log {job.foodlog_id}): {status}")
+                if claimed:
+                    continue
+                if idle % PRUNE_EVERY == 0:
+                    jobs.prune()
+                idle += 1
+                time.sleep(options["poll"])
+        except KeyboardInterrupt:
+            # Jobs claimed but not finished go back to the queue once their lease runs out
+            self.stdout.write("Image worker stopped.")
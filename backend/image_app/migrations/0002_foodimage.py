@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('image_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodImage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('photo_id', models.CharField(blank=True, max_length=64, null=True, unique=True)),
+                ('url', models.URLField(max_length=2048)),
+                ('digest', models.CharField(blank=True, db_index=True, max_length=64)),
+                ('credit_name', models.CharField(blank=True, max_length=120)),
+                ('credit_profile', models.URLField(blank=True)),
+                ('credit_photo', models.URLField(blank=True)),
+                ('credit_source', models.CharField(blank=True, default='Unsplash', max_length=50)),
+            ],
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import models
+from django.utils import timezone
+
+from food_data_app.models import FoodLog
+
+
+class FoodImage(models.Model):
+    # A photo used by food logs, stored once however many logs show it (a user logs "banana" hundreds of times)
+    # Photos picked on Unsplash are found again by their id, imported ones (see food_data_app/importer.py) by url
+    photo_id = models.CharField(max_length=64, unique=True, null=True, blank=True)
+    url = models.URLField(max_length=2048)
+    # sha256 of the downloaded photo, names its local thumbnails (see thumbnails.py), empty when there are none
+    digest = models.CharField(max_length=64, blank=True, db_index=True)
+    # Credits Unsplash requires us to show with the photo
+    credit_name = models.CharField(max_length=120, blank=True)
+    credit_profile = models.URLField(blank=True)
+    credit_photo = models.URLField(blank=True)
+    credit_source = models.CharField(max_length=50, blank=True, default="Unsplash")
+
+    def __str__(self):
+        return self.photo_id or self.url
+
+
+class ImageJob(models.Model):
+    # A request to find and store a food log's image, run by `manage.py run_image_jobs` (see jobs.py)
+    class Status(models.TextChoices):
+        QUEUED = "queued", "Queued"
+        RUNNING = "running", "Running"
+        DONE = "done", "Done"
+        FAILED = "failed", "Failed"
+        # A newer job for the same log came in before this one was applied
+        CANCELLED = "cancelled", "Cancelled"
+
+    foodlog = models.ForeignKey(FoodLog, on_delete=models.CASCADE, related_name='image_jobs')
+    # The previewed photo to use, else the first search result for query
+    photo_id = models.CharField(max_length=64, blank=True)
+    query = models.CharField(max_length=200, blank=True)
+    # "<user id>:<Idempotency-Key header>", a retried request gets the job its first attempt made
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Not run before run_after (retries back off). A running job belongs to `worker` until locked_until,
+    # past it the worker is presumed dead and the job is picked up again
+    run_after = models.DateTimeField(default=timezone.now)
+    worker = models.CharField(max_length=64, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.CharField(max_length=500, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Serves the worker's "what is due" poll
+            models.Index(fields=['status', 'run_after'], name='imagejob_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"Image job {self.pk} for food log {self.foodlog_id} ({self.status})"
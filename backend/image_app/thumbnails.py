@@ -0,0 +1,201 @@
+# backend/image_app/thumbnails.py
+# Local copies of food log images. The image job (jobs.py) downloads the photo once and stores resized WebP and JPEG
+# versions of it, so dashboards load small files from us instead of full-size photos from Unsplash.
+#
+# Files are content addressed: named after the sha256 of the downloaded photo, under
+# IMAGE_CACHE_DIR/<first 2 hex>/<digest>-<size>.<format>. The same photo picked for many logs is stored once, and a
+# file never changes once written, so it is served with a year long immutable Cache-Control. When the folder grows
+# past IMAGE_CACHE_MAX_BYTES the least recently served files (serving touches the mtime) are deleted; asking for one
+# again rebuilds it from the URL of the FoodImage it belongs to (see views.Thumbnail). The folder is only scanned
+# when this worker's running count of it goes over the budget, or every EVICT_INTERVAL seconds for the files the
+# other workers wrote.
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import requests
+from django.conf import settings
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from fullsnack_project import upstream
+
+# Longest side of each size in pixels: "sm" for lists and cards on phones, "md" for the dashboard cards
+SIZES = {"sm": 160, "md": 480}
+# Format -> (Pillow format, content type, save options)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Bigger downloads are refused, Unsplash "regular" photos are a few hundred KB
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+# Eviction deletes down to this share of IMAGE_CACHE_MAX_BYTES, so it doesn't run again on the next store
+EVICT_TO = 0.9
+# Longest time between two scans of the folder, other workers' writes aren't in this one's count
+EVICT_INTERVAL = 300
+
+# Folder -> (bytes in it as of the last scan plus what this worker wrote since, time.monotonic() of that scan)
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+class ThumbnailError(Exception):
+    # The photo couldn't be downloaded or isn't an image we can read
+    pass
+
+
+def root():
+    return Path(settings.IMAGE_CACHE_DIR)
+
+
+def path_for(digest, size, fmt):
+    return root() / digest[:2] / f"{digest}-{size}.{fmt}"
+
+
+def is_digest(value):
+    return len(value) == 64 and all(c in "0123456789abcdef" for c in value)
+
+
+def content_type(fmt):
+    return FORMATS[fmt][1]
+
+
+def negotiate(accept):
+    # WebP for browsers that say they take it (all current ones do for <img>), JPEG for the rest
+    return "webp" if "image/webp" in (accept or "") else "jpeg"
+
+
+def download(url):
+    # Raises ThumbnailError, and requests.RequestException when the image host can't be reached
+    r = upstream.images.get(url, stream=True)
+    with r:
+        if r.status_code != 200:
+            raise ThumbnailError(f"Image download failed with status {r.status_code}.")
+        data = bytearray()
+        for chunk in r.iter_content(64 * 1024):
+            data += chunk
+            if len(data) > MAX_SOURCE_BYTES:
+                raise ThumbnailError("Image is too large.")
+    return bytes(data)
+
+
+def store(data):
+    """
+    Writes every size and format of the image in data (bytes) and returns its digest. An image already stored is
+    not decoded again. Raises ThumbnailError when data isn't an image Pillow can read.
+    """
+    digest = hashlib.sha256(data).hexdigest()
+    missing = [(size, fmt) for size in SIZES for fmt in FORMATS if not path_for(digest, size, fmt).exists()]
+    if not missing:
+        return digest
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # Phone photos are often stored sideways with an EXIF rotation, JPEG has no alpha channel
+            image = ImageOps.exif_transpose(image).convert("RGB")
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        raise ThumbnailError("Not a readable image.") from e
+
+    resized = {}
+    written = 0
+    for size, fmt in missing:
+        if size not in resized:
+            resized[size] = image.copy()
+            # Keeps the aspect ratio and never upscales
+            resized[size].thumbnail((SIZES[size], SIZES[size]), Image.Resampling.LANCZOS)
+        written += _write(path_for(digest, size, fmt), resized[size], fmt)
+    if _count(written):
+        evict()
+    return digest
+
+
+def store_url(url):
+    # download() then store(), returns the digest
+    return store(download(url))
+
+
+def local_copy(url):
+    # Digest of url's thumbnails, made if needed. "" when they can't be (turned off, image host down, not an image):
+    # the log then keeps showing image_url
+    if not url or not settings.IMAGE_THUMBNAILS:
+        return ""
+    try:
+        return store_url(url)
+    except (requests.RequestException, ThumbnailError):
+        return ""
+
+
+def read_thumbnail(digest, size, fmt):
+    # Bytes of a stored thumbnail (None when it isn't there), marked as just used for eviction
+    # Thumbnails are a few KB, read whole they go out in one write (and GZipMiddleware leaves them alone)
+    path = path_for(digest, size, fmt)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return data
+
+
+def _count(written):
+    # Adds the bytes just written to the folder's count, True when it's time to scan it (over budget, never scanned
+    # by this worker, or scanned too long ago)
+    with _usage_lock:
+        used, scanned_at = _usage.get(root(), (None, 0))
+        if used is None or time.monotonic() - scanned_at >= EVICT_INTERVAL:
+            return True
+        _usage[root()] = (used + written, scanned_at)
+        return used + written > settings.IMAGE_CACHE_MAX_BYTES
+
+
+def evict(max_bytes=None):
+    # Deletes the least recently used files until the folder is back under its budget, returns the bytes freed
+    max_bytes = settings.IMAGE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    files = []
+    total = 0
+    for path in root().glob("*/*"):
+        if path.suffix == ".tmp":
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+        total += stat.st_size
+
+    freed = 0
+    if total > max_bytes:
+        target = total - max_bytes * EVICT_TO
+        for _, size, path in sorted(files):
+            if freed >= target:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                continue
+            freed += size
+    with _usage_lock:
+        _usage[root()] = (total - freed, time.monotonic())
+    return freed
+
+
+def _write(path, image, fmt):
+    # Written to a temporary file and renamed, so a concurrent reader never sees half a file. Returns its size
+    pillow_format, _, options = FORMATS[fmt]
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, pillow_format, **options)
+            size = f.tell()
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return size
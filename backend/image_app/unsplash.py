@@ -0,0 +1,190 @@
+# backend/image_app/unsplash.py
+# Builds Unsplash API requests and turns the photos it returns into what our views send back / store.
+# Search results are cached per normalized query and every photo by its id, so picking a previewed
+# image doesn't search Unsplash a second time (and we stay under the hourly quota).
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from fullsnack_project import upstream
+from fullsnack_project.caching import QueryCache, normalize_query
+from .models import FoodImage
+
+# Required for using Unsplash API
+APP_UTM = "FullSnack"
+
+# Number of photos fetched per search, the preview shows all of them and the setter uses the first
+SEARCH_SIZE = 6
+
+search_cache = QueryCache(
+    "unsplash-search",
+    alias=settings.LOOKUP_CACHE_ALIAS,
+    ttl=settings.UNSPLASH_CACHE_TTL,
+    negative_ttl=settings.UNSPLASH_CACHE_NEGATIVE_TTL,
+    stale_ttl=settings.LOOKUP_CACHE_STALE_TTL,
+)
+# Photo ids are case-sensitive, so they are not lower-cased like queries
+photo_cache = QueryCache(
+    "unsplash-photo",
+    alias=settings.LOOKUP_CACHE_ALIAS,
+    ttl=settings.UNSPLASH_CACHE_TTL,
+    normalize=str,
+    stale_ttl=settings.LOOKUP_CACHE_STALE_TTL,
+)
+
+
+class UnsplashError(Exception):
+    # Unsplash answered, but not with a 200
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def search_url():
+    return f"{settings.UNSPLASH_API_URL}/search/photos"
+
+
+def photo_url(photo_id):
+    return f"{settings.UNSPLASH_API_URL}/photos/{photo_id}"
+
+
+def search_params(query, per_page):
+    return {"query": query, "per_page": per_page, "orientation": "squarish"}
+
+
+def headers():
+    return {
+        "Accept-Version": "v1",
+        "Authorization": f"Client-ID {settings.UNSPLASH_API_KEY}",
+    }
+
+
+def compact_photo(item):
+    # Only the parts of an Unsplash photo we use, keeps cache entries small
+    urls = item.get("urls") or {}
+    user = item.get("user") or {}
+    return {
+        "id": item.get("id"),
+        "alt_description": item.get("alt_description"),
+        "urls": {size: urls.get(size) for size in ("thumb", "small", "regular", "full")},
+        "user": {"name": user.get("name"), "links": {"html": (user.get("links") or {}).get("html")}},
+        "links": {"html": (item.get("links") or {}).get("html")},
+    }
+
+
+def remember(payload):
+    # Compact photos of a search response, each one also cached by id (the search itself is cached by the caller)
+    photos = [compact_photo(item) for item in (payload or {}).get("results", [])]
+    for photo in photos:
+        if photo["id"]:
+            photo_cache.set(photo["id"], photo)
+    return photos
+
+
+def search_photos(query):
+    # Compact photos for query, from the cache when this query was searched recently
+    # Concurrent searches for the same query share one Unsplash call (see QueryCache.get_or_fetch)
+    # Raises requests.RequestException when Unsplash can't be reached and UnsplashError on a non-200 answer
+    query = normalize_query(query)
+
+    def fetch():
+        r = upstream.unsplash.get(search_url(), params=search_params(query, SEARCH_SIZE), headers=headers())
+        if r.status_code != 200:
+            raise UnsplashError(r.status_code)
+        return remember(r.json())
+
+    return search_cache.get_or_fetch(query, fetch)[1]
+
+
+def get_photo(photo_id):
+    # Compact photo by id (None if Unsplash doesn't know it), previewed photos are already cached
+    def fetch():
+        r = upstream.unsplash.get(photo_url(photo_id), headers=headers())
+        if r.status_code == 404:
+            return None
+        if r.status_code != 200:
+            raise UnsplashError(r.status_code)
+        return compact_photo(r.json() or {})
+
+    return photo_cache.get_or_fetch(photo_id, fetch)[1]
+
+
+async def asearch_photos(query):
+    # Async version of search_photos
+    # Raises httpx.HTTPError (or upstream.CircuitOpenError) when Unsplash can't be reached and UnsplashError on a non-200 answer
+    query = normalize_query(query)
+
+    async def fetch():
+        r = await upstream.unsplash.aget(search_url(), params=search_params(query, SEARCH_SIZE), headers=headers())
+        if r.status_code != 200:
+            raise UnsplashError(r.status_code)
+        return await sync_to_async(remember)(r.json())
+
+    return (await search_cache.aget_or_fetch(query, fetch))[1]
+
+
+async def aget_photo(photo_id):
+    # Async version of get_photo
+    async def fetch():
+        r = await upstream.unsplash.aget(photo_url(photo_id), headers=headers())
+        if r.status_code == 404:
+            return None
+        if r.status_code != 200:
+            raise UnsplashError(r.status_code)
+        return compact_photo(r.json() or {})
+
+    return (await photo_cache.aget_or_fetch(photo_id, fetch))[1]
+
+
+def preview_image(item, query):
+    # Shape of one card in the image picker
+    urls = item.get("urls") or {}
+    user = item.get("user") or {}
+    return {
+        "id": item.get("id"),
+        "alt": item.get("alt_description") or query,
+        "thumb": urls.get("thumb"),
+        "full": urls.get("regular") or urls.get("full"),
+        "credit": {
+            "name": user.get("name"),
+            "profile": user.get("links", {}).get("html"),
+            "unsplash": item.get("links", {}).get("html"),
+        },
+    }
+
+
+def chosen_url(item):
+    # The size of the photo stored for food logs
+    urls = item.get("urls") or {}
+    return urls.get("regular") or urls.get("full") or urls.get("small")
+
+
+def credits(item):
+    # Credit fields of a FoodImage, with the referral parameters Unsplash asks for on its links
+    user = item.get("user") or {}
+    photo_links = item.get("links") or {}
+    user_links = user.get("links") or {}
+    referral = f"?utm_source={APP_UTM}&utm_medium=referral"
+    return {
+        "credit_name": (user.get("name") or "").strip()[:120],
+        "credit_profile": f'{user_links["html"]}{referral}' if user_links.get("html") else "",
+        "credit_photo": f'{photo_links["html"]}{referral}' if photo_links.get("html") else "",
+        "credit_source": "Unsplash",
+    }
+
+
+def save_photo(item, digest=""):
+    # The FoodImage of an Unsplash photo, created on first use (every later log of it shares the row)
+    # digest: of the photo's local thumbnails (see thumbnails.local_copy), "" when there are none
+    # Returns None when the photo has no usable URL
+    url = chosen_url(item)
+    if not url:
+        return None
+    if not item.get("id"):
+        return FoodImage.objects.create(url=url, digest=digest, **credits(item))
+    image, created = FoodImage.objects.get_or_create(
+        photo_id=item["id"], defaults={"url": url, "digest": digest, **credits(item)}
+    )
+    if not created and digest and not image.digest:
+        image.digest = digest
+        image.save(update_fields=["digest"])
+    return image
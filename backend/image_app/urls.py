@@ -1,7 +1,13 @@
 from django.urls import path
-from .views import UnsplashPreview, SetFoodLogImage
+from .views import UnsplashPreview, SetFoodLogImage, Thumbnail
+from .async_views import AsyncUnsplashPreview, AsyncSetFoodLogImage
 
 urlpatterns = [
     path("search/", UnsplashPreview.as_view(), name="unsplash-preview"),
     path("foodlogs/<int:pk>/set/", SetFoodLogImage.as_view(), name="set-foodlog-image"),
+    # Same views served without blocking a worker while Unsplash answers (needs the ASGI server)
+    path("search/async/", AsyncUnsplashPreview.as_view(), name="unsplash-preview-async"),
+    path("foodlogs/<int:pk>/set/async/", AsyncSetFoodLogImage.as_view(), name="set-foodlog-image-async"),
+    # Local thumbnails of food log images (see thumbnails.py)
+    path("t/<str:digest>/<str:size>/", Thumbnail.as_view(), name="image-thumbnail"),
 ]
\ No newline at end of file
@@ -1,17 +1,27 @@
 # backend/image_app/views.py
 import requests
-from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status as s
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from fullsnack_project import quota
 from food_data_app.models import FoodLog
 from food_data_app.serializers import FoodLogSerializer
+from . import jobs, thumbnails, unsplash
+from .models import FoodImage
+
+# Longest Idempotency-Key accepted (stored prefixed with the user id)
+MAX_KEY_LENGTH = 100
+
+
+def quota_response(error):
+    # Unsplash's hourly quota is used up and nothing (not even stale) was cached for the request
+    return Response({"detail": "Image search is busy, try again shortly."}, status=s.HTTP_503_SERVICE_UNAVAILABLE,
+                    headers={"Retry-After": quota.retry_after_header(error)})
 
-# Required for using Unsplash API
-APP_UTM = "FullSnack"
 
 # For use when making the preview cards when searching for new foods
 class UnsplashPreview(APIView):
@@ -22,119 +32,84 @@ class UnsplashPreview(APIView):
         if not query:
             return Response({"detail": "Missing query param 'q'."}, status=s.HTTP_400_BAD_REQUEST)
 
-        # Sets variables to be used later when searching the unsplash API
-        url = "https://api.unsplash.com/search/photos"
-        params = {"query": query, "per_page": 6, "orientation": "squarish"}
-        headers = {
-            "Accept-Version": "v1",
-            "Authorization": f"Client-ID {settings.UNSPLASH_API_KEY}",
-        }
-
-        # Tries to get an image from unsplash and throws errors if not able to
+        # Tries to get images from the cache or unsplash and throws errors if not able to
+        # Previews are the first calls shed when the Unsplash quota runs low, the image jobs go first
         try:
-            r = requests.get(url, params=params, headers=headers, timeout=8)
+            with quota.priority(quota.LOW):
+                results = unsplash.search_photos(query)
         except requests.RequestException:
             return Response({"detail": "Failed to reach Unsplash."}, status=s.HTTP_502_BAD_GATEWAY)
+        except unsplash.UnsplashError as e:
+            return Response({"detail": "Unsplash error.", "status": e.status}, status=s.HTTP_502_BAD_GATEWAY)
+        except quota.QuotaExceeded as e:
+            return quota_response(e)
 
-        if r.status_code != 200:
-            return Response({"detail": "Unsplash error.", "status": r.status_code},
-                            status=s.HTTP_502_BAD_GATEWAY)
-
-        results = (r.json() or {}).get("results", [])
-        images = []
-        for item in results:
-            urls = item.get("urls") or {}
-            user = item.get("user") or {}
-            images.append({
-                "id": item.get("id"),
-                "alt": item.get("alt_description") or query,
-                "thumb": urls.get("thumb"),
-                "full": urls.get("regular") or urls.get("full"),
-                "credit": {
-                    "name": user.get("name"),
-                    "profile": user.get("links", {}).get("html"),
-                    "unsplash": item.get("links", {}).get("html"),
-                },
-            })
-
+        images = [unsplash.preview_image(item, query) for item in results]
         return Response({"images": images}, status=s.HTTP_200_OK)
 
 
-# Saves food image to the DB
+# Queues finding and saving a food log's image (see jobs.py), answers 202 right away
+# The client polls the log until image_status leaves "pending". Sending an Idempotency-Key header makes retries safe
 class SetFoodLogImage(APIView):
     permission_classes = [IsAuthenticated]
 
-    # Gets query if exists
+    # Takes the id of a previewed photo, or a query whose first result is used
     def patch(self, request, pk):
+        photo_id = str(request.data.get("photo_id") or request.query_params.get("photo_id") or "").strip()
         q = (request.data.get("q") or request.query_params.get("q") or "").strip()
-        if not q:
+        if not photo_id and not q:
             return Response({"detail": "Missing query 'q'."}, status=s.HTTP_400_BAD_REQUEST)
+        if photo_id and not jobs.is_photo_id(photo_id):
+            return Response({"detail": "Invalid 'photo_id'."}, status=s.HTTP_400_BAD_REQUEST)
+        key = request.headers.get("Idempotency-Key")
+        if key is not None and not 0 < len(key) <= MAX_KEY_LENGTH:
+            return Response({"detail": f"Idempotency-Key must be 1 to {MAX_KEY_LENGTH} characters."},
+                            status=s.HTTP_400_BAD_REQUEST)
 
         # Gets current user's foodlog based on foodlog ID
-        foodlog = get_object_or_404(FoodLog, pk=pk, user=request.user)
+        foodlog = get_object_or_404(FoodLog.objects.select_related("image"), pk=pk, user=request.user)
 
-        # Values used to query unsplash
-        url = "https://api.unsplash.com/search/photos"
-        params = {"query": q, "per_page": 1, "orientation": "squarish"}
-        headers = {
-            "Accept-Version": "v1",
-            "Authorization": f"Client-ID {settings.UNSPLASH_API_KEY}",
-        }
-
-        # Queries Unsplash for an image and required citation info
         try:
-            r = requests.get(url, params=params, headers=headers, timeout=8)
-        except requests.RequestException:
-            return Response({"detail": "Failed to reach Unsplash."}, status=s.HTTP_502_BAD_GATEWAY)
-
-        if r.status_code != 200:
-            return Response({"detail": "Unsplash error.", "status": r.status_code},
-                            status=s.HTTP_502_BAD_GATEWAY)
-
-        # Makes the response readable
-        data = r.json() or {}
-        results = data.get("results", [])
-        if not results:
-            return Response({"detail": "No images found for that query."}, status=s.HTTP_404_NOT_FOUND)
-
-        # Gets image urls from response
-        first = results[0]
-        urls = first.get("urls") or {}
-        chosen_url = urls.get("regular") or urls.get("full") or urls.get("small")
-        if not chosen_url:
-            return Response({"detail": "No usable image URL returned."}, status=s.HTTP_502_BAD_GATEWAY)
-
-        # Build credit info for persistent storage (and client display)
-        APP_UTM = "FullSnack"
-        user = first.get("user") or {}
-        photo_links = first.get("links", {}) or {}
-        user_links = (user.get("links") or {})
-
-        credit_name = (user.get("name") or "").strip()
-        credit_profile = f'{user_links.get("html")}?utm_source={APP_UTM}&utm_medium=referral' if user_links.get("html") else ""
-        credit_photo = f'{photo_links.get("html")}?utm_source={APP_UTM}&utm_medium=referral' if photo_links.get("html") else ""
-        credit_source = "Unsplash"
-
-        # Update and persist on the FoodLog
-        foodlog.image_url = chosen_url
-        foodlog.image_credit_name = credit_name[:120]
-        foodlog.image_credit_profile = credit_profile
-        foodlog.image_credit_photo = credit_photo
-        foodlog.image_credit_source = credit_source
-        foodlog.save()
-
-        # For backward compatibility, still return a compact 'credit' object
-        credit = {
-            "name": credit_name or None,
-            "profile": credit_profile or None,
-            "photo": credit_photo or None,
-            "source": credit_source,
-        }
+            job, created = jobs.enqueue(foodlog, photo_id, q, key)
+        except jobs.IdempotencyConflict as e:
+            return Response({"detail": str(e)}, status=s.HTTP_409_CONFLICT)
+        if created:
+            jobs.mark_pending(foodlog)
 
         return Response(
-            {
-                "foodlog": FoodLogSerializer(foodlog).data,
-                "credit": credit,
-            },
-            status=s.HTTP_200_OK,
-        )
\ No newline at end of file
+            {"foodlog": FoodLogSerializer(foodlog).data, "job": jobs.job_data(job)},
+            status=s.HTTP_202_ACCEPTED,
+        )
+
+
+# Serves the local copy of a food log's image: /api/v1/images/t/<digest>/<size>/
+# Public, an <img> can't send the token (the digest is only known to whoever was sent the log). The format follows
+# the Accept header (WebP, else JPEG), and as the content behind a URL never changes browsers may keep it for a year
+class Thumbnail(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def perform_content_negotiation(self, request, force=False):
+        # Browsers ask for images, errors still go out as JSON instead of a 406
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, digest, size):
+        if size not in thumbnails.SIZES or not thumbnails.is_digest(digest):
+            return Response({"detail": "Not found."}, status=s.HTTP_404_NOT_FOUND)
+
+        fmt = thumbnails.negotiate(request.headers.get("Accept"))
+        etag = f'"{digest[:16]}-{size}-{fmt}"'
+        headers = {"Cache-Control": "public, max-age=31536000, immutable", "Vary": "Accept", "ETag": etag}
+        if request.headers.get("If-None-Match") == etag:
+            return HttpResponse(status=s.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        data = thumbnails.read_thumbnail(digest, size, fmt)
+        if data is None:
+            # Evicted (or stored on another server): rebuilt from the photo's URL
+            url = FoodImage.objects.filter(digest=digest).values_list("url", flat=True).first()
+            if url and thumbnails.local_copy(url) == digest:
+                data = thumbnails.read_thumbnail(digest, size, fmt)
+        if data is None:
+            return Response({"detail": "Not found."}, status=s.HTTP_404_NOT_FOUND)
+
+        return HttpResponse(data, content_type=thumbnails.content_type(fmt), headers=headers)
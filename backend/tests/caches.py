@@ -0,0 +1,13 @@
+# Cache settings for tests: every alias in process memory, whatever the environment configures
+from django.core.cache import caches
+
+LOCMEM_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": f"test-{alias}"}
+    for alias in ("default", "lookups", "auth", "responses")
+}
+
+
+def clear_caches():
+    # Local memory caches outlive each test's database rollback, and user ids get reused
+    for alias in LOCMEM_CACHES:
+        caches[alias].clear()
@@ -0,0 +1,50 @@
+# Local HTTP server standing in for USDA / Unsplash in tests
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+
+class StubServer:
+    """
+    Serves canned JSON responses on 127.0.0.1 from a background thread.
+
+    routes maps a path ("/fdc/v1/foods/search") to (status, payload). Every request is recorded
+    in .requests as (method, path with query) so tests can assert on upstream traffic.
+
+        with StubServer({"/foods/search": (200, {...})}) as stub:
+            settings.FDC_API_URL = stub.url
+    """
+
+    def __init__(self, routes):
+        self.routes = routes
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse can be observed
+
+            def do_GET(self):
+                stub.requests.append(("GET", self.path))
+                status, payload = stub.routes.get(urlsplit(self.path).path, (404, {"error": "no stub"}))
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,104 @@
+from asgiref.sync import async_to_sync, sync_to_async
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from food_data_app.models import FoodLog
+from fullsnack_project import async_http
+from fullsnack_project.async_http import close_clients
+from image_app import jobs
+from image_app.models import ImageJob
+from .caches import LOCMEM_CACHES, clear_caches
+from .stub_server import StubServer
+
+User = get_user_model()
+
+FDC_PAYLOAD = {"foods": [{"foodNutrients": [
+    {"nutrientId": 1008, "value": 89}, {"nutrientId": 1003, "value": 1.1},
+    {"nutrientId": 1005, "value": 22.8}, {"nutrientId": 1004, "value": 0.3},
+]}]}
+UNSPLASH_PAYLOAD = {"results": [{
+    "id": "abc123",
+    "alt_description": "bananas",
+    "urls": {"thumb": "https://images.example/thumb.jpg", "regular": "https://images.example/regular.jpg"},
+    "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+    "links": {"html": "https://unsplash.com/photos/abc123"},
+}]}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_THUMBNAILS=False)
+class AsyncUpstreamViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        self.auth = {"Authorization": f"Token {Token.objects.create(user=self.user).key}"}
+        self.stub = StubServer({
+            "/fdc/v1/foods/search": (200, FDC_PAYLOAD),
+            "/search/photos": (200, UNSPLASH_PAYLOAD),
+        })
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+        stub_urls = override_settings(FDC_API_URL=f"{self.stub.url}/fdc/v1", UNSPLASH_API_URL=self.stub.url)
+        stub_urls.enable()
+        self.addCleanup(stub_urls.disable)
+
+    async def test_nutrition_lookup_uses_stub_and_cache(self):
+        first = await self.async_client.get("/api/v1/foods/nutrition/async/", {"query": "banana"}, headers=self.auth)
+        second = await self.async_client.get("/api/v1/foods/nutrition/async/", {"query": "Banana"}, headers=self.auth)
+        await close_clients()
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()["item"]["calories"], 89)
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(len(self.stub.requests), 1)
+
+    async def test_requires_token(self):
+        res = await self.async_client.get("/api/v1/foods/nutrition/async/", {"query": "banana"})
+        self.assertEqual(res.status_code, 401)
+
+    async def test_preview_and_set_image(self):
+        preview = await self.async_client.get("/api/v1/images/search/async/", {"q": "banana"}, headers=self.auth)
+        log = await FoodLog.objects.acreate(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+        res = await self.async_client.patch(
+            f"/api/v1/images/foodlogs/{log.pk}/set/async/", {"q": "banana"},
+            content_type="application/json", headers=self.auth,
+        )
+        await close_clients()
+
+        self.assertEqual(preview.json()["images"][0]["id"], "abc123")
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json()["foodlog"]["image_status"], "pending")
+        self.assertEqual(await sync_to_async(jobs.run_pending)(), 1)
+        # The job reuses the preview's cached search
+        self.assertEqual(len(self.stub.requests), 1)
+        log = await FoodLog.objects.select_related("image").aget(pk=log.pk)
+        self.assertEqual(log.image.url, "https://images.example/regular.jpg")
+        self.assertEqual(log.image.credit_name, "Jane Doe")
+
+    async def test_set_image_refuses_bad_photo_ids(self):
+        log = await FoodLog.objects.acreate(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+        res = await self.async_client.patch(
+            f"/api/v1/images/foodlogs/{log.pk}/set/async/", {"photo_id": "../../users/me"},
+            content_type="application/json", headers=self.auth,
+        )
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(await ImageJob.objects.aexists())
+
+    async def test_upstream_error_maps_to_502(self):
+        self.stub.routes["/search/photos"] = (500, {})
+        res = await self.async_client.get("/api/v1/images/search/async/", {"q": "banana"}, headers=self.auth)
+        await close_clients()
+        self.assertEqual(res.status_code, 502)
+
+
+class AsyncClientTests(SimpleTestCase):
+    def test_clients_are_shared_in_a_loop_and_closed_with_it(self):
+        async def clients():
+            return async_http.get_client("usda"), async_http.get_client("usda")
+
+        # Under WSGI every async_to_sync call runs its own loop
+        first, again = async_to_sync(clients)()
+        self.assertIs(first, again)
+        self.assertTrue(first.is_closed)
+        second, _ = async_to_sync(clients)()
+        self.assertIsNot(second, first)
+        self.assertTrue(second.is_closed)
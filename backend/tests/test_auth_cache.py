@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user_app.authentication import token_cache_key
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CachedTokenAuthTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        res = self.client.post("/api/v1/users/login/", {"email": "a@gmail.com", "password": "testpass123"})
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+
+    def test_login_does_not_create_a_session(self):
+        self.assertNotIn("sessionid", self.client.cookies)
+        self.assertIsNotNone(User.objects.get().last_login)
+
+    def test_repeat_requests_skip_the_token_query(self):
+        self.client.get("/api/v1/dates/days/")
+        # Token from the auth cache, body from the response cache
+        with self.assertNumQueries(0):
+            res = self.client.get("/api/v1/dates/days/")
+        self.assertEqual(res.status_code, 200)
+
+    def test_logout_revokes_cached_token(self):
+        self.client.get("/api/v1/users/info/")
+        self.assertEqual(self.client.post("/api/v1/users/logout/").status_code, 204)
+        self.assertEqual(self.client.get("/api/v1/users/info/").status_code, 401)
+
+    def test_profile_update_is_visible_on_next_request(self):
+        self.client.get("/api/v1/users/info/")
+        self.client.put("/api/v1/users/info/", {"first_name": "Sam"}, format="json")
+        self.assertEqual(self.client.get("/api/v1/users/info/").data["user"]["first_name"], "Sam")
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get("/api/v1/users/info/")
+        user = User.objects.get()
+        user.is_active = False
+        user.save()
+        self.assertEqual(self.client.get("/api/v1/users/info/").status_code, 401)
+
+    def test_cache_holds_neither_the_token_nor_the_password(self):
+        self.client.get("/api/v1/users/info/")
+        token = Token.objects.get()
+        cached = caches[settings.AUTH_CACHE_ALIAS].get(token_cache_key(token.key))
+
+        self.assertEqual(cached["id"], token.user_id)
+        self.assertNotIn("password", cached)
+        self.assertNotIn(token.key, repr(cached))
+        # Requests served from the cache still save the user without touching the password
+        self.client.put("/api/v1/users/info/", {"first_name": "Sam"}, format="json")
+        self.assertTrue(User.objects.get().check_password("testpass123"))
@@ -0,0 +1,116 @@
+from datetime import date, timedelta
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from datetime_app.models import Day, Week, UserDayTotal, UserWeekTotal
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+def food(name, calories, protein=10, carbs=20, fat=5):
+    return {"food_name": name, "calories": calories, "protein": protein, "carbs": carbs, "fat": fat}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FoodLogBulkTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def bulk(self, payload):
+        return self.client.post("/api/v1/foods/bulk/", payload, format="json")
+
+    def test_create_update_delete_in_one_request(self):
+        keep = FoodLog.objects.create(user=self.user, **food("Rice", 300))
+        drop = FoodLog.objects.create(user=self.user, **food("Soda", 150))
+
+        res = self.bulk({
+            "create": [food("Egg", 70), food("Toast", 120)],
+            "update": [{"id": keep.pk, "calories": 350, "protein": 12}],
+            "delete": [drop.pk],
+        })
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["created"]), 2)
+        self.assertEqual(res.data["updated"][0]["calories"], 350)
+        self.assertEqual(res.data["deleted"], [drop.pk])
+        self.assertFalse(FoodLog.objects.filter(pk=drop.pk).exists())
+
+        day_total = UserDayTotal.objects.get(user=self.user)
+        self.assertEqual((day_total.calories, day_total.protein, day_total.log_count), (540, 32, 3))
+        self.assertEqual(UserWeekTotal.objects.get(user=self.user).calories, 540)
+        self.assertEqual(Day.objects.get().daily_calorie_total, 540)
+        self.assertEqual(Week.objects.get().weekly_calorie_total, 540)
+
+    def test_totals_are_written_once_per_day(self):
+        # Transaction, one Day lookup, one insert, then one update per Day, Week and rollup row, and the user's foods
+        # (SELECT, then one INSERT in a savepoint)
+        FoodLog.objects.create(user=self.user, **food("Rice", 300))
+        with self.assertNumQueries(12):
+            res = self.bulk({"create": [food(f"Snack {i}", 100) for i in range(20)]})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(UserDayTotal.objects.get(user=self.user).calories, 2300)
+
+    def test_totals_are_locked_in_the_same_order_as_single_writes(self):
+        def tables_updated(write):
+            with CaptureQueriesContext(connection) as queries:
+                write()
+            order = []
+            for query in queries:
+                for table in ("datetime_app_day", "datetime_app_week", "userdaytotal", "userweektotal"):
+                    if query["sql"].startswith("UPDATE") and table in query["sql"].split("SET")[0] \
+                            and table not in order:
+                        order.append(table)
+            return order
+
+        log = FoodLog.objects.create(user=self.user, **food("Rice", 300))
+        single = tables_updated(lambda: FoodLog.objects.create(user=self.user, **food("Egg", 70)))
+        bulk = tables_updated(lambda: self.bulk({
+            "create": [food("Toast", 120)], "update": [{"id": log.pk, "calories": 100}],
+        }))
+        self.assertEqual(single, ["datetime_app_day", "datetime_app_week", "userdaytotal", "userweektotal"])
+        self.assertEqual(bulk, single)
+
+    def test_updates_on_older_days_adjust_their_own_totals(self):
+        log = FoodLog.objects.create(user=self.user, **food("Rice", 300))
+        old_date = date.today() - timedelta(days=10)
+        week = Week.objects.create(start_date=old_date - timedelta(days=old_date.weekday()))
+        old_day = Day.objects.create(date=old_date, parent_week=week, daily_calorie_total=300)
+        FoodLog.objects.filter(pk=log.pk).update(parent_day=old_day)
+
+        self.bulk({"update": [{"id": log.pk, "calories": 100}]})
+
+        old_day.refresh_from_db()
+        self.assertEqual(old_day.daily_calorie_total, 100)
+
+    def test_invalid_item_writes_nothing(self):
+        res = self.bulk({"create": [food("Egg", 70), {"food_name": "Bad", "calories": -5}]})
+
+        self.assertEqual(res.status_code, 400)
+        self.assertIn("create", res.data)
+        self.assertFalse(FoodLog.objects.exists())
+
+    def test_delete_must_be_a_list(self):
+        logs = [FoodLog.objects.create(user=self.user, **food(name, 100)) for name in ("Rice", "Soda", "Egg")]
+
+        # A string of digits isn't a list of ids
+        for delete in (f"{logs[1].pk}{logs[2].pk}", {"id": logs[1].pk}):
+            res = self.bulk({"delete": delete})
+            self.assertEqual(res.status_code, 400)
+        self.assertEqual(FoodLog.objects.filter(user=self.user).count(), 3)
+
+    def test_other_users_logs_are_not_found(self):
+        other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        theirs = FoodLog.objects.create(user=other, **food("Rice", 300))
+
+        res = self.bulk({"create": [food("Egg", 70)], "delete": [theirs.pk]})
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(res.data["ids"], [theirs.pk])
+        self.assertTrue(FoodLog.objects.filter(pk=theirs.pk).exists())
+        self.assertFalse(FoodLog.objects.filter(user=self.user).exists())
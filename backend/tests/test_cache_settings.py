@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from django.test import SimpleTestCase
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def load_settings(**env):
+    # The settings module imported in a fresh interpreter (not as `manage.py test`), prints the cache backends
+    code = (
+        "from fullsnack_project import settings as s; "
+        "print(*(s.CACHES[a]['BACKEND'].rsplit('.', 1)[1] for a in ('lookups', 'auth', 'responses')))"
+    )
+    clean = {k: v for k, v in os.environ.items() if k not in ("LOCAL_MEMORY_CACHES", "WEB_CONCURRENCY", "REDIS_URL")}
+    return subprocess.run([sys.executable, "-c", code], cwd=BACKEND, env={**clean, **env},
+                          capture_output=True, text=True)
+
+
+class CacheSettingsTests(SimpleTestCase):
+    def test_caches_are_shared_by_default(self):
+        # Backends with an atomic add(), the quota and lookup locks need it
+        result = load_settings(WEB_CONCURRENCY="4")
+        self.assertEqual(result.stdout.split(), ["DatabaseCache"] * 3, result.stderr)
+        result = load_settings(WEB_CONCURRENCY="4", REDIS_URL="redis://localhost:6379/0")
+        self.assertEqual(result.stdout.split(), ["RedisCache"] * 3, result.stderr)
+
+    def test_process_memory_caches_refuse_several_workers(self):
+        self.assertEqual(load_settings(LOCAL_MEMORY_CACHES="1").stdout.split(), ["LocMemCache"] * 3)
+        result = load_settings(LOCAL_MEMORY_CACHES="1", WEB_CONCURRENCY="4")
+        self.assertNotEqual(result.returncode, 0)
+        self.assertIn("ImproperlyConfigured", result.stderr)
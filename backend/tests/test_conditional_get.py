@@ -0,0 +1,85 @@
+import gzip
+import json
+import time
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.utils.http import http_date
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for calories in (100, 200, 300):
+            self.log = FoodLog.objects.create(
+                user=self.user, food_name="Rice", calories=calories, protein=1, carbs=1, fat=1
+            )
+
+    def test_unchanged_poll_is_304_without_queries(self):
+        for url in ("/api/v1/dates/days/", "/api/v1/dates/weeks/", "/api/v1/foods/"):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                again = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual(again.content, b"")
+            self.assertEqual(again["ETag"], first["ETag"])
+
+    def test_etag_differs_per_view_and_changes_on_write(self):
+        days = self.client.get("/api/v1/dates/days/")
+        weeks = self.client.get("/api/v1/dates/weeks/")
+        self.assertNotEqual(days["ETag"], weeks["ETag"])
+
+        self.log.calories = 50
+        self.log.save()
+        res = self.client.get("/api/v1/dates/days/", HTTP_IF_NONE_MATCH=days["ETag"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]["daily_calorie_total"], 350)
+
+    def test_if_modified_since(self):
+        # Last-Modified is given out once the second of the last write is over
+        with mock.patch("time.time_ns", return_value=time.time_ns() + 2_000_000_000):
+            first = self.client.get("/api/v1/dates/days/")
+            res = self.client.get("/api/v1/dates/days/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(res.status_code, 304)
+
+    def test_writes_in_the_same_second_are_not_hidden(self):
+        url = "/api/v1/dates/days/"
+        # A clock past the setUp writes, 0.2 s into a second
+        clock = [(time.time_ns() // 1_000_000_000 + 10) * 1_000_000_000 + 200_000_000]
+
+        def write(calories, later):
+            clock[0] += later
+            self.log.calories = calories
+            self.log.save()
+
+        with mock.patch("time.time_ns", lambda: clock[0]):
+            write(50, 0)
+            # Read in the same second as the write: no Last-Modified a second write in it would still match
+            self.assertNotIn("Last-Modified", self.client.get(url))
+            write(60, 500_000_000)
+            same_second = http_date(clock[0] // 1_000_000_000)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=same_second).status_code, 200)
+            clock[0] += 600_000_000
+            first = self.client.get(url)
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"]).status_code, 304)
+
+            write(70, 100_000_000)
+            res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data[0]["daily_calorie_total"], 370)
+
+    def test_list_endpoints_are_gzipped(self):
+        res = self.client.get("/api/v1/foods/", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(res.content))), 3)
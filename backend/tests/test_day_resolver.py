@@ -0,0 +1,66 @@
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from datetime_app import resolver
+from datetime_app.models import Day, Week
+
+
+class DayResolverTests(TestCase):
+    def setUp(self):
+        # The memo outlives the test transaction, rows it remembers are rolled back afterwards
+        resolver.forget()
+        self.addCleanup(resolver.forget)
+
+    def resolve(self, log_date):
+        # Runs the on_commit callbacks, like a committed request would
+        with self.captureOnCommitCallbacks(execute=True):
+            return resolver.resolve_day(log_date)
+
+    def test_creates_day_and_week(self):
+        day = self.resolve(date(2025, 3, 5))
+        self.assertEqual(Day.objects.get().pk, day.pk)
+        self.assertEqual(Week.objects.get().start_date, date(2025, 3, 3))
+        self.assertEqual(day.parent_week.start_date, date(2025, 3, 3))
+        self.assertEqual(day.daily_calorie_total, 0)
+
+    def test_resolved_days_cost_no_queries(self):
+        first = self.resolve(date(2025, 3, 5))
+        with self.assertNumQueries(0):
+            again = resolver.resolve_day(date(2025, 3, 5))
+        self.assertEqual((again.pk, again.parent_week_id), (first.pk, first.parent_week_id))
+
+    def test_uncommitted_days_are_not_remembered(self):
+        resolver.resolve_day(date(2025, 3, 5))
+        with self.assertNumQueries(1):
+            resolver.resolve_day(date(2025, 3, 5))
+
+    def test_precreated_days_are_loaded_ahead(self):
+        call_command("precreate_days", days=3, stdout=StringIO())
+        today = timezone.now().date()
+        self.assertEqual(Day.objects.filter(date__gte=today).count(), 3)
+
+        resolver.forget()
+        with self.assertNumQueries(1):
+            self.resolve(today)
+        # Tomorrow's first log finds its Day in memory
+        with self.assertNumQueries(0):
+            resolver.resolve_day(today + timedelta(days=1))
+
+    def test_losing_the_insert_race_reads_the_winner(self):
+        # The Day appears between the lookup and the insert, as when another request creates it first
+        winner = Day.objects.create(date=date(2025, 3, 5), parent_week=Week.objects.create(start_date=date(2025, 3, 3)))
+        with mock.patch.object(resolver, "_lookup", return_value=None):
+            day = resolver.resolve_day(date(2025, 3, 5))
+        self.assertEqual(day.pk, winner.pk)
+        self.assertEqual(Day.objects.count(), 1)
+        self.assertEqual(Week.objects.count(), 1)
+
+    def test_deleting_a_day_forgets_it(self):
+        day = self.resolve(date(2025, 3, 5))
+        Day.objects.filter(pk=day.pk).delete()
+        again = self.resolve(date(2025, 3, 5))
+        self.assertNotEqual(again.pk, day.pk)
+        self.assertTrue(Day.objects.filter(pk=again.pk).exists())
@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app import export
+from food_data_app.models import FoodLog, get_log_day
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FoodLogExportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = date.today()
+        # Two logs on each of the last 5 days, and one of another user
+        for offset in range(5):
+            day = get_log_day(self.today - timedelta(days=offset))
+            for i in range(2):
+                log = FoodLog.objects.create(
+                    user=self.user, food_name=f"Meal, {offset}-{i}", calories=100 + offset, protein=1, carbs=2, fat=3
+                )
+                FoodLog.objects.filter(pk=log.pk).update(
+                    parent_day=day, time_logged=log.time_logged - timedelta(days=offset)
+                )
+        other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        FoodLog.objects.create(user=other, food_name="Not mine", calories=1, protein=1, carbs=1, fat=1)
+
+    def body(self, res):
+        return b"".join(res.streaming_content).decode()
+
+    def test_csv_streams_the_whole_history(self):
+        res = self.client.get("/api/v1/foods/export/", {"format": "csv"})
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertIn("attachment", res["Content-Disposition"])
+
+        rows = list(csv.DictReader(io.StringIO(self.body(res))))
+        self.assertEqual(len(rows), 10)
+        self.assertNotIn("Not mine", {row["food_name"] for row in rows})
+        # Oldest first
+        self.assertEqual(rows[0]["food_name"], "Meal, 4-0")
+        self.assertEqual(rows[0]["calories"], "104")
+
+    def test_ndjson_with_date_range(self):
+        start = self.today - timedelta(days=1)
+        res = self.client.get("/api/v1/foods/export/", {"format": "ndjson", "start": start.isoformat()})
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in self.body(res).splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual({row["date"] for row in rows}, {start.isoformat(), self.today.isoformat()})
+        self.assertEqual(set(rows[0]), set(export.COLUMNS))
+
+    def test_rows_come_off_one_cursor_in_chunks(self):
+        # Small chunks: the rows are still read by a single query, and sent as several pieces
+        with mock.patch.object(export, "FETCH_SIZE", 3), mock.patch.object(export, "CHUNK_ROWS", 3):
+            res = self.client.get("/api/v1/foods/export/", {"format": "ndjson"})
+            with self.assertNumQueries(1):
+                chunks = [chunk for chunk in res.streaming_content if chunk]
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(sum(chunk.count(b"\n") for chunk in chunks), 10)
+
+    def test_rejects_bad_parameters(self):
+        self.assertEqual(self.client.get("/api/v1/foods/export/", {"format": "xml"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/foods/export/", {"start": "nope"}).status_code, 400)
+        res = self.client.get("/api/v1/foods/export/", {"start": self.today.isoformat(), "end": "2000-01-01"})
+        self.assertEqual(res.status_code, 400)
+
+    def test_requires_login(self):
+        self.assertEqual(APIClient().get("/api/v1/foods/export/").status_code, 401)
@@ -0,0 +1,124 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FdcFood
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+FOOD_CSV = '''"fdc_id","data_type","description","food_category_id","publication_date"
+"1","sr_legacy_food","Yogurt, Greek, plain, nonfat","1","2019-04-01"
+"2","sr_legacy_food","Bananas, raw","9","2019-04-01"
+"3","foundation_food","Bananas, overripe, raw","9","2021-10-28"
+'''
+FOOD_NUTRIENT_CSV = '''"id","fdc_id","nutrient_id","amount"
+"10","1","1008","59"
+"11","1","1003","10.2"
+"12","1","1005","3.6"
+"13","1","1004","0.4"
+"14","2","1008","89"
+"15","2","1003","1.09"
+"16","2","1093","1"
+'''
+SURVEY_JSON = {
+    "SurveyFoods": [{
+        "fdcId": 4,
+        "description": "Banana bread",
+        "foodNutrients": [
+            {"nutrient": {"id": 1008, "number": "208"}, "amount": 326},
+            {"nutrient": {"id": 1004, "number": "204"}, "amount": 10.5},
+        ],
+    }]
+}
+
+
+class ImportFdcTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        folder = Path(self.tmp.name)
+        (folder / "food.csv").write_text(FOOD_CSV)
+        (folder / "food_nutrient.csv").write_text(FOOD_NUTRIENT_CSV)
+        (folder / "survey.json").write_text(json.dumps(SURVEY_JSON))
+        call_command("import_fdc", str(folder), str(folder / "survey.json"), stdout=StringIO())
+
+    def test_import_keeps_selected_data_types_with_macros(self):
+        self.assertEqual(sorted(FdcFood.objects.values_list("fdc_id", flat=True)), [1, 2, 4])
+        yogurt = FdcFood.objects.get(fdc_id=1)
+        self.assertEqual((yogurt.calories, yogurt.protein, yogurt.carbs, yogurt.fat), (59, 10.2, 3.6, 0.4))
+        self.assertEqual(yogurt.search_name, "yogurt, greek, plain, nonfat")
+        self.assertEqual(FdcFood.objects.get(fdc_id=2).sodium, 1)
+        bread = FdcFood.objects.get(fdc_id=4)
+        self.assertEqual((bread.data_type, bread.calories, bread.fat), ("Survey (FNDDS)", 326, 10.5))
+
+    def test_reimport_updates_in_place(self):
+        call_command("import_fdc", self.tmp.name, stdout=StringIO())
+        self.assertEqual(FdcFood.objects.count(), 3)
+
+    def test_files_are_read_in_batches(self):
+        folder = Path(self.tmp.name)
+        # A food's nutrients don't have to be next to each other, brands come from branded_food.csv
+        (folder / "food.csv").write_text(FOOD_CSV + '"5","branded_food","Greek yogurt cups","","2021-10-28"\n')
+        (folder / "food_nutrient.csv").write_text(FOOD_NUTRIENT_CSV + '"17","5","1008","120"\n"18","1","1079","2"\n')
+        (folder / "branded_food.csv").write_text('"fdc_id","brand_owner"\n"5","Acme"\n"9","Unknown"\n')
+        with mock.patch("food_data_app.management.commands.import_fdc.BATCH_SIZE", 1), \
+                mock.patch("food_data_app.management.commands.import_fdc.JSON_CHUNK", 5):
+            call_command("import_fdc", str(folder), str(folder / "survey.json"), stdout=StringIO())
+
+        self.assertEqual(sorted(FdcFood.objects.values_list("fdc_id", flat=True)), [1, 2, 4, 5])
+        yogurt = FdcFood.objects.get(fdc_id=1)
+        self.assertEqual((yogurt.calories, yogurt.protein, yogurt.fiber), (59, 10.2, 2))
+        cups = FdcFood.objects.get(fdc_id=5)
+        self.assertEqual((cups.data_type, cups.brand_owner, cups.calories), ("Branded", "Acme", 120))
+        self.assertEqual(FdcFood.objects.get(fdc_id=4).fat, 10.5)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class LocalEngineTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        FdcFood.objects.create(fdc_id=1, data_type="SR Legacy", description="Yogurt, Greek, plain, nonfat",
+                               search_name="yogurt, greek, plain, nonfat", calories=59, protein=10.2, carbs=3.6, fat=0.4)
+        FdcFood.objects.create(fdc_id=2, data_type="Branded", description="Greek yogurt cups with honey and granola",
+                               search_name="greek yogurt cups with honey and granola", calories=120, protein=8, carbs=15, fat=3)
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        )
+
+    def lookup(self, query):
+        return self.client.get("/api/v1/foods/nutrition/", {"query": query})
+
+    @override_settings(NUTRITION_ENGINE="local")
+    @mock.patch("fullsnack_project.upstream.usda.get")
+    def test_local_engine_matches_all_words_without_upstream(self, get):
+        res = self.lookup("Greek Yogurt")
+
+        get.assert_not_called()
+        self.assertEqual(res["X-Nutrition-Source"], "local")
+        # The prefix match ranks first even though both descriptions contain both words
+        self.assertEqual(res.data["item"], {
+            "name": "Greek Yogurt", "calories": 120, "protein_g": 8, "carbohydrates_total_g": 15, "fat_total_g": 3,
+            "fiber_g": 0, "sugar_g": 0, "sodium_mg": 0,
+        })
+
+    @override_settings(NUTRITION_ENGINE="local")
+    def test_local_engine_without_match_returns_empty(self):
+        self.assertEqual(self.lookup("durian").data, {"items": []})
+
+    @override_settings(NUTRITION_ENGINE="local-then-remote")
+    @mock.patch("fullsnack_project.upstream.usda.get")
+    def test_local_then_remote_falls_back_to_fdc(self, get):
+        get.return_value = mock.Mock(status_code=200, json=mock.Mock(return_value={"foods": []}))
+
+        self.assertEqual(self.lookup("yogurt")["X-Nutrition-Source"], "local")
+        get.assert_not_called()
+
+        self.assertEqual(self.lookup("durian")["X-Nutrition-Source"], "remote")
+        get.assert_called_once()
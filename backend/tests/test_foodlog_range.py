@@ -0,0 +1,73 @@
+from datetime import date, timedelta
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, get_log_day
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FoodLogRangeTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.today = date.today()
+        # Three logs on each of the last 10 days
+        for offset in range(10):
+            day = get_log_day(self.today - timedelta(days=offset))
+            for i in range(3):
+                log = FoodLog.objects.create(
+                    user=self.user, food_name=f"Meal {offset}-{i}", calories=100, protein=1, carbs=1, fat=1
+                )
+                FoodLog.objects.filter(pk=log.pk).update(
+                    parent_day=day, time_logged=log.time_logged - timedelta(days=offset)
+                )
+
+    def test_range_returns_logs_with_day_and_week(self):
+        start = self.today - timedelta(days=2)
+        res = self.client.get("/api/v1/foods/", {"start": start.isoformat(), "end": self.today.isoformat()})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["results"]), 9)
+        self.assertIsNone(res.data["next"])
+        first = res.data["results"][0]
+        logged_on = date.fromisoformat(first["date"])
+        self.assertTrue(start <= logged_on <= self.today)
+        self.assertEqual(first["week_start"], (logged_on - timedelta(days=logged_on.weekday())).isoformat())
+
+    def test_pages_are_single_bounded_queries(self):
+        start = (self.today - timedelta(days=30)).isoformat()
+        with self.assertNumQueries(1):
+            res = self.client.get("/api/v1/foods/", {"start": start, "page_size": 20})
+        self.assertEqual(len(res.data["results"]), 20)
+
+        with self.assertNumQueries(1):
+            rest = self.client.get(res.data["next"])
+        self.assertEqual(len(rest.data["results"]), 10)
+        ids = [row["id"] for row in res.data["results"] + rest.data["results"]]
+        self.assertEqual(len(set(ids)), 30)
+
+    def test_bad_range_is_400(self):
+        self.assertEqual(self.client.get("/api/v1/foods/", {"start": "yesterday"}).status_code, 400)
+        self.assertEqual(
+            self.client.get("/api/v1/foods/", {"start": "2025-02-02", "end": "2025-02-01"}).status_code, 400
+        )
+
+    def test_range_is_bounded_on_time_logged(self):
+        # The range goes through the (user, time_logged) index instead of a join on the Day
+        start = (self.today - timedelta(days=2)).isoformat()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/api/v1/foods/", {"start": start, "end": self.today.isoformat()})
+        where = queries[0]["sql"].split("WHERE", 1)[1].split("ORDER BY")[0]
+        self.assertIn('"time_logged" >=', where)
+        self.assertNotIn("datetime_app_day", where)
+
+    def test_day_filter_is_unchanged(self):
+        res = self.client.get("/api/v1/foods/", {"day": self.today.isoformat()})
+        self.assertEqual(len(res.data), 3)
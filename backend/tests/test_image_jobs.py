@@ -0,0 +1,192 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, ImageStatus
+from fullsnack_project import quota
+from image_app import jobs
+from image_app.models import FoodImage, ImageJob
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+def photo(photo_id):
+    return {
+        "id": photo_id,
+        "urls": {"regular": f"https://images.example/{photo_id}.jpg"},
+        "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+        "links": {"html": f"https://unsplash.com/photos/{photo_id}"},
+    }
+
+
+def unsplash_response(payload, status=200):
+    return mock.Mock(status_code=status, json=mock.Mock(return_value=payload))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_THUMBNAILS=False, IMAGE_JOB_MAX_ATTEMPTS=2)
+class ImageJobTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.log = FoodLog.objects.create(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+
+    def set_image(self, data, key=None):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.patch(f"/api/v1/images/foodlogs/{self.log.pk}/set/", data, format="json", **headers)
+
+    def make_due(self):
+        ImageJob.objects.update(run_after=timezone.now())
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response(photo("abc123")))
+    def test_patch_answers_before_the_image_is_found(self, get):
+        res = self.set_image({"photo_id": "abc123"})
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(res.json()["foodlog"]["image_status"], "pending")
+        self.assertEqual(res.json()["job"]["status"], "queued")
+        get.assert_not_called()
+
+        out = StringIO()
+        call_command("run_image_jobs", once=True, stdout=out)
+        self.assertIn("Ran 1 image job(s)", out.getvalue())
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.image_status, ImageStatus.READY)
+        self.assertEqual(self.log.image.url, "https://images.example/abc123.jpg")
+        self.assertEqual(ImageJob.objects.get().status, ImageJob.Status.DONE)
+
+    def test_idempotency_key_returns_the_first_job(self):
+        first = self.set_image({"photo_id": "abc123"}, key="save-1")
+        again = self.set_image({"photo_id": "abc123"}, key="save-1")
+        other = self.set_image({"photo_id": "zzz999"}, key="save-1")
+
+        self.assertEqual(again.status_code, 202)
+        self.assertEqual(first.json()["job"]["id"], again.json()["job"]["id"])
+        self.assertEqual(other.status_code, 409)
+        self.assertEqual(ImageJob.objects.count(), 1)
+        # Keys are per user
+        other_user = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        log = FoodLog.objects.create(user=other_user, food_name="Rice", calories=1, protein=1, carbs=1, fat=1)
+        self.assertTrue(jobs.enqueue(log, "abc123", "", key="save-1")[1])
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response({}, status=503))
+    def test_transient_errors_are_retried_then_failed(self, get):
+        self.set_image({"q": "banana"})
+
+        self.assertEqual(jobs.run_pending(), 1)
+        job = ImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts), (ImageJob.Status.QUEUED, 1))
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn("UnsplashError", job.last_error)
+        # Not due yet
+        self.assertEqual(jobs.run_pending(), 0)
+
+        self.make_due()
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.log.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (ImageJob.Status.FAILED, 2))
+        self.assertEqual(self.log.image_status, ImageStatus.FAILED)
+
+    @mock.patch("image_app.unsplash.search_photos", side_effect=quota.QuotaExceeded("unsplash", 900))
+    def test_spent_quota_waits_for_the_bucket(self, search):
+        self.set_image({"q": "banana"})
+        jobs.run_pending()
+
+        job = ImageJob.objects.get()
+        self.assertEqual(job.status, ImageJob.Status.QUEUED)
+        self.assertAlmostEqual((job.run_after - timezone.now()).total_seconds(), 900, delta=5)
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response(photo("second")))
+    def test_newest_job_wins(self, get):
+        self.set_image({"photo_id": "first"})
+        self.set_image({"photo_id": "second"})
+
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(
+            list(ImageJob.objects.order_by("pk").values_list("status", flat=True)),
+            [ImageJob.Status.CANCELLED, ImageJob.Status.DONE],
+        )
+        self.assertEqual(get.call_count, 1)
+        self.log.refresh_from_db()
+        self.assertEqual(self.log.image.url, "https://images.example/second.jpg")
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response(photo("abc123")))
+    def test_logs_share_one_image_row(self, get):
+        other = FoodLog.objects.create(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+        jobs.enqueue(self.log, "abc123")
+        jobs.enqueue(other, "abc123")
+        jobs.run_pending()
+
+        self.assertEqual(FoodImage.objects.count(), 1)
+        self.assertEqual(get.call_count, 1)
+        self.log.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(self.log.image_id, other.image_id)
+
+        res = self.client.get(f"/api/v1/foods/{other.pk}/").json()
+        self.assertEqual(res["image_credit_name"], "Jane Doe")
+        self.assertEqual(res["image_credit_source"], "Unsplash")
+        self.assertIn("utm_source=", res["image_credit_photo"])
+        # Deleting a log leaves the photo to the others
+        self.log.delete()
+        self.assertEqual(FoodImage.objects.count(), 1)
+
+    def test_expired_lease_is_taken_over(self):
+        jobs.enqueue(self.log, "abc123")
+        self.assertEqual(len(jobs.claim(worker="a")), 1)
+        self.assertEqual(jobs.claim(worker="b"), [])
+
+        ImageJob.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        taken = jobs.claim(worker="b")
+        self.assertEqual([(job.worker, job.attempts) for job in taken], [("b", 2)])
+
+    def test_prune_deletes_old_finished_jobs(self):
+        old, _ = jobs.enqueue(self.log, "abc123")
+        jobs.enqueue(self.log, "def456")
+        ImageJob.objects.filter(pk=old.pk).update(
+            status=ImageJob.Status.DONE, finished_at=timezone.now() - timedelta(days=30)
+        )
+        self.assertEqual(jobs.prune(), 1)
+        self.assertEqual(ImageJob.objects.count(), 1)
+
+    def test_new_logs_are_queued_for_an_image(self):
+        food = {"food_name": "Rice", "calories": 200, "protein": 4, "carbs": 44, "fat": 1}
+        res = self.client.post("/api/v1/foods/", {**food, "photo_id": "abc123"}, format="json")
+        self.assertEqual(res.json()["image_status"], "pending")
+        self.assertEqual(
+            list(ImageJob.objects.values_list("foodlog_id", "photo_id", "query")),
+            [(res.json()["id"], "abc123", "Rice")],
+        )
+
+        with self.settings(IMAGE_AUTO_ENQUEUE=False):
+            res = self.client.post("/api/v1/foods/", food, format="json")
+        self.assertEqual(res.json()["image_status"], "")
+        self.assertEqual(ImageJob.objects.count(), 1)
+
+    def test_bad_photo_ids_are_refused(self):
+        for photo_id in ("x" * 65, "../../me", "abc 123"):
+            with self.subTest(photo_id):
+                self.assertEqual(self.set_image({"photo_id": photo_id}).status_code, 400)
+                res = self.client.post("/api/v1/foods/", {
+                    "food_name": "Rice", "calories": 200, "protein": 4, "carbs": 44, "fat": 1, "photo_id": photo_id,
+                }, format="json")
+                self.assertEqual(res.status_code, 400)
+                self.assertIn("photo_id", res.json())
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertEqual(FoodLog.objects.count(), 1)
+        with self.assertRaises(ValueError):
+            jobs.enqueue(self.log, "../me")
+
+    def test_log_is_not_saved_without_its_job(self):
+        food = {"food_name": "Rice", "calories": 200, "protein": 4, "carbs": 44, "fat": 1, "photo_id": "abc123"}
+        with mock.patch("image_app.jobs.enqueue", side_effect=RuntimeError("database gone")), \
+                self.assertRaises(RuntimeError):
+            self.client.post("/api/v1/foods/", food, format="json")
+        self.assertFalse(FoodLog.objects.filter(food_name="Rice").exists())
@@ -0,0 +1,114 @@
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from io import StringIO
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from datetime_app.models import Day, UserDayTotal, UserWeekTotal
+from food_data_app import importer
+from food_data_app.models import FoodLog
+from image_app.models import FoodImage
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+HEADER = "date,time_logged,food_name,calories,protein,carbs,fat\n"
+
+
+def upload(text):
+    return SimpleUploadedFile("history.csv", text.encode(), content_type="text/csv")
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class FoodLogImportTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, text):
+        return self.client.post("/api/v1/foods/import/", {"file": upload(text)}, format="multipart")
+
+    def test_imports_history_with_its_dates_and_totals(self):
+        res = self.post(
+            HEADER
+            + "2024-01-02,2024-01-02T08:30:00Z,Oatmeal,150,5,27,3\n"
+            + "2024-01-02,,\"Rice, brown\",200,4,44,2\n"
+            + ",2024-01-09T19:00:00+00:00,Salmon,370,40,0,22\n"
+        )
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(res.data, {"imported": 3, "days": 2})
+
+        oatmeal = FoodLog.objects.get(food_name="Oatmeal")
+        self.assertEqual(oatmeal.time_logged.isoformat(), "2024-01-02T08:30:00+00:00")
+        self.assertEqual(oatmeal.parent_day.date, date(2024, 1, 2))
+        # A date without a time is logged at noon
+        self.assertEqual(FoodLog.objects.get(food_name="Rice, brown").time_logged.hour, 12)
+
+        self.assertEqual(Day.objects.get(date=date(2024, 1, 2)).daily_calorie_total, 350)
+        self.assertEqual(Day.objects.get(date=date(2024, 1, 9)).parent_week.weekly_calorie_total, 370)
+        self.assertEqual(UserDayTotal.objects.get(user=self.user, date=date(2024, 1, 2)).log_count, 2)
+        self.assertEqual(UserWeekTotal.objects.get(user=self.user, week_start=date(2024, 1, 1)).calories, 350)
+
+    def test_export_round_trips(self):
+        FoodLog.objects.create(user=self.user, food_name="Apple", calories=95, protein=0, carbs=25, fat=0)
+        exported = b"".join(self.client.get("/api/v1/foods/export/", {"format": "csv"}).streaming_content).decode()
+        FoodLog.objects.all().delete()
+
+        self.assertEqual(self.post(exported).status_code, 201)
+        self.assertEqual(FoodLog.objects.get().food_name, "Apple")
+
+    def test_chunks_are_inserted_in_bulk(self):
+        rows = "".join(f"2024-03-{1 + i % 20:02d},,Meal {i},100,1,1,1\n" for i in range(30))
+        with mock.patch.object(importer, "CHUNK_ROWS", 10), mock.patch.object(FoodLog.objects, "bulk_create",
+                                                                              wraps=FoodLog.objects.bulk_create) as spy:
+            res = self.post(HEADER + rows)
+        self.assertEqual(res.data, {"imported": 30, "days": 20})
+        self.assertEqual(spy.call_count, 3)
+        self.assertEqual(Day.objects.filter(date__month=3).count(), 20)
+
+    def test_image_urls_share_image_rows(self):
+        FoodImage.objects.create(url="https://images.example/rice.jpg", credit_source="")
+        res = self.post(
+            "date,food_name,calories,protein,carbs,fat,image_url\n"
+            + "2024-01-02,Oatmeal,150,5,27,3,https://images.example/oats.jpg\n"
+            + "2024-01-03,Oatmeal,150,5,27,3,https://images.example/oats.jpg\n"
+            + "2024-01-03,Rice,200,4,44,2,https://images.example/rice.jpg\n"
+            + "2024-01-04,Tea,1,0,0,0,\n"
+        )
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(FoodImage.objects.count(), 2)
+        self.assertEqual(FoodLog.objects.filter(food_name="Oatmeal").values("image").distinct().count(), 1)
+        self.assertEqual(FoodLog.objects.get(food_name="Rice").image.url, "https://images.example/rice.jpg")
+        self.assertIsNone(FoodLog.objects.get(food_name="Tea").image)
+
+    def test_bad_rows_import_nothing(self):
+        res = self.post(HEADER + "2024-01-02,,Oatmeal,150,5,27,3\n2024-01-03,,Toast,lots,4,14,1\n,,Tea,1,0,0,0\n")
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual([error["line"] for error in res.data["errors"]], [3, 4])
+        self.assertIn("calories", res.data["errors"][0]["errors"])
+        self.assertFalse(FoodLog.objects.exists())
+
+    def test_rejects_future_logs_and_bad_files(self):
+        tomorrow = date.today() + timedelta(days=2)
+        self.assertEqual(self.post(HEADER + f"{tomorrow},,Cake,400,4,50,20\n").status_code, 400)
+        self.assertEqual(self.post("food_name,calories\nCake,400\n").status_code, 400)
+        self.assertEqual(self.post(HEADER).status_code, 400)
+        self.assertEqual(self.client.post("/api/v1/foods/import/", {}, format="multipart").status_code, 400)
+        res = self.client.post("/api/v1/foods/import/", {"file": SimpleUploadedFile("x.csv", b"\xff\xfe\x00")},
+                               format="multipart")
+        self.assertEqual(res.status_code, 400)
+
+    def test_management_command(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = Path(folder) / "history.csv"
+            path.write_text(HEADER + "2024-01-02,,Oatmeal,150,5,27,3\n")
+            out = StringIO()
+            call_command("import_food_logs", "a@gmail.com", str(path), stdout=out)
+        self.assertIn("Imported 1 food log(s)", out.getvalue())
+        self.assertEqual(FoodLog.objects.get().parent_day.date, date(2024, 1, 2))
@@ -0,0 +1,55 @@
+import re
+import tempfile
+from pathlib import Path
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, METRICS_TOKEN="scrape-me")
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        FoodLog.objects.create(user=self.user, food_name="Rice", calories=300, protein=1, carbs=1, fat=1)
+
+    def test_server_timing_reports_queries_and_cache(self):
+        first = self.client.get("/api/v1/dates/days/")
+        second = self.client.get("/api/v1/dates/days/")
+
+        self.assertRegex(first["Server-Timing"], r'db;dur=[\d.]+;desc="1 queries"')
+        self.assertIn('cache;desc="0 hits, 1 misses"', first["Server-Timing"])
+        self.assertIn('desc="0 queries"', second["Server-Timing"])
+        self.assertIn('cache;desc="1 hits, 0 misses"', second["Server-Timing"])
+        self.assertRegex(second["Server-Timing"], r"total;dur=[\d.]+$")
+
+    def test_metrics_endpoint_exposes_per_view_histograms(self):
+        self.client.get("/api/v1/foods/")
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+
+        res = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-me")
+        body = res.content.decode()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE fullsnack_request_duration_seconds histogram", body)
+        self.assertRegex(body, r'fullsnack_request_db_queries_count\{view="FoodLogs"\} [1-9]')
+        self.assertIn('fullsnack_request_duration_seconds_bucket{view="FoodLogs",le="+Inf"}', body)
+        self.assertRegex(body, r'fullsnack_requests_total\{view="FoodLogs",status="200"\} [1-9]')
+        self.assertIn('fullsnack_upstream_circuit_open{upstream="usda"} 0', body)
+
+    def test_profile_is_opt_in(self):
+        with tempfile.TemporaryDirectory() as folder:
+            res = self.client.get("/api/v1/dates/days/", HTTP_X_PROFILE="1")
+            self.assertNotIn("X-Profile-File", res)
+
+            with self.settings(PROFILE_REQUESTS=True, PROFILE_DIR=folder):
+                res = self.client.get("/api/v1/dates/days/", HTTP_X_PROFILE="1")
+            self.assertTrue(re.search(r"-Days\.prof$", res["X-Profile-File"]))
+            self.assertTrue((Path(folder) / res["X-Profile-File"]).exists())
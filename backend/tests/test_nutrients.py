@@ -0,0 +1,57 @@
+from django.test import SimpleTestCase
+from food_data_app.nutrients import index_nutrients, parse_food, parse_foods
+
+SEARCH_FOOD = {
+    "foodNutrients": [
+        {"nutrientId": 1003, "nutrientNumber": "203", "value": 3.5},
+        {"nutrientId": 1008, "nutrientNumber": "208", "value": 61},
+        {"nutrientId": 1005, "nutrientNumber": "205", "value": 4.7},
+        {"nutrientNumber": "204", "value": 3.3},
+        {"nutrientId": 1093, "nutrientNumber": "307", "value": 43},
+        {"nutrientId": 1008, "nutrientNumber": "208", "value": 999},
+    ]
+}
+BULK_FOOD = {
+    "foodNutrients": [
+        {"nutrient": {"id": 1008, "number": "208"}, "amount": 89},
+        {"nutrient": {"id": 1079, "number": "291"}, "amount": 2.6},
+    ]
+}
+BRANDED_FOOD = {
+    "foodNutrients": [{"nutrientId": 1008, "value": 0}],
+    "labelNutrients": {"calories": {"value": 150}, "protein": {"value": 6}, "sugars": {"value": 12}},
+}
+
+
+class NutrientParsingTests(SimpleTestCase):
+    def test_index_matches_ids_or_numbers_first_entry_wins(self):
+        index = index_nutrients(SEARCH_FOOD)
+        self.assertEqual(index, {"protein": 3.5, "calories": 61, "carbs": 4.7, "fat": 3.3, "sodium": 43})
+
+    def test_index_accepts_string_ids(self):
+        self.assertEqual(index_nutrients({"foodNutrients": [{"nutrientId": "1079", "value": 2}]}), {"fiber": 2})
+
+    def test_index_accepts_int_numbers(self):
+        food = {"foodNutrients": [
+            {"nutrientNumber": 204, "value": 3.3},
+            {"nutrient": {"number": 291}, "amount": 2.6},
+        ]}
+        self.assertEqual(index_nutrients(food), {"fat": 3.3, "fiber": 2.6})
+
+    def test_parse_search_api_food(self):
+        values = parse_food(SEARCH_FOOD)
+        self.assertEqual(
+            values,
+            {"calories": 61, "protein": 3.5, "carbs": 4.7, "fat": 3.3, "fiber": None, "sugar": None, "sodium": 43},
+        )
+
+    def test_parse_bulk_download_food(self):
+        values = parse_food(BULK_FOOD)
+        self.assertEqual((values["calories"], values["fiber"], values["protein"]), (89, 2.6, None))
+
+    def test_label_nutrients_fill_missing_values(self):
+        values = parse_food(BRANDED_FOOD)
+        self.assertEqual((values["calories"], values["protein"], values["sugar"], values["fat"]), (150, 6, 12, None))
+
+    def test_parse_foods_keeps_order(self):
+        self.assertEqual([v["calories"] for v in parse_foods([BULK_FOOD, SEARCH_FOOD])], [89, 61])
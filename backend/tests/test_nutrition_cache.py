@@ -0,0 +1,64 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.fdc import nutrition_cache
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+BANANA = {
+    "foods": [{
+        "description": "Bananas, raw",
+        "foodNutrients": [
+            {"nutrientId": 1008, "nutrientNumber": "208", "value": 89},
+            {"nutrientId": 1003, "nutrientNumber": "203", "value": 1.1},
+            {"nutrientId": 1005, "nutrientNumber": "205", "value": 22.8},
+            {"nutrientId": 1004, "nutrientNumber": "204", "value": 0.3},
+        ],
+    }]
+}
+
+
+def fdc_response(payload, status=200):
+    return mock.Mock(status_code=status, json=mock.Mock(return_value=payload))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NutritionCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        )
+
+    def lookup(self, query):
+        return self.client.get("/api/v1/foods/nutrition/", {"query": query})
+
+    @mock.patch("fullsnack_project.upstream.usda.get", return_value=fdc_response(BANANA))
+    def test_repeat_lookup_skips_upstream(self, get):
+        first = self.lookup("Banana")
+        second = self.lookup("  banana ")
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(second.data["item"], first.data["item"])
+        self.assertEqual(second.data["item"]["calories"], 89)
+        self.assertEqual(nutrition_cache.stats(), {"hits": 1, "misses": 1, "coalesced": 0, "stale": 0, "hit_rate": 0.5})
+
+    @mock.patch("fullsnack_project.upstream.usda.get", return_value=fdc_response({"foods": []}))
+    def test_empty_results_are_cached(self, get):
+        self.lookup("zzzz")
+        res = self.lookup("zzzz")
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(res.data, {"items": []})
+
+    @mock.patch("fullsnack_project.upstream.usda.get", return_value=fdc_response({}, status=500))
+    def test_upstream_errors_are_not_cached(self, get):
+        self.assertEqual(self.lookup("banana").status_code, 502)
+        self.assertEqual(self.lookup("banana").status_code, 502)
+        self.assertEqual(get.call_count, 2)
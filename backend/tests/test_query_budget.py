@@ -0,0 +1,146 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, UserFood, get_log_day
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+FDC_PAYLOAD = {"foods": [{"description": "Bananas, raw", "foodNutrients": [
+    {"nutrientId": 1008, "value": 89}, {"nutrientId": 1003, "value": 1.1},
+    {"nutrientId": 1005, "value": 22.8}, {"nutrientId": 1004, "value": 0.3},
+]}]}
+UNSPLASH_PAYLOAD = {"results": [{
+    "id": f"photo{i}", "alt_description": "bananas",
+    "urls": {"thumb": f"https://images.example/{i}-thumb.jpg", "regular": f"https://images.example/{i}.jpg"},
+    "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+    "links": {"html": f"https://unsplash.com/photos/photo{i}"},
+} for i in range(6)]}
+
+
+def upstream_response(payload):
+    return mock.Mock(status_code=200, json=mock.Mock(return_value=payload))
+
+
+def food(calories=250):
+    return {"food_name": "Rice", "calories": calories, "protein": 5, "carbs": 45, "fat": 2}
+
+
+# name, method, path, body, queries, max response bytes
+# Query counts are for a cold cache and a user with two weeks of history, and must not grow with more history
+# ({log}, {food}, {today} and {week} are filled in per test)
+ENDPOINTS = [
+    ("user info", "get", "/api/v1/users/info/", None, 2, 400),
+    ("user update", "put", "/api/v1/users/info/", {"first_name": "Sam"}, 4, 400),
+    ("foods today", "get", "/api/v1/foods/", None, 1, 3_000),
+    ("foods range", "get", "/api/v1/foods/?start={month_ago}", None, 1, 40_000),
+    ("food detail", "get", "/api/v1/foods/{log}/", None, 1, 500),
+    ("food create", "post", "/api/v1/foods/", food(), 15, 500),
+    ("food update", "put", "/api/v1/foods/{log}/", food(300), 11, 500),
+    ("food delete", "delete", "/api/v1/foods/{log}/", None, 12, 100),
+    ("foods bulk", "post", "/api/v1/foods/bulk/", {"create": [food()] * 10}, 12, 5_000),
+    ("user foods", "get", "/api/v1/foods/mine/?q=ch", None, 1, 3_000),
+    ("log again", "post", "/api/v1/foods/mine/{food}/log/", None, 11, 500),
+    ("nutrition", "get", "/api/v1/foods/nutrition/?query=banana", None, 0, 300),
+    ("weeks", "get", "/api/v1/dates/weeks/", None, 1, 6_000),
+    ("week", "get", "/api/v1/dates/weeks/{week}/", None, 1, 300),
+    ("days", "get", "/api/v1/dates/days/", None, 1, 8_000),
+    ("days of week", "get", "/api/v1/dates/days/?week_start={week}", None, 1, 2_000),
+    ("day", "get", "/api/v1/dates/days/{today}/", None, 1, 300),
+    ("image search", "get", "/api/v1/images/search/?q=banana", None, 0, 3_000),
+    ("image set", "patch", "/api/v1/images/foodlogs/{log}/set/", {"q": "banana"}, 3, 800),
+]
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_THUMBNAILS=False)
+@mock.patch("fullsnack_project.upstream.unsplash.get", return_value=upstream_response(UNSPLASH_PAYLOAD))
+@mock.patch("fullsnack_project.upstream.usda.get", return_value=upstream_response(FDC_PAYLOAD))
+class QueryBudgetTests(TestCase):
+    """
+    Every API view against seeded multi-user data: a fixed query budget (no N+1 as history grows) and an upper
+    bound on the response size. A failure here means a view started doing per-row work, raise a budget only
+    when the extra queries are intended.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command("seed_load_data", users=3, logs_per_day=3, days=14, stdout=StringIO())
+        cls.user = User.objects.order_by("pk").first()
+
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        today = timezone.now().date()
+        self.context = {
+            "today": today,
+            "week": today - timedelta(days=today.weekday()),
+            "month_ago": today - timedelta(days=30),
+        }
+
+    def url(self, path):
+        log = FoodLog.objects.filter(user=self.user).order_by("-pk").first()
+        food = UserFood.objects.filter(user=self.user).order_by("pk").first()
+        return path.format(log=log.pk, food=food.pk, **self.context)
+
+    def call(self, method, path, body):
+        url = self.url(path)
+        clear_caches()
+        return getattr(self.client, method)(url, body, format="json")
+
+    def query_counts(self):
+        counts = {}
+        for name, method, path, body, _, _ in ENDPOINTS:
+            if method == "get":
+                with CaptureQueriesContext(connection) as queries:
+                    self.call(method, path, body)
+                counts[name] = len(queries)
+        return counts
+
+    def grow_history(self, days):
+        # Another `days` of history for the same user, older than the seeded two weeks
+        today = timezone.now().date()
+        logs = [
+            FoodLog(user=self.user, parent_day=get_log_day(today - timedelta(days=offset)), **food())
+            for offset in range(14, 14 + days) for _ in range(5)
+        ]
+        FoodLog.objects.bulk_create(logs)
+        call_command("rebuild_totals", stdout=StringIO())
+
+    def test_endpoints_stay_within_budget(self, *mocks):
+        for name, method, path, body, budget, max_bytes in ENDPOINTS:
+            with self.subTest(name):
+                clear_caches()
+                url = self.url(path)
+                with self.assertNumQueries(budget):
+                    res = getattr(self.client, method)(url, body, format="json")
+                self.assertLess(res.status_code, 300, res.content[:200])
+                self.assertLessEqual(len(res.content), max_bytes)
+
+    def test_read_queries_do_not_grow_with_history(self, *mocks):
+        before = self.query_counts()
+        self.grow_history(days=60)
+        self.assertEqual(self.query_counts(), before)
+
+    def test_user_app_auth_endpoints(self, *mocks):
+        client = APIClient()
+        with self.assertNumQueries(8):
+            res = client.post("/api/v1/users/signup/", {"email": "new@example.com", "password": "Testpass123!"},
+                              format="json")
+        self.assertEqual(res.status_code, 201, res.content)
+
+        with self.assertNumQueries(5):
+            res = client.post("/api/v1/users/login/", {"email": self.user.email, "password": "loadtest123"})
+        self.assertEqual(res.status_code, 200)
+        self.assertLessEqual(len(res.content), 400)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Token {res.data['token']}")
+        with self.assertNumQueries(2):
+            self.assertEqual(client.post("/api/v1/users/logout/").status_code, 204)
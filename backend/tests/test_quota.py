@@ -0,0 +1,146 @@
+import copy
+import time
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.fdc import nutrition_cache
+from food_data_app.models import FoodLog, ImageStatus
+from fullsnack_project import quota, upstream
+from image_app import jobs
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+FDC_PAYLOAD = {"foods": [{"foodNutrients": [{"nutrientId": 1008, "value": 89}]}]}
+UNSPLASH_PAYLOAD = {"results": [{
+    "id": "abc123", "urls": {"regular": "https://images.example/regular.jpg"},
+    "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+    "links": {"html": "https://unsplash.com/photos/abc123"},
+}]}
+
+
+def quotas(per_hour, burst=10):
+    # UPSTREAM_HTTP with the same quota on every upstream
+    config = copy.deepcopy(settings.UPSTREAM_HTTP)
+    for name in config:
+        config[name].update(quota_per_hour=per_hour, quota_burst=burst)
+    return config
+
+
+def upstream_response(payload, status=200):
+    return mock.Mock(status_code=status, json=mock.Mock(return_value=payload))
+
+
+# One token an hour: nothing refills while a test runs
+@override_settings(CACHES=LOCMEM_CACHES, UPSTREAM_HTTP=quotas(per_hour=1))
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+        self.bucket = quota.TokenBucket("usda")
+
+    def takes(self, level):
+        count = 0
+        while not self.bucket.take(level):
+            count += 1
+        return count
+
+    def test_lower_priorities_leave_a_reserve(self):
+        # Burst of 10: low stops at 4 left (30% reserved), normal takes the rest
+        self.assertEqual(self.takes(quota.LOW), 7)
+        self.assertEqual(self.takes(quota.NORMAL), 3)
+        # A token an hour: the next one is about an hour away
+        self.assertAlmostEqual(self.bucket.take(quota.NORMAL), 3600, delta=5)
+
+    def test_drain_empties_the_bucket(self):
+        self.bucket.drain()
+        self.assertGreater(self.bucket.take(quota.NORMAL), 0)
+        self.assertEqual(self.bucket.snapshot()["tokens"], 0)
+
+    @override_settings(UPSTREAM_HTTP=quotas(per_hour=0))
+    def test_zero_quota_turns_the_limiter_off(self):
+        self.assertFalse(self.bucket.enabled)
+        with mock.patch("fullsnack_project.upstream.requests.Session.get", return_value=upstream_response({})):
+            for _ in range(20):
+                upstream.usda.get("https://fdc.example/foods/search")
+
+
+# The database cache the settings use for the buckets unless REDIS_URL is set
+@override_settings(
+    CACHES={**LOCMEM_CACHES, "lookups": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache", "LOCATION": "cache_test_lookups",
+    }},
+    UPSTREAM_HTTP=quotas(per_hour=1),
+)
+class DatabaseBucketTests(TestCase):
+    def setUp(self):
+        call_command("createcachetable", verbosity=0)
+        self.bucket = quota.TokenBucket("usda")
+
+    def test_lock_and_tokens(self):
+        # add() only succeeds for the first caller while the lock is held
+        lock = f"{self.bucket._key()}:lock"
+        self.assertTrue(self.bucket.cache.add(lock, 1, timeout=quota.LOCK_TIMEOUT))
+        self.assertFalse(self.bucket.cache.add(lock, 1, timeout=quota.LOCK_TIMEOUT))
+        self.bucket.cache.delete(lock)
+
+        taken = 0
+        while self.bucket.take(quota.NORMAL) == 0:
+            taken += 1
+        self.assertEqual(taken, 10)
+        self.assertEqual(self.bucket.snapshot()["tokens"], 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, UPSTREAM_HTTP=quotas(per_hour=1), IMAGE_THUMBNAILS=False)
+class QuotaViewTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def spend(self, name, leave):
+        bucket = upstream.UPSTREAMS[name].bucket
+        while bucket.snapshot()["tokens"] > leave:
+            bucket.take(quota.NORMAL)
+
+    @mock.patch("fullsnack_project.upstream.requests.Session.get", return_value=upstream_response(FDC_PAYLOAD))
+    def test_exhausted_quota_serves_stale_or_503(self, get):
+        self.spend("usda", 0)
+        res = self.client.get("/api/v1/foods/nutrition/", {"query": "banana"})
+        self.assertEqual(res.status_code, 503)
+        # A normal priority call needs the next token, an hour away at a token an hour
+        self.assertEqual(res["Retry-After"], "3600")
+
+        # An expired entry is still good enough while the quota is spent
+        nutrition_cache.cache.set(nutrition_cache.key("banana"), (time.time() - 1, {"name": "Banana"}), timeout=60)
+        res = self.client.get("/api/v1/foods/nutrition/", {"query": "banana"})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.data["item"], {"name": "Banana"})
+        self.assertEqual(res["X-Cache"], "STALE")
+        self.assertEqual(nutrition_cache.stats()["stale"], 1)
+        get.assert_not_called()
+
+    @mock.patch("fullsnack_project.upstream.requests.Session.get", return_value=upstream_response(UNSPLASH_PAYLOAD))
+    def test_image_jobs_go_before_previews(self, get):
+        # 2 tokens left: under the previews' reserve, enough for a normal priority call
+        self.spend("unsplash", 2)
+        self.assertEqual(self.client.get("/api/v1/images/search/", {"q": "banana"}).status_code, 503)
+        get.assert_not_called()
+
+        log = FoodLog.objects.create(user=self.user, food_name="Banana", calories=1, protein=1, carbs=1, fat=1)
+        res = self.client.patch(f"/api/v1/images/foodlogs/{log.pk}/set/", {"q": "banana"}, format="json")
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(get.call_count, 1)
+        log.refresh_from_db()
+        self.assertEqual(log.image_status, ImageStatus.READY)
+
+    @mock.patch("fullsnack_project.upstream.requests.Session.get", return_value=upstream_response({}, status=429))
+    def test_upstream_429_drains_the_shared_bucket(self, get):
+        self.client.get("/api/v1/foods/nutrition/", {"query": "banana"})
+        self.assertEqual(upstream.usda.bucket.snapshot()["tokens"], 0)
+        self.assertEqual(self.client.get("/api/v1/foods/nutrition/", {"query": "apple"}).status_code, 503)
+        self.assertEqual(get.call_count, 1)
@@ -0,0 +1,54 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from fullsnack_project.caching import responses
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserResponseCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def log(self, calories):
+        return FoodLog.objects.create(user=self.user, food_name="Rice", calories=calories, protein=1, carbs=1, fat=1)
+
+    def test_repeat_reads_are_served_from_cache(self):
+        self.log(300)
+        first = self.client.get("/api/v1/dates/days/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/v1/dates/days/")
+
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(responses.stats()["hit_rate"], 0.5)
+
+    def test_writes_invalidate_cached_reads(self):
+        log = self.log(300)
+        self.client.get("/api/v1/dates/weeks/")
+        self.client.get("/api/v1/foods/")
+
+        self.client.put(f"/api/v1/foods/{log.pk}/", {
+            "food_name": "Rice", "calories": 450, "protein": 1, "carbs": 1, "fat": 1,
+        }, format="json")
+        weeks = self.client.get("/api/v1/dates/weeks/")
+        self.assertEqual(weeks["X-Cache"], "MISS")
+        self.assertEqual(weeks.data[0]["weekly_calorie_total"], 450)
+
+        self.client.post("/api/v1/foods/bulk/", {"delete": [log.pk]}, format="json")
+        self.assertEqual(self.client.get("/api/v1/foods/").data, [])
+
+    def test_cache_is_per_user(self):
+        self.log(300)
+        self.client.get("/api/v1/dates/days/")
+        other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        self.client.force_authenticate(other)
+
+        res = self.client.get("/api/v1/dates/days/")
+        self.assertEqual((res["X-Cache"], res.data), ("MISS", []))
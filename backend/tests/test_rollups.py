@@ -0,0 +1,65 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from food_data_app.totals import rebuild_user_totals
+from datetime_app.models import UserDayTotal, UserWeekTotal
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class UserRollupTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+
+    def make_log(self, user, calories, protein=10, carbs=20, fat=5):
+        return FoodLog.objects.create(
+            user=user, food_name="Rice", calories=calories, protein=protein, carbs=carbs, fat=fat
+        )
+
+    def test_rollups_are_per_user(self):
+        self.make_log(self.user, 300)
+        self.make_log(self.user, 200, protein=4)
+        self.make_log(self.other, 1000)
+
+        day = UserDayTotal.objects.get(user=self.user)
+        self.assertEqual((day.calories, day.protein, day.carbs, day.fat, day.log_count), (500, 14, 40, 10, 2))
+        self.assertEqual(UserWeekTotal.objects.get(user=self.user).calories, 500)
+        self.assertEqual(UserDayTotal.objects.get(user=self.other).calories, 1000)
+
+    def test_update_and_delete_adjust_rollups(self):
+        keep = self.make_log(self.user, 300)
+        log = FoodLog.objects.get(pk=self.make_log(self.user, 200).pk)
+
+        log.protein = 30
+        log.save()
+        self.assertEqual(UserDayTotal.objects.get(user=self.user).protein, 40)
+
+        log.delete()
+        day = UserDayTotal.objects.get(user=self.user)
+        self.assertEqual((day.calories, day.protein, day.log_count), (300, keep.protein, 1))
+
+    def test_days_view_only_returns_current_users_totals(self):
+        self.make_log(self.user, 300)
+        self.make_log(self.other, 1000)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.get("/api/v1/dates/days/")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data), 1)
+        self.assertEqual(res.data[0]["daily_calorie_total"], 300)
+
+    def test_rebuild_user_totals_matches_incremental_totals(self):
+        self.make_log(self.user, 300)
+        self.make_log(self.other, 1000)
+        UserDayTotal.objects.update(calories=1)
+
+        rebuild_user_totals()
+
+        self.assertEqual(UserDayTotal.objects.get(user=self.user).calories, 300)
+        self.assertEqual(UserDayTotal.objects.get(user=self.other).calories, 1000)
@@ -0,0 +1,34 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from django.core.management import call_command
+from django.db.models import Sum
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from food_data_app.models import FoodLog
+from datetime_app.models import Day, UserDayTotal, UserWeekTotal
+
+
+class SeedLoadDataTests(TestCase):
+    def test_generates_users_logs_and_consistent_totals(self):
+        with tempfile.TemporaryDirectory() as folder:
+            tokens_file = Path(folder) / "tokens.txt"
+            call_command("seed_load_data", users=3, logs_per_day=2, days=10, tokens_file=str(tokens_file),
+                         stdout=StringIO())
+            tokens = tokens_file.read_text().split()
+
+        self.assertEqual(len(tokens), 3)
+        self.assertEqual(Token.objects.filter(key__in=tokens).count(), 3)
+        self.assertEqual(FoodLog.objects.count(), 60)
+        self.assertEqual(Day.objects.count(), 10)
+        # Logs are spread over their days, and every total matches the logs
+        self.assertEqual(FoodLog.objects.values("time_logged__date").distinct().count(), 10)
+        logged = FoodLog.objects.aggregate(total=Sum("calories"))["total"]
+        self.assertEqual(Day.objects.aggregate(total=Sum("daily_calorie_total"))["total"], logged)
+        self.assertEqual(UserDayTotal.objects.aggregate(total=Sum("calories"))["total"], logged)
+        self.assertEqual(UserWeekTotal.objects.aggregate(total=Sum("log_count"))["total"], 60)
+
+    def test_rerun_adds_new_users(self):
+        call_command("seed_load_data", users=2, logs_per_day=1, days=2, stdout=StringIO())
+        call_command("seed_load_data", users=2, logs_per_day=1, days=2, stdout=StringIO())
+        self.assertEqual(Token.objects.count(), 4)
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+from food_data_app import fdc
+from fullsnack_project.caching import QueryCache
+from fullsnack_project.singleflight import SingleFlight
+from .caches import LOCMEM_CACHES, clear_caches
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+
+class SingleFlightTests(SimpleTestCase):
+    def test_concurrent_callers_share_one_call(self):
+        flight, release, calls, results = SingleFlight(), threading.Event(), [], []
+
+        def fetch():
+            calls.append(1)
+            release.wait(5)
+            return "value"
+
+        leader = threading.Thread(target=lambda: results.append(flight.do("k", fetch)))
+        leader.start()
+        while not flight.in_flight():
+            time.sleep(0.001)
+        followers = [threading.Thread(target=lambda: results.append(flight.do("k", fetch))) for _ in range(5)]
+        for thread in followers:
+            thread.start()
+        time.sleep(0.1)
+        release.set()
+        for thread in [leader, *followers]:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [(False, "value")] * 5 + [(True, "value")])
+        # Finished flights are forgotten, the next call runs again
+        self.assertEqual(flight.do("k", lambda: "new"), (True, "new"))
+
+    def test_waiters_get_the_leaders_error(self):
+        flight, release, errors = SingleFlight(), threading.Event(), []
+
+        def fail():
+            release.wait(5)
+            raise ValueError("upstream down")
+
+        def call():
+            try:
+                flight.do("k", fail)
+            except ValueError as e:
+                errors.append(str(e))
+
+        leader = threading.Thread(target=call)
+        leader.start()
+        while not flight.in_flight():
+            time.sleep(0.001)
+        follower = threading.Thread(target=call)
+        follower.start()
+        time.sleep(0.05)
+        release.set()
+        leader.join(5)
+        follower.join(5)
+        self.assertEqual(errors, ["upstream down", "upstream down"])
+
+    def test_async_callers_share_one_call(self):
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        async def main():
+            return await asyncio.gather(*(flight.ado("k", fetch) for _ in range(5)))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [(False, "value")] * 4 + [(True, "value")])
+
+    def test_async_waiter_takes_over_from_a_cancelled_leader(self):
+        flight, calls = SingleFlight(), []
+
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return len(calls)
+
+        async def main():
+            leader = asyncio.ensure_future(flight.ado("k", fetch))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flight.ado("k", fetch))
+            await asyncio.sleep(0)
+            leader.cancel()
+            return await follower
+
+        self.assertEqual(asyncio.run(main()), (True, 2))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class CoalescedLookupTests(SimpleTestCase):
+    def setUp(self):
+        clear_caches()
+
+    def test_concurrent_nutrition_lookups_call_fdc_once(self):
+        def slow_fdc(*args, **kwargs):
+            time.sleep(0.2)
+            return mock.Mock(status_code=200, json=mock.Mock(return_value={"foods": [{"foodNutrients": [
+                {"nutrientId": 1008, "value": 89}]}]}))
+
+        sources = []
+        with mock.patch("fullsnack_project.upstream.usda.get", side_effect=slow_fdc) as get:
+            run_threads(6, lambda: sources.append(fdc.lookup(" Banana ")[1]))
+
+        self.assertEqual(get.call_count, 1)
+        self.assertEqual(sorted(sources), ["cache"] * 5 + ["remote"])
+        self.assertEqual(fdc.nutrition_cache.stats()["coalesced"], 5)
+
+    @override_settings(LOOKUP_COALESCE_SHARED=True, LOOKUP_COALESCE_WAIT=2)
+    def test_shared_lock_waits_for_another_process(self):
+        cache = QueryCache("shared-test", alias="lookups")
+        fetch = mock.Mock(return_value="mine")
+        # Another process holds the lock and caches its result a moment later
+        caches["lookups"].add(cache._lock_key("banana"), 1)
+        threading.Timer(0.1, lambda: cache.set("banana", "theirs")).start()
+
+        self.assertEqual(cache.get_or_fetch("banana", fetch), (True, "theirs"))
+        fetch.assert_not_called()
+
+    @override_settings(LOOKUP_COALESCE_SHARED=True, LOOKUP_COALESCE_WAIT=2)
+    def test_shared_lock_released_without_a_result(self):
+        cache = QueryCache("shared-test", alias="lookups")
+        lock = cache._lock_key("banana")
+        caches["lookups"].add(lock, 1)
+        # The other process's fetch failed
+        threading.Timer(0.1, lambda: caches["lookups"].delete(lock)).start()
+
+        self.assertEqual(cache.get_or_fetch("banana", lambda: "mine"), (False, "mine"))
+        self.assertIsNone(caches["lookups"].get(lock))
@@ -0,0 +1,151 @@
+import io
+import os
+import tempfile
+from unittest import mock
+import requests
+from PIL import Image
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog
+from image_app import jobs, thumbnails
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+PHOTO = {
+    "id": "abc123",
+    "urls": {"regular": "https://images.example/abc123.jpg"},
+    "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+    "links": {"html": "https://unsplash.com/photos/abc123"},
+}
+
+
+def jpeg(width=1080, height=720, color=(200, 180, 40)):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+def image_response(data, status=200):
+    response = requests.Response()
+    response.status_code = status
+    response._content = data
+    response._content_consumed = True
+    return response
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ThumbnailTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.enterContext(override_settings(IMAGE_CACHE_DIR=self.enterContext(tempfile.TemporaryDirectory())))
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.log = FoodLog.objects.create(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+
+    def set_image(self, log, download):
+        # Queues the image, runs the job and returns the log as the API shows it
+        with mock.patch("image_app.unsplash.get_photo", return_value=PHOTO), \
+                mock.patch("fullsnack_project.upstream.images.session.get", side_effect=download) as get:
+            res = self.client.patch(f"/api/v1/images/foodlogs/{log.pk}/set/", {"photo_id": "abc123"}, format="json")
+            self.assertEqual(res.status_code, 202)
+            jobs.run_pending()
+        return self.client.get(f"/api/v1/foods/{log.pk}/").json(), get
+
+    def fetch(self, path, accept="image/avif,image/webp,*/*"):
+        return APIClient().get(path, HTTP_ACCEPT=accept)
+
+    def test_set_image_stores_thumbnails_served_by_format(self):
+        log, get = self.set_image(self.log, [image_response(jpeg())])
+
+        self.assertEqual(get.call_args.args[0], "https://images.example/abc123.jpg")
+        self.assertEqual(log["image_status"], "ready")
+        links = log["thumbnails"]
+        self.assertEqual(set(links), {"sm", "md"})
+
+        webp = self.fetch(links["md"])
+        self.assertEqual(webp.status_code, 200)
+        self.assertEqual(webp["Content-Type"], "image/webp")
+        self.assertIn("immutable", webp["Cache-Control"])
+        self.assertIn("Accept,", webp["Vary"])
+        with Image.open(io.BytesIO(webp.content)) as image:
+            self.assertEqual(image.size, (480, 320))
+
+        small = self.fetch(links["sm"], accept="image/jpeg")
+        self.assertEqual(small["Content-Type"], "image/jpeg")
+        with Image.open(io.BytesIO(small.content)) as image:
+            self.assertEqual(image.format, "JPEG")
+            self.assertEqual(max(image.size), 160)
+
+        revalidated = APIClient().get(links["md"], HTTP_ACCEPT="image/webp", HTTP_IF_NONE_MATCH=webp["ETag"])
+        self.assertEqual(revalidated.status_code, 304)
+
+    def test_same_photo_is_stored_once(self):
+        other = FoodLog.objects.create(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+        data = jpeg()
+        first, _ = self.set_image(self.log, [image_response(data)])
+        second, _ = self.set_image(other, [image_response(data)])
+
+        self.assertEqual(first["thumbnails"], second["thumbnails"])
+        files = list(thumbnails.root().glob("*/*"))
+        self.assertEqual(len(files), len(thumbnails.SIZES) * len(thumbnails.FORMATS))
+
+    def test_download_failure_keeps_the_remote_image(self):
+        log, _ = self.set_image(self.log, requests.ConnectionError("down"))
+        self.assertEqual(log["image_status"], "ready")
+        self.assertEqual(log["image_url"], "https://images.example/abc123.jpg")
+        self.assertIsNone(log["thumbnails"])
+
+        log, _ = self.set_image(self.log, [image_response(b"<html>not an image</html>")])
+        self.assertIsNone(log["thumbnails"])
+
+    def test_evicted_thumbnail_is_rebuilt_from_the_log(self):
+        log, _ = self.set_image(self.log, [image_response(jpeg())])
+        link = log["thumbnails"]["sm"]
+        thumbnails.evict(max_bytes=0)
+        self.assertEqual(list(thumbnails.root().glob("*/*")), [])
+
+        with mock.patch("fullsnack_project.upstream.images.session.get", return_value=image_response(jpeg())) as get:
+            rebuilt = self.fetch(link)
+        self.assertEqual(rebuilt.status_code, 200)
+        self.assertEqual(get.call_count, 1)
+
+    def test_eviction_drops_least_recently_served_first(self):
+        old = thumbnails.store(jpeg(color=(10, 10, 10)))
+        new = thumbnails.store(jpeg(color=(250, 250, 250)))
+        for path in thumbnails.root().glob(f"*/{old}-*"):
+            os.utime(path, (1, 1))
+        # Serving marks the old image as just used
+        thumbnails.read_thumbnail(old, "md", "webp")
+
+        total = sum(path.stat().st_size for path in thumbnails.root().glob("*/*"))
+        thumbnails.evict(max_bytes=total - 1)
+
+        self.assertTrue(thumbnails.path_for(old, "md", "webp").exists())
+        self.assertTrue(thumbnails.path_for(new, "md", "webp").exists())
+        self.assertLess(len(list(thumbnails.root().glob(f"*/{old}-*"))), 4)
+
+    def test_folder_is_scanned_only_over_budget_or_after_a_while(self):
+        with mock.patch.object(thumbnails, "evict", wraps=thumbnails.evict) as evict:
+            # The first store scans to learn the folder's size, the next ones only add to the count
+            thumbnails.store(jpeg(color=(10, 10, 10)))
+            thumbnails.store(jpeg(color=(20, 20, 20)))
+            self.assertEqual(evict.call_count, 1)
+
+            used = sum(path.stat().st_size for path in thumbnails.root().glob("*/*"))
+            with self.settings(IMAGE_CACHE_MAX_BYTES=used + 100):
+                thumbnails.store(jpeg(color=(30, 30, 30)))
+            self.assertEqual(evict.call_count, 2)
+            self.assertLessEqual(sum(path.stat().st_size for path in thumbnails.root().glob("*/*")), used + 100)
+
+            # Other workers' files are picked up by the next scan, at most EVICT_INTERVAL later
+            with mock.patch("image_app.thumbnails.time.monotonic", return_value=thumbnails.time.monotonic() + 301):
+                thumbnails.store(jpeg(color=(40, 40, 40)))
+            self.assertEqual(evict.call_count, 3)
+
+    def test_unknown_thumbnails_are_not_found(self):
+        self.assertEqual(self.fetch(f"/api/v1/images/t/{'0' * 64}/md/").status_code, 404)
+        self.assertEqual(self.fetch(f"/api/v1/images/t/{'0' * 64}/xl/").status_code, 404)
+        self.assertEqual(self.fetch("/api/v1/images/t/..%2F..%2Fsecret/md/").status_code, 404)
@@ -0,0 +1,90 @@
+from io import StringIO
+from unittest import mock
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, ImageStatus
+from datetime_app.models import Day, Week
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IncrementalTotalsTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(
+            username="test@gmail.com",
+            email="test@gmail.com",
+            password="testpass123"
+        )
+
+    def make_log(self, calories):
+        return FoodLog.objects.create(
+            user=self.user,
+            food_name="Oatmeal",
+            calories=calories,
+            protein=5,
+            carbs=27,
+            fat=3
+        )
+
+    def test_update_applies_calorie_difference(self):
+        self.make_log(100)
+        log = FoodLog.objects.get(pk=self.make_log(200).pk)
+
+        log.calories = 50
+        log.save()
+
+        day = Day.objects.get()
+        self.assertEqual(day.daily_calorie_total, 150)
+        self.assertEqual(day.parent_week.weekly_calorie_total, 150)
+
+    def test_update_without_calorie_change_skips_total_queries(self):
+        log = FoodLog.objects.get(pk=self.make_log(200).pk)
+        log.image_status = ImageStatus.FAILED
+
+        # Savepoint, UPDATE of the log, release (no aggregates or total updates, the user's foods are untouched)
+        with self.assertNumQueries(3):
+            log.save()
+
+    def test_delete_subtracts_calories(self):
+        self.make_log(100)
+        log = FoodLog.objects.get(pk=self.make_log(200).pk)
+
+        log.delete()
+
+        day = Day.objects.get()
+        self.assertEqual(day.daily_calorie_total, 100)
+        self.assertEqual(day.parent_week.weekly_calorie_total, 100)
+
+    def test_delete_answers_the_stored_day_total(self):
+        self.make_log(100)
+        log = self.make_log(200)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        delete = FoodLog.delete
+
+        def delete_then_another_write(food, *args, **kwargs):
+            result = delete(food, *args, **kwargs)
+            # Another user's log landing on the same day in the meantime
+            Day.objects.update(daily_calorie_total=F("daily_calorie_total") + 50)
+            return result
+
+        with mock.patch.object(FoodLog, "delete", delete_then_another_write):
+            res = client.delete(f"/api/v1/foods/{log.pk}/")
+        self.assertEqual(res.json(), {"detail": "Deleted.", "daily_total": 150})
+
+    def test_rebuild_totals_repairs_drift(self):
+        self.make_log(300)
+        Day.objects.update(daily_calorie_total=5)
+        Week.objects.update(weekly_calorie_total=0)
+
+        out = StringIO()
+        call_command("rebuild_totals", stdout=out)
+
+        self.assertIn("Rebuilt 1 day total(s) and 1 week total(s)", out.getvalue())
+        self.assertEqual(Day.objects.get().daily_calorie_total, 300)
+        self.assertEqual(Week.objects.get().weekly_calorie_total, 300)
@@ -0,0 +1,89 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, ImageStatus
+from image_app import jobs
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+
+def photo(photo_id):
+    return {
+        "id": photo_id,
+        "alt_description": "bananas",
+        "urls": {"thumb": f"https://images.example/{photo_id}-thumb.jpg",
+                 "regular": f"https://images.example/{photo_id}.jpg", "raw": "https://images.example/raw"},
+        "user": {"name": "Jane Doe", "links": {"html": "https://unsplash.com/@jane"}},
+        "links": {"html": f"https://unsplash.com/photos/{photo_id}"},
+    }
+
+
+def unsplash_response(payload, status=200):
+    return mock.Mock(status_code=status, json=mock.Mock(return_value=payload))
+
+
+SEARCH = unsplash_response({"results": [photo("abc123"), photo("Def456")]})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_THUMBNAILS=False)
+class UnsplashCacheTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="test@gmail.com", email="test@gmail.com", password="testpass123")
+        self.client.force_authenticate(self.user)
+        self.log = FoodLog.objects.create(user=self.user, food_name="Banana", calories=89, protein=1, carbs=23, fat=0)
+
+    def set_image(self, data):
+        # Queues the image and runs the worker, as `manage.py run_image_jobs` would
+        res = self.client.patch(f"/api/v1/images/foodlogs/{self.log.pk}/set/", data, format="json")
+        jobs.run_pending()
+        self.log.refresh_from_db()
+        return res
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=SEARCH)
+    def test_preview_then_set_by_photo_id_is_one_upstream_call(self, get):
+        preview = self.client.get("/api/v1/images/search/", {"q": "Banana"})
+        res = self.set_image({"q": "banana", "photo_id": "Def456"})
+
+        self.assertEqual([image["id"] for image in preview.json()["images"]], ["abc123", "Def456"])
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(self.log.image.url, "https://images.example/Def456.jpg")
+        self.assertEqual(self.log.image_status, ImageStatus.READY)
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=SEARCH)
+    def test_set_by_query_reuses_preview_search(self, get):
+        self.client.get("/api/v1/images/search/", {"q": "banana"})
+        res = self.set_image({"q": " BANANA "})
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(self.log.image.url, "https://images.example/abc123.jpg")
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response(photo("xyz789")))
+    def test_unknown_photo_id_is_fetched_once(self, get):
+        self.set_image({"photo_id": "xyz789"})
+        res = self.set_image({"photo_id": "xyz789"})
+
+        self.assertEqual(res.status_code, 202)
+        self.assertEqual(self.log.image.url, "https://images.example/xyz789.jpg")
+        self.assertTrue(get.call_args.args[0].endswith("/photos/xyz789"))
+        self.assertEqual(get.call_count, 1)
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response({}, status=404))
+    def test_missing_photo_id_fails_the_image(self, get):
+        self.assertEqual(self.set_image({"photo_id": "gone"}).status_code, 202)
+        self.assertEqual(self.log.image_status, ImageStatus.FAILED)
+        self.assertIsNone(self.log.image)
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get", return_value=unsplash_response({}, status=403))
+    def test_rate_limited_search_is_502_and_not_cached(self, get):
+        for _ in range(2):
+            res = self.client.get("/api/v1/images/search/", {"q": "banana"})
+        self.assertEqual(res.status_code, 502)
+        self.assertEqual(res.json()["status"], 403)
+        self.assertEqual(get.call_count, 2)
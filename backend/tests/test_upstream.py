@@ -0,0 +1,97 @@
+import asyncio
+import time
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+import requests
+from fullsnack_project.upstream import CircuitOpenError, Upstream
+from .stub_server import StubServer
+
+FAST_FAIL = {
+    "usda": {
+        "timeout": 2, "max_connections": 2, "max_keepalive_connections": 2,
+        "retries": 1, "backoff": 0, "breaker_failures": 2, "breaker_reset": 60,
+    },
+}
+
+
+@override_settings(UPSTREAM_HTTP=FAST_FAIL)
+class UpstreamClientTests(SimpleTestCase):
+    def setUp(self):
+        self.upstream = Upstream("usda")
+        self.stub = StubServer({"/ok": (200, {"ok": True}), "/down": (503, {})})
+        self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+
+    def test_success_records_latency(self):
+        r = self.upstream.get(f"{self.stub.url}/ok")
+
+        self.assertEqual(r.json(), {"ok": True})
+        snapshot = self.upstream.snapshot()
+        self.assertEqual(snapshot["latency_seconds"]["count"], 1)
+        self.assertEqual(snapshot["circuit"], "closed")
+
+    def test_transient_errors_are_retried(self):
+        self.upstream.get(f"{self.stub.url}/down")
+        # One call plus one retry
+        self.assertEqual(len(self.stub.requests), 2)
+
+    def test_breaker_opens_and_fails_fast(self):
+        for _ in range(2):
+            self.upstream.get(f"{self.stub.url}/down")
+        calls = len(self.stub.requests)
+
+        with self.assertRaises(CircuitOpenError):
+            self.upstream.get(f"{self.stub.url}/ok")
+
+        self.assertEqual(len(self.stub.requests), calls)
+        snapshot = self.upstream.snapshot()
+        self.assertEqual(snapshot["circuit"], "open")
+        self.assertEqual(snapshot["errors"], {"status_503": 2, "circuit_open": 1})
+
+    def test_half_open_trial_closes_circuit(self):
+        for _ in range(2):
+            self.upstream.get(f"{self.stub.url}/down")
+        self.upstream.breaker.reset_timeout = 0
+
+        self.upstream.get(f"{self.stub.url}/ok")
+
+        self.assertEqual(self.upstream.breaker.state, "closed")
+
+    def test_connection_errors_count_as_failures(self):
+        self.stub.__exit__()
+        with self.assertRaises(requests.ConnectionError):
+            self.upstream.get(f"{self.stub.url}/ok")
+        self.assertEqual(self.upstream.snapshot()["errors"], {"connection": 1})
+        self.assertEqual(self.upstream.breaker.failures, 1)
+
+    async def test_cancelled_trial_lets_the_next_call_through(self):
+        # Open long enough ago to be half-open
+        self.upstream.breaker.failures = 2
+        self.upstream.breaker.opened_at = time.monotonic() - 120
+        started = asyncio.Event()
+
+        async def hang(*args, **kwargs):
+            started.set()
+            await asyncio.sleep(3600)
+
+        with mock.patch("fullsnack_project.async_http.get_client", return_value=mock.Mock(get=hang)):
+            trial = asyncio.ensure_future(self.upstream.aget(f"{self.stub.url}/ok"))
+            await started.wait()
+            self.assertFalse(self.upstream.breaker.allow())
+            # e.g. Django cancelling the view when the client disconnects
+            trial.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await trial
+
+        self.assertEqual(self.upstream.breaker.state, "half-open")
+        self.assertTrue(self.upstream.breaker.allow())
+
+    def test_trial_failing_before_the_call_frees_the_breaker(self):
+        self.upstream.breaker.failures = 2
+        self.upstream.breaker.opened_at = time.monotonic() - 120
+        with mock.patch.object(self.upstream, "_take_quota", side_effect=RuntimeError("cache down")):
+            with self.assertRaises(RuntimeError):
+                self.upstream.get(f"{self.stub.url}/ok")
+
+        self.upstream.get(f"{self.stub.url}/ok")
+        self.assertEqual(self.upstream.breaker.state, "closed")
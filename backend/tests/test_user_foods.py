@@ -0,0 +1,147 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.test import APIClient
+from food_data_app.models import FoodLog, UserFood
+from image_app.models import FoodImage, ImageJob
+from .caches import LOCMEM_CACHES, clear_caches
+
+User = get_user_model()
+
+
+def food(name, calories=100, **fields):
+    return {"food_name": name, "calories": calories, "protein": 1, "carbs": 2, "fat": 3, **fields}
+
+
+def upload(text):
+    return SimpleUploadedFile("history.csv", text.encode(), content_type="text/csv")
+
+
+@override_settings(CACHES=LOCMEM_CACHES, IMAGE_AUTO_ENQUEUE=False)
+class UserFoodTests(TestCase):
+    def setUp(self):
+        clear_caches()
+        self.user = User.objects.create_user(username="a@gmail.com", email="a@gmail.com", password="testpass123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def log(self, name, calories=100, days_ago=0):
+        return FoodLog.objects.create(
+            user=self.user, time_logged=timezone.now() - timedelta(days=days_ago), **food(name, calories)
+        )
+
+    def foods(self, **params):
+        res = self.client.get("/api/v1/foods/mine/", params)
+        self.assertEqual(res.status_code, 200, res.data)
+        return [(item["name"], item["log_count"]) for item in res.json()["items"]]
+
+    def test_logs_are_counted_under_their_name(self):
+        self.log("Greek Yogurt", 150, days_ago=2)
+        newest = self.log("greek  yogurt", 180)
+        self.log("Rice", 200)
+
+        yogurt = UserFood.objects.get(search_name="greek yogurt")
+        self.assertEqual((yogurt.name, yogurt.log_count, yogurt.calories), ("greek  yogurt", 2, 180))
+        # An older log doesn't replace the newest one's values
+        self.log("Greek Yogurt", 90, days_ago=5)
+        yogurt.refresh_from_db()
+        self.assertEqual((yogurt.log_count, yogurt.calories), (3, 180))
+
+        # Renaming moves the log to the other food, deleting the newest log falls back to the one before
+        newest.food_name = "Rice"
+        newest.save()
+        self.assertEqual(
+            dict(UserFood.objects.values_list("search_name", "log_count")), {"greek yogurt": 2, "rice": 2}
+        )
+        self.assertEqual(UserFood.objects.get(search_name="greek yogurt").calories, 150)
+        FoodLog.objects.filter(food_name="Rice").first().delete()
+        FoodLog.objects.filter(food_name="Rice").first().delete()
+        self.assertFalse(UserFood.objects.filter(search_name="rice").exists())
+
+    def test_autocomplete(self):
+        for name, times in (("Banana", 3), ("Banana bread", 1), ("Frozen banana", 5), ("Rice", 2)):
+            for _ in range(times):
+                self.log(name)
+        other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        FoodLog.objects.create(user=other, **food("Banana split"))
+
+        # Names starting with the query first, then the most logged
+        self.assertEqual(self.foods(q="BAN"), [("Banana", 3), ("Banana bread", 1), ("Frozen banana", 5)])
+        self.assertEqual(self.foods(q="bread ban"), [("Banana bread", 1)])
+        self.assertEqual(self.foods(limit=2), [("Frozen banana", 5), ("Banana", 3)])
+        self.assertEqual(self.foods(sort="recent", limit=1), [("Rice", 2)])
+        self.assertEqual(self.foods(q="pizza"), [])
+        self.assertEqual(self.client.get("/api/v1/foods/mine/", {"sort": "best"}).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/foods/mine/", {"limit": "ten"}).status_code, 400)
+
+        # Cached until the next write
+        self.assertEqual(self.client.get("/api/v1/foods/mine/", {"q": "ban"})["X-Cache"], "HIT")
+        self.log("Banana bread")
+        self.assertEqual(self.foods(q="banana bre"), [("Banana bread", 2)])
+
+    @mock.patch("fullsnack_project.upstream.unsplash.get")
+    @mock.patch("fullsnack_project.upstream.usda.get")
+    def test_log_again_copies_the_food_without_lookups(self, usda, unsplash):
+        image = FoodImage.objects.create(photo_id="abc123", url="https://images.example/abc123.jpg")
+        log = self.log("Oatmeal", 150, days_ago=1)
+        log.image = image
+        log.save()
+        oatmeal = UserFood.objects.get()
+
+        with self.settings(IMAGE_AUTO_ENQUEUE=True):
+            res = self.client.post(f"/api/v1/foods/mine/{oatmeal.pk}/log/")
+        self.assertEqual(res.status_code, 201, res.data)
+        self.assertEqual(
+            (res.json()["food_name"], res.json()["calories"], res.json()["image_url"], res.json()["image_status"]),
+            ("Oatmeal", 150, "https://images.example/abc123.jpg", "ready"),
+        )
+        self.assertEqual(FoodLog.objects.filter(food_name="Oatmeal").count(), 2)
+        oatmeal.refresh_from_db()
+        self.assertEqual(oatmeal.log_count, 2)
+        self.assertFalse(ImageJob.objects.exists())
+        usda.assert_not_called()
+        unsplash.assert_not_called()
+
+        other = User.objects.create_user(username="b@gmail.com", email="b@gmail.com", password="testpass123")
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.post(f"/api/v1/foods/mine/{oatmeal.pk}/log/").status_code, 404)
+
+    def test_bulk_and_import_paths_update_the_index(self):
+        rice = self.log("Rice", 200)
+        res = self.client.post("/api/v1/foods/bulk/", {
+            "create": [food("Tea", 1), food("Tea", 2)],
+            "update": [{"id": rice.pk, "food_name": "Brown rice"}],
+        }, format="json")
+        self.assertEqual(res.status_code, 200, res.data)
+        self.assertEqual(
+            dict(UserFood.objects.values_list("search_name", "log_count")), {"tea": 2, "brown rice": 1}
+        )
+
+        with mock.patch("food_data_app.importer.CHUNK_ROWS", 2):
+            res = self.client.post("/api/v1/foods/import/", {"file": upload(
+                "date,food_name,calories,protein,carbs,fat\n"
+                "2024-01-02,Tea,5,0,0,0\n2024-01-03,Toast,80,3,14,1\n2024-01-04,tea,6,0,0,0\n"
+            )}, format="multipart")
+        self.assertEqual(res.status_code, 201, res.data)
+        tea = UserFood.objects.get(search_name="tea")
+        # The imported logs are older than today's, they only add to the count
+        self.assertEqual((tea.log_count, tea.calories), (4, 2))
+        self.assertEqual(UserFood.objects.get(search_name="toast").log_count, 1)
+
+    def test_rebuild_matches_the_incremental_index(self):
+        for name, days_ago in (("Rice", 3), ("rice", 1), ("Tea", 2), ("Soup", 0)):
+            self.log(name, 100 + days_ago, days_ago)
+        FoodLog.objects.get(food_name="Soup").delete()
+        fields = ("user_id", "name", "search_name", "calories", "log_count", "last_logged")
+        incremental = set(UserFood.objects.values_list(*fields))
+
+        UserFood.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_totals", stdout=out)
+        self.assertIn("Rewrote 2 user food(s).", out.getvalue())
+        self.assertEqual(set(UserFood.objects.values_list(*fields)), incremental)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UserAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'user_app'
+
+    def ready(self):
+        # Registers the auth cache invalidation receivers
+        from . import signals  # noqa: F401
@@ -0,0 +1,50 @@
+# backend/user_app/authentication.py
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import router
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from fullsnack_project import instrumentation
+
+
+def token_cache_key(key):
+    # Raw tokens never end up in the cache, as keys or values (file caches write both to disk)
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_token(key):
+    caches[settings.AUTH_CACHE_ALIAS].delete(token_cache_key(key))
+
+
+def cached_user_fields():
+    # Everything a request reads from its user, but the password hash
+    return [field.attname for field in get_user_model()._meta.concrete_fields if field.attname != "password"]
+
+
+# Same as DRF's TokenAuthentication, but the token's user is kept in the "auth" cache for AUTH_TOKEN_CACHE_TTL
+# seconds, so polling clients don't pay a token JOIN user query on every request. Only the user's fields (no
+# password hash) are cached, under a hash of the token. Deleting a token or saving its user drops the entry
+# (see signals.py).
+class CachedTokenAuthentication(TokenAuthentication):
+
+    def authenticate_credentials(self, key):
+        cache = caches[settings.AUTH_CACHE_ALIAS]
+        cache_key = token_cache_key(key)
+        fields = cache.get(cache_key)
+        instrumentation.record_cache(fields is not None)
+        if fields is None:
+            # Raises AuthenticationFailed for unknown keys and inactive users, those are never cached
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, {name: getattr(user, name) for name in cached_user_fields()})
+            return user, token
+
+        # Rebuilt as if loaded with the password deferred: reading it fetches it, and save() leaves it alone
+        User = get_user_model()
+        user = User.from_db(router.db_for_read(User), list(fields), list(fields.values()))
+        token = Token.from_db(router.db_for_read(Token), ["key", "user_id"], [key, user.pk])
+        token.user = user
+        return user, token
@@ -0,0 +1,22 @@
+# backend/user_app/signals.py
+# Keeps CachedTokenAuthentication from serving deleted tokens or stale users
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    # New users have no cached token yet, and logging in (last_login only) changes nothing requests rely on
+    if created or update_fields == frozenset({"last_login"}):
+        return
+    for key in Token.objects.filter(user=instance).values_list("key", flat=True):
+        forget_token(key)
@@ -1,5 +1,6 @@
 from django.shortcuts import render
-from django.contrib.auth import login, logout, authenticate
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import update_last_login
 from django.core.exceptions import ValidationError
 from .serializers import ClientSerializer
 from rest_framework.authtoken.models import Token
@@ -39,9 +40,10 @@ class Log_in(APIView):
         data = request.data.copy()
         client = authenticate(username=data.get("email"), password=data.get("password"))
         
-        # If the user was authenticated, log them in and assign a token, otherwise send an error
+        # If the user was authenticated, assign a token, otherwise send an error
+        # The API is token-only, so no session is created (last_login is still recorded)
         if client:
-            login(request, user=client)
+            update_last_login(None, client)
             token_obj, token_created = Token.objects.get_or_create(user=client)
             return Response({'user': ClientSerializer(client).data, "token": token_obj.key}, status=s.HTTP_200_OK)
         else:
@@ -50,9 +52,8 @@ class Log_in(APIView):
 # Handles the Log-out feature
 class Log_out(APIView):
     def post(self, request):
-        # Deletes the currently used authentication token, loggin the user out
+        # Deletes the currently used authentication token, loggin the user out (and dropping it from the auth cache)
         request.user.auth_token.delete()
-        logout(request)
         return Response({"success": True}, status=s.HTTP_204_NO_CONTENT)
 
 # Handles grabbing the information of the currently signed in user and changing a user's account info
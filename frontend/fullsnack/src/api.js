@@ -87,13 +87,23 @@ export const previewFoodImages = async (query) => {
 };
 
 
-// Add an image to an existing food log (returns { foodlog, credit })
-export const setFoodLogImage = async (foodLogId, query) => {
-  const res = await api.patch(`images/foodlogs/${foodLogId}/set/`, { q: query });
+// Queues an image for an existing food log (returns { foodlog, job }), the backend finds it in the background
+export const setFoodLogImage = async (foodLogId, query, photoId) => {
+  const res = await api.patch(`images/foodlogs/${foodLogId}/set/`, { q: query, photo_id: photoId });
   foodLogChanged();
   return res.data;
 };
 
+// Polls a food log until its image is no longer pending, returns the log as last read
+export const waitForFoodLogImage = async (foodLogId, { tries = 15, delayMs = 1000 } = {}) => {
+  let log = await getFoodLog(foodLogId);
+  for (let i = 1; i < tries && log?.image_status === "pending"; i++) {
+    await new Promise((resolve) => setTimeout(resolve, delayMs));
+    log = await getFoodLog(foodLogId);
+  }
+  return log;
+};
+
 // Creates a new food log with the given info
 export const createFoodLog = async (payload) => {
     const res = await api.post('/foods/', payload);     
@@ -101,6 +111,19 @@ export const createFoodLog = async (payload) => {
     return res.data;
 };
 
+// The user's own foods matching what they typed (most logged first), for autocomplete
+export const searchMyFoods = async (q, limit = 8) => {
+    const res = await api.get('/foods/mine/', { params: { q, limit } });
+    return res.data?.items ?? [];
+};
+
+// Logs one of the user's foods again as is, no nutrition or image lookup
+export const logFoodAgain = async (userFoodId) => {
+    const res = await api.post(`/foods/mine/${userFoodId}/log/`);
+    foodLogChanged();
+    return res.data;
+};
+
 // Updates a page that has food aggregate info with new info when called
 const foodLogChanged = () => {
     if (typeof window !== "undefined") {
@@ -6,6 +6,7 @@ import Form from "react-bootstrap/Form";
 import Spinner from "react-bootstrap/Spinner";
 import Alert from "react-bootstrap/Alert";
 import { putFoodLog } from "../api";
+import { api } from "../utilities";
 
 const APP_UTM = "FullSnack";
 const UNSPLASH_HOME = `https://unsplash.com/?utm_source=${encodeURIComponent(APP_UTM)}&utm_medium=referral`;
@@ -17,7 +18,9 @@ const toNumberOr = (val, fallback) => {
 };
 
 const FoodLogCard = ({ log, onDelete, onUpdated, credit: creditProp }) => {
-    const { id, food_name, calories, protein, carbs, fat, image_url } = log || {};
+    const { id, food_name, calories, protein, carbs, fat, image_url, thumbnails } = log || {};
+    // Our resized copy of the photo when the backend has one, the Unsplash original otherwise
+    const imageSrc = thumbnails?.md ? new URL(thumbnails.md, api.defaults.baseURL).href : image_url;
 
     // Credits refer first to backend-stored fields, then prop, then any 'log.credit' object
     const credit = {
@@ -90,7 +93,8 @@ const FoodLogCard = ({ log, onDelete, onUpdated, credit: creditProp }) => {
             {image_url && (
                 <Card.Img
                     variant="top"
-                    src={image_url}
+                    src={imageSrc}
+                    loading="lazy"
                     alt={food_name || "Food Image"}
                     className="rounded-t-2xl object-cover max-h-48"
                 />
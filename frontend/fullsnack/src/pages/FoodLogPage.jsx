@@ -2,7 +2,7 @@ import React, { useEffect, useState } from 'react';
 import { api } from '../utilities';
 import PreviewCard from '../components/PreviewCard';
 import FoodLogCard from '../components/FoodLogCard';
-import { setFoodLogImage, previewFoodImages, createFoodLog } from '../api';
+import { previewFoodImages, createFoodLog, waitForFoodLogImage, searchMyFoods, logFoodAgain } from '../api';
 import { Button, Form, Spinner } from 'react-bootstrap';
 
 const FoodLogPage = () => {
@@ -17,8 +17,9 @@ const FoodLogPage = () => {
     // Loading flags for searching and adding logs
     const [loading, setLoading] = useState(false);
     const [adding, setAdding] = useState(false);
-    // Used for crediting images as pre Unsplash TOS
-    const [creditsById, setCreditsById] = useState({});
+    // Foods the user logged before that match the search box, each can be logged again in one tap
+    const [myFoods, setMyFoods] = useState([]);
+    const [relogging, setRelogging] = useState(null);
 
     // Gets a list of current food logs on page startup
     useEffect(() => {
@@ -39,6 +40,40 @@ const FoodLogPage = () => {
         }
     };
 
+    // Suggests the user's own foods while they type (waits for a short pause, ignores answers to older input)
+    useEffect(() => {
+        const q = query.trim();
+        if (!q) {
+            setMyFoods([]);
+            return;
+        }
+        let stale = false;
+        const timer = setTimeout(() => {
+            searchMyFoods(q, 5)
+                .then((items) => { if (!stale) setMyFoods(items); })
+                .catch((e) => console.warn('My foods search failed:', e));
+        }, 200);
+        return () => {
+            stale = true;
+            clearTimeout(timer);
+        };
+    }, [query]);
+
+    // Logs one of the user's foods again as is, no nutrition or image lookup
+    const logAgain = async (food) => {
+        try {
+            setRelogging(food.id);
+            await logFoodAgain(food.id);
+            setPreviewData(null);
+            setQuery("");
+            fetchLogs();
+        } catch (err) {
+            console.error('Failed to log food again', err);
+        } finally {
+            setRelogging(null);
+        }
+    };
+
     // Calls backend to search for the inputted food name
     const searchNutrition = async (e) => {
         e.preventDefault();
@@ -71,6 +106,7 @@ const FoodLogPage = () => {
                     fat: Math.round(item.fat_total_g),
                     image_url: first?.full || first?.thumb || '',
                     credit: first?.credit || null,
+                    photo_id: first?.id || null,
                 });
             } else {
                 // If no response was gotten, dont do preview
@@ -90,27 +126,22 @@ const FoodLogPage = () => {
         try {
             setAdding(true);
 
-            // Create the FoodLog using helper function in api.js 
+            // Create the FoodLog using helper function in api.js, the backend attaches the previewed photo
+            // (or the first search result for the food) in the background
             const created = await createFoodLog({
                 food_name: previewData.food_name,
                 calories: previewData.calories,
                 protein: previewData.protein,
                 carbs: previewData.carbs,
                 fat: previewData.fat,
+                photo_id: previewData.photo_id,
             });
 
-            // Update its image using the backend Unsplash proxy and add its credits to the usestate
-            const { foodlog: updated, credit } = await setFoodLogImage(created.id, previewData.food_name);
-
-            // Adds most recent credits to the rest of the list of credits
-            if (credit) {
-                setCreditsById(prev => ({ ...prev, [updated.id]: credit }));
-            }
-
-            // Reset + refresh
+            // Reset + refresh, and refresh again once the image is in
             setPreviewData(null);
             setQuery("");
             fetchLogs();
+            waitForFoodLogImage(created.id).then(fetchLogs).catch(() => {});
 
             // Updates the other pages with the new log
             console.log('[FoodLogPage] emit foodlog:changed');
@@ -155,6 +186,23 @@ const FoodLogPage = () => {
                 </Form.Group>
             </Form>
 
+            {/* The user's own foods matching the search, logged again without a search */}
+            {myFoods.length > 0 && (
+                <ul className="max-w-xl mx-auto mb-4 flex flex-col gap-2">
+                    {myFoods.map((food) => (
+                        <li key={food.id} className="flex items-center justify-between gap-2 bg-white snack-card rounded-xl border border-snack-100 px-3 py-2">
+                            <span className="text-snack-700">
+                                {food.name} <span className="text-sm opacity-75">· {food.calories} kcal · logged {food.log_count}×</span>
+                            </span>
+                            <Button size="sm" variant="outline-primary" className="rounded-pill"
+                                    disabled={relogging !== null} onClick={() => logAgain(food)}>
+                                {relogging === food.id ? <Spinner animation="border" size="sm" /> : "Log again"}
+                            </Button>
+                        </li>
+                    ))}
+                </ul>
+            )}
+
             <hr className="snack-divider" />
 
             {/* Displays a card with info of a food searched and allows user to confirm for it to be added to the log for today */}
@@ -187,7 +235,7 @@ const FoodLogPage = () => {
                 <ul className="grid [grid-template-columns:repeat(auto-fill,minmax(18rem,1fr))] gap-5 justify-items-center">
                     {foodLogs.map((log) => (
                         <li key={log.id} className="w-full max-w-[20rem]">
-                            <FoodLogCard log={log} onDelete={deleteLog} credit={creditsById[log.id]} />
+                            <FoodLogCard log={log} onDelete={deleteLog} />
                         </li>
                     ))}
                     {foodLogs.length === 0 && (